@@ -0,0 +1,99 @@
+import numpy as np
+
+import measure
+import sim_result
+
+# Adaptive AC analysis shared by the filter testbenches. A coarse sweep with
+# a fixed number of points per decade gives the log-uniform grid that the
+# statistics (averages, monotonicity, relative position) are taken over;
+# the extremum and the -3 dB crossings are then refined with short linear
+# sweeps inside their bracket only and interpolated, instead of running the
+# whole 1 Hz - 1 GHz range at 1000 points per decade.
+
+
+class AcSweep:
+    def __init__(self, simulator, node, start_frequency=1, stop_frequency=1e9, points_per_decade=50,
+                 tolerance=1e-4, refine_points=11):
+        self.simulator = simulator
+        self.node = node
+        self.tolerance = tolerance  # bracket width in decades
+        self.refine_points = refine_points
+        self.sweeps = 0
+        start = sim_result.clock()
+        self.frequencies, self.response = self._sweep('dec', points_per_decade, start_frequency, stop_frequency)
+        self.gain_db = 20 * np.log10(np.abs(self.response) + 1e-12)
+        self.phase = np.angle(self.response, deg=True)
+        sim_result.stage("ac_sweep", start, points=len(self.frequencies))
+
+    def _sweep(self, variation, number_of_points, start_frequency, stop_frequency):
+        analysis = self.simulator.ac(start_frequency=float(start_frequency), stop_frequency=float(stop_frequency),
+                                     number_of_points=number_of_points, variation=variation)
+        self.sweeps += 1
+        return np.array(analysis.frequency).real, np.array(analysis[self.node])
+
+    def _refine(self, low, high):
+        frequencies, response = self._sweep('lin', self.refine_points, low, high)
+        gain_db = 20 * np.log10(np.abs(response) + 1e-12)
+        return frequencies, gain_db
+
+    def extremum(self, kind="max"):
+        # (frequency, gain_db) of the global maximum / minimum of the gain
+        pick = np.argmax if kind == "max" else np.argmin
+        frequencies, gain_db = self.frequencies, self.gain_db
+        start = sim_result.clock()
+        while True:
+            i = int(pick(gain_db))
+            if i == 0 or i == len(frequencies) - 1:
+                break
+            low, high = frequencies[i - 1], frequencies[i + 1]
+            if np.log10(high / low) <= self.tolerance:
+                break
+            frequencies, gain_db = self._refine(low, high)
+        if 0 < i < len(frequencies) - 1:
+            # parabola through the three points around the extremum, in log f
+            x = np.log10(frequencies[i - 1:i + 2])
+            a, b, c = np.polyfit(x, gain_db[i - 1:i + 2], 2)
+            if a != 0 and x[0] <= -b / (2 * a) <= x[2]:
+                peak = -b / (2 * a)
+                sim_result.stage(f"ac_{kind}", start)
+                return 10 ** peak, float(np.polyval([a, b, c], peak))
+        sim_result.stage(f"ac_{kind}", start)
+        return frequencies[i], float(gain_db[i])
+
+    def crossing(self, level_db, start_index=0, direction=1):
+        # First frequency where the gain crosses level_db, scanning the coarse
+        # grid from start_index towards higher (direction=1) or lower (-1)
+        # frequencies. Without a crossing, the grid point closest to the level.
+        frequencies, gain_db = self.frequencies, self.gain_db
+        i = measure.crossing_index(gain_db, level_db, start_index, direction)
+        if i is None:
+            i = int(np.argmin(np.abs(gain_db - level_db)))
+            return frequencies[i], float(gain_db[i])
+        start = sim_result.clock()
+        low, high = frequencies[i], frequencies[i + 1]
+        low_gain, high_gain = gain_db[i], gain_db[i + 1]
+        while np.log10(high / low) > self.tolerance:
+            points, gains = self._refine(low, high)
+            side = (gains - level_db > 0) != (low_gain - level_db > 0)
+            if not side.any():
+                break
+            j = int(np.argmax(side))
+            if j == 0:
+                # the first refine point re-simulated on the other side of
+                # the level: keep the bracket of the previous pass
+                break
+            low, high = points[j - 1], points[j]
+            low_gain, high_gain = gains[j - 1], gains[j]
+        # linear interpolation in log f
+        x = np.interp(level_db, sorted([low_gain, high_gain]),
+                      [np.log10(low), np.log10(high)] if low_gain <= high_gain else [np.log10(high), np.log10(low)])
+        sim_result.stage("ac_crossing", start)
+        return 10 ** x, float(level_db)
+
+    def non_monotonic_fraction(self, rising, max_step_db_per_decade=500):
+        # Share of grid steps that go the wrong way by more than the given
+        # slope; 500 dB/decade is the 0.5 dB per step of a 1000 points per
+        # decade grid the testbenches used before.
+        steps = np.diff(self.gain_db) / np.diff(np.log10(self.frequencies))
+        wrong = steps < -max_step_db_per_decade if rising else steps > max_step_db_per_decade
+        return np.sum(wrong) / len(steps)
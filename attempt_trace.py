@@ -0,0 +1,133 @@
+import argparse
+import contextlib
+import json
+import math
+import os
+import resource
+import sys
+import time
+
+# Per-attempt timing trace. work() wraps each stage (LLM call, code execution,
+# netlist generation, dc sweep, checks, VLM call) in AttemptTrace.stage() and
+# writes one JSON line per stage to trace.jsonl next to token_summary_final.txt:
+#
+#   {"task_id": 1, "it": 0, "task_type": "Amplifier", "code_id": 0,
+#    "stage": "run_code", "seconds": 1.3, "rss_mb": 210.5, ...}
+#
+# `python attempt_trace.py <model_dir>` prints p50/p95 per stage per task type.
+
+TRACE_NAME = "trace.jsonl"
+
+
+def rss_mb():
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class AttemptTrace:
+    def __init__(self, task_id, it, task_type):
+        self.base = {"task_id": task_id, "it": it, "task_type": task_type}
+        self.entries = []
+        self.start = time.time()
+
+    @contextlib.contextmanager
+    def stage(self, name, **fields):
+        entry = dict(self.base, stage=name, **fields)
+        start = time.perf_counter()
+        try:
+            yield entry
+        except BaseException as e:
+            entry["error"] = type(e).__name__
+            raise
+        finally:
+            entry["seconds"] = time.perf_counter() - start
+            entry["rss_mb"] = rss_mb()
+            self.entries.append(entry)
+
+    def add(self, name, seconds, **fields):
+        fields.setdefault("rss_mb", rss_mb())
+        self.entries.append(dict(self.base, stage=name, seconds=seconds, **fields))
+
+    def add_sim_record(self, record, **fields):
+        # stages timed inside the simulation script (see sim_result)
+        if record is None:
+            return
+        for name, stage in record.get("stages", {}).items():
+            # ngspice iteration counts of the op point (see warm_start)
+            solver = {key: stage[key] for key in ["iterations", "warm_start"] if key in stage}
+            self.add("sim_" + name, stage.get("seconds", 0.0), status=stage.get("status"),
+                     cached=stage.get("cached", False), worker_rss_mb=record.get("max_rss_mb"), **solver, **fields)
+
+    def write(self, path, **fields):
+        self.add("attempt", time.time() - self.start, **fields)
+        with open(path, "w") as f:
+            for entry in self.entries:
+                f.write(json.dumps(entry, default=str) + "\n")
+
+
+def find_traces(paths):
+    for path in paths:
+        if os.path.isfile(path):
+            yield path
+            continue
+        for root, _, files in os.walk(path):
+            if TRACE_NAME in files:
+                yield os.path.join(root, TRACE_NAME)
+
+
+def percentile(values, q):
+    # nearest rank
+    values = sorted(values)
+    return values[max(0, math.ceil(q / 100.0 * len(values)) - 1)]
+
+
+def summarize(paths):
+    seconds = {}
+    for path in find_traces(paths):
+        for line in open(path, "r"):
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            key = (entry.get("task_type", ""), entry["stage"])
+            seconds.setdefault(key, []).append(entry["seconds"])
+    return seconds
+
+
+def summarize_iterations(paths):
+    # op point iteration counts per task type, with and without warm start
+    iterations = {}
+    for path in find_traces(paths):
+        for line in open(path, "r"):
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if entry.get("iterations") is None or entry.get("cached"):
+                continue
+            key = (entry.get("task_type", ""), "warm" if entry.get("warm_start") else "cold")
+            iterations.setdefault(key, []).append(entry["iterations"])
+    return iterations
+
+
+def print_summary(seconds, file=sys.stdout):
+    print(f"{'task type':<16}{'stage':<18}{'n':>6}{'p50 (s)':>10}{'p95 (s)':>10}{'total (s)':>11}", file=file)
+    for (task_type, stage), values in sorted(seconds.items()):
+        print(f"{task_type:<16}{stage:<18}{len(values):>6}{percentile(values, 50):>10.3f}"
+              f"{percentile(values, 95):>10.3f}{sum(values):>11.1f}", file=file)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("paths", nargs="+", help="model output directories or trace.jsonl files")
+    paths = parser.parse_args().paths
+    print_summary(summarize(paths))
+    iterations = summarize_iterations(paths)
+    if iterations:
+        print(f"\n{'task type':<16}{'op start':<18}{'n':>6}{'p50 iter':>10}{'p95 iter':>10}{'mean':>11}")
+        for (task_type, start), values in sorted(iterations.items()):
+            print(f"{task_type:<16}{start:<18}{len(values):>6}{percentile(values, 50):>10}"
+                  f"{percentile(values, 95):>10}{sum(values) / len(values):>11.1f}")
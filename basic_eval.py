@@ -0,0 +1,289 @@
+import contextlib
+import io
+import os
+
+import numpy as np
+
+import sim_cache
+import sim_result
+import warm_start
+from netlist_check import check_netlist
+
+
+repo_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def write_netlist(circuit, netlist_path):
+    source = str(circuit) + "\n"
+    with open(netlist_path, "w") as f:
+        f.write("\n".join(source.split("\n")[1:]))
+    return "\n".join(source.split("\n")[1:])
+
+
+def write_operating_point(simulator, op_path):
+    # returns the iteration count fields for the op stage
+    analysis, fields = warm_start.operating_point(simulator)
+    fopen = open(op_path, "w")
+    for node in analysis.nodes.values():
+        fopen.write(f"{str(node)}\t{float(analysis[str(node)][0]):.6f}\n")
+    fopen.close()
+    return fields
+
+
+def get_vin_name(netlist_content, task_type):
+    vinn_name = "in"
+    vinp_name = None
+    for line in netlist_content.split("\n"):
+        if not line.lower().startswith("v"):
+            continue
+        if len(line.lower().split()) < 2:
+            continue
+        if task_type == "Amplifier" and "vin" in line.lower().split()[1]:
+            vinn_name = line.split()[0][1:]
+        if task_type == "Opamp" and "vinp" in line.lower().split()[1]:
+            vinp_name = line.split()[0][1:]
+        if task_type == "Opamp" and "vinn" in line.lower().split()[1]:
+            vinn_name = line.split()[0][1:]
+    return vinn_name, vinp_name
+
+
+def save_dc_sweep(dc_path, vin, vout):
+    # .npy: one (2, points) array; otherwise the Vin and Vout text lines
+    if dc_path.endswith(".npy"):
+        np.save(dc_path, np.vstack([vin, vout]))
+        return
+    with open(dc_path, "w") as f:
+        f.write(" ".join(f"{item:.6f}" for item in vin) + " \n")
+        f.write(" ".join(f"{item:.6f}" for item in vout) + " \n")
+
+
+def load_dc_sweep(dc_path):
+    if dc_path.endswith(".npy"):
+        vin, vout = np.load(dc_path)
+    else:
+        vin, vout = np.loadtxt(dc_path, ndmin=2)
+    return vin, vout
+
+
+def select_best_voltage(vin, vout, target_voltage=2.5):
+    # (1, 0) for a flat transfer curve, else (0, the Vin whose Vout is closest
+    # to target_voltage; among equally close ones the Vin closest to it)
+    vin, vout = np.asarray(vin, dtype=float), np.asarray(vout, dtype=float)
+    if np.max(vout) - np.min(vout) < 1e-6:
+        return 1, 0
+
+    distances = np.abs(vout - target_voltage)
+    min_indices = np.flatnonzero(distances == np.min(distances))
+    best_index = min_indices[np.argmin(np.abs(vin[min_indices] - target_voltage))]
+
+    # at the resolution of the text file, for the prompts and the rewritten code
+    return 0, round(float(vin[best_index]), 6)
+
+
+def get_best_voltage(dc_file_path, target_voltage=2.5):
+    return select_best_voltage(*load_dc_sweep(dc_file_path), target_voltage)
+
+
+def find_source(circuit, name):
+    try:
+        return circuit.element("V" + name)
+    except (KeyError, IndexError):
+        return None
+
+
+def connect_vinn_vinp(circuit, vinp_name):
+    # Same as the text rewrite: the Vinp source becomes a 0 V link to Vinn.
+    source = find_source(circuit, vinp_name) if vinp_name is not None else None
+    if source is None:
+        return None
+    node_names = source.node_names
+    dc_value = source.dc_value
+    source.detach()
+    circuit.V('dc', 'Vinn', 'Vinp', 0.0)
+    return node_names, dc_value
+
+
+def disconnect_vinn_vinp(circuit, vinp_name, saved):
+    if saved is None:
+        return
+    circuit.element("Vdc").detach()
+    node_names, dc_value = saved
+    circuit.V(vinp_name, *node_names, dc_value)
+
+
+def run_dc_sweep(circuit, vinn_name, dc_path=""):
+    # Returns the (vin, vout) arrays of the sweep; they are written to dc_path
+    # only if one is given.
+    dc_sweep_code = open(os.path.join(repo_dir, "dc_sweep_template.py"), "r").read()
+    dc_sweep_code = dc_sweep_code.replace("[IN_NAME]", vinn_name).replace("[DC_PATH]", dc_path)
+    namespace = {"circuit": circuit, "simulator": circuit.simulator()}
+    exec(compile(dc_sweep_code, "dc_sweep_template.py", "exec"), namespace)
+    return namespace["in_voltage"], namespace["out_voltage"]
+
+
+def set_input_voltage(circuit, names, voltage):
+    old_values = {}
+    for name in names:
+        source = find_source(circuit, name) if name else None
+        if source is None:
+            continue
+        old_values[source.name] = source.dc_value
+        source.dc_value = voltage
+    return old_values
+
+
+def restore_input_voltage(circuit, old_values):
+    for element_name, dc_value in old_values.items():
+        circuit.element(element_name).dc_value = dc_value
+
+
+def best_voltage_path(op_path):
+    return op_path.rsplit("_op.txt", 1)[0] + "_best_voltage.txt"
+
+
+def sweep_and_rebias(circuit, task_type, vinn_name, vinp_name, op_path, netlist_path, dc_path="",
+                     target_voltage=2.5):
+    # DC sweep for the input bias, then the live circuit re-biased to it: the
+    # input sources are set in place and the op point and netlist re-derived
+    # in this interpreter, without running the generated code again. Returns
+    # (dc_sweep_error, best_voltage, names of the re-biased sources); the
+    # sources keep their values unless the op point and netlist are written.
+    saved = connect_vinn_vinp(circuit, vinp_name) if task_type == "Opamp" else None
+    try:
+        vin, vout = run_dc_sweep(circuit, vinn_name, dc_path)
+    finally:
+        disconnect_vinn_vinp(circuit, vinp_name, saved)
+    dc_sweep_error, best_voltage = select_best_voltage(vin, vout, target_voltage)
+    with open(best_voltage_path(op_path), "w") as f:
+        f.write(str(best_voltage))
+    if dc_sweep_error:
+        return dc_sweep_error, best_voltage, []
+    old_values = set_input_voltage(circuit, [vinn_name, vinp_name], float(best_voltage))
+    try:
+        write_operating_point(circuit.simulator(), op_path)
+        write_netlist(circuit, netlist_path)
+    except Exception:
+        restore_input_voltage(circuit, old_values)
+        raise
+    return dc_sweep_error, best_voltage, list(old_values)
+
+
+def set_ac_input(circuit):
+    import PySpice.Spice.BasicElement
+    for element in circuit.elements:
+        if not isinstance(element, PySpice.Spice.BasicElement.VoltageSource):
+            continue
+        names = [element.name.lower()] + [str(node).lower() for node in element.node_names]
+        if not any("vin" in name for name in names):
+            continue
+        raw_voltage = element.dc_value
+        if isinstance(raw_voltage, str):
+            raw_voltage = raw_voltage.strip()
+            if "dc" in raw_voltage.lower():
+                voltage = raw_voltage.split(" ")[1]
+            else:
+                voltage = raw_voltage
+        else:
+            voltage = float(raw_voltage)
+        element.dc_value = "dc {} ac 1n".format(voltage)
+
+
+def run_check(namespace, task_type):
+    if task_type not in ["Amplifier", "Opamp", "Inverter", "CurrentMirror"]:
+        return 0, ""
+    if task_type in ["Amplifier", "Opamp"]:
+        set_ac_input(namespace["circuit"])
+    check_path = os.path.join(repo_dir, "problem_check", f"{task_type}.py")
+    test_code = open(check_path, "r").read()
+    output = io.StringIO()
+    func_error = 0
+    with contextlib.redirect_stdout(output):
+        try:
+            exec(compile(test_code, check_path, "exec"), namespace)
+        except SystemExit as e:
+            if e.code not in [None, 0]:
+                func_error = 1
+        except Exception as e:
+            print(f"{type(e).__name__}: {e}")
+            func_error = 1
+    return func_error, output.getvalue() if func_error else ""
+
+
+def evaluate_basic(namespace, task_type, op_path, netlist_path, dc_path, target_voltage=2.5, netlist_check=None):
+    # Evaluate a basic task on the circuit that the generated code already built:
+    # op point, netlist, dc sweep, re-bias and functional check in one interpreter.
+    # With netlist_check = (task_id, input, output, optimize), check_netlist
+    # runs on the re-biased op point first and a warning skips the functional
+    # check, whose result run.py would not use.
+    # The outcome goes into the script's sim_result record under "eval".
+    # An electrically identical circuit seen before is answered from the cache.
+    # The dc sweep is handed over in memory; dc_path ("" for none) only keeps
+    # a copy (.npy or text).
+    sources = ["basic_eval.py", "dc_sweep_template.py", "bias_search.py", "warm_start.py", "netlist_check.py",
+               "netlist_graph.py"] + sim_cache.TESTBENCH_HELPERS
+    if os.path.exists(os.path.join(repo_dir, "problem_check", f"{task_type}.py")):
+        sources.append(os.path.join("problem_check", f"{task_type}.py"))
+    # the replayed files depend on which copy of the dc sweep is kept
+    key = sim_cache.circuit_key(namespace, "basic", task_type, target_voltage, os.path.splitext(dc_path)[1],
+                                repr(netlist_check), sim_cache.source_hash(*sources))
+    sim_cache.cached_call(task_type, key,
+                          lambda: _evaluate_basic(namespace, task_type, op_path, netlist_path, dc_path, target_voltage,
+                                                  netlist_check),
+                          paths=[path for path in [op_path, netlist_path, dc_path, best_voltage_path(op_path)] if path])
+
+
+def _evaluate_basic(namespace, task_type, op_path, netlist_path, dc_path, target_voltage, netlist_check=None):
+    circuit = namespace["circuit"]
+    simulator = namespace["simulator"]
+    netlist_content = write_netlist(circuit, netlist_path)
+    start = sim_result.clock()
+    try:
+        fields = write_operating_point(simulator, op_path)
+        sim_result.stage("op", start, **fields)
+    except Exception as e:
+        sim_result.stage("op", start, error=e)
+        print("Analysis failed due to an error:")
+        print(str(e))
+        return
+
+    result = {
+        "dc_sweep_error": 0,
+        "dc_sweep_success": 0,
+        "best_voltage": None,
+        "vinn_name": None,
+        "vinp_name": None,
+        "biased_sources": [],
+        "func_error": 0,
+        "func_error_message": "",
+    }
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        if "Opamp" in task_type or "Amplifier" in task_type:
+            vinn_name, vinp_name = get_vin_name(netlist_content, task_type)
+            result["vinn_name"], result["vinp_name"] = vinn_name, vinp_name
+            start = sim_result.clock()
+            try:
+                dc_sweep_error, best_voltage, sources = sweep_and_rebias(
+                    circuit, task_type, vinn_name, vinp_name, op_path, netlist_path, dc_path, target_voltage)
+                result["dc_sweep_error"] = int(dc_sweep_error)
+                result["best_voltage"] = float(best_voltage)
+                result["biased_sources"] = sources
+                assert dc_sweep_error == 0
+                result["dc_sweep_success"] = 1
+                sim_result.stage("dc_sweep", start, best_voltage=result["best_voltage"])
+            except Exception as e:
+                sim_result.stage("dc_sweep", start, error=e, fatal=False)
+        if netlist_check is not None:
+            start = sim_result.clock()
+            task_id, input, output, optimize = netlist_check
+            warning, warning_message = check_netlist(netlist_path, op_path, input, output, task_id, task_type, optimize)
+            result["netlist_warning"], result["netlist_warning_message"] = warning, warning_message
+            sim_result.stage("check_netlist", start, warning=warning)
+        if not result.get("netlist_warning"):
+            start = sim_result.clock()
+            func_error, func_error_message = run_check(namespace, task_type)
+            result["func_error"] = func_error
+            result["func_error_message"] = func_error_message
+            sim_result.stage("check", start, func_error=func_error)
+
+    sim_result.update(eval=result)
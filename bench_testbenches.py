@@ -0,0 +1,219 @@
+import argparse
+import csv
+import json
+import os
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import time
+
+import sim_result
+from eval_templates import basic_eval_template, complex_task_type, testbench_template
+
+# Runs every sample_design/p{N}/p{N}.py through the evaluation work() would
+# append to it (fused op/dc sweep/check for basic tasks, the problem_check
+# testbench for complex ones) without any LLM, and compares the timings with
+# a stored baseline:
+#
+#   python bench_testbenches.py --task_id all --update_baseline
+#   python bench_testbenches.py --task_id 10-13,22
+
+repo_dir = os.path.dirname(os.path.abspath(__file__))
+
+bench_header = """
+import bench_testbenches
+bench_testbenches.count_points()
+"""
+
+
+def count_points():
+    # Count the analyses and the points they return (1 for an op point) into
+    # the script's sim_result record.
+    from PySpice.Spice.Simulation import CircuitSimulator
+    from spice_session import SpiceSession
+    record = sim_result.current()
+    record.setdefault("analyses", 0)
+    record.setdefault("points", 0)
+
+    def counted(method):
+        def run(self, *args, **kwargs):
+            analysis = method(self, *args, **kwargs)
+            record["analyses"] += 1
+            waveforms = list(getattr(analysis, "nodes", {}).values())
+            record["points"] += len(waveforms[0]) if waveforms else 1
+            return analysis
+        return run
+
+    for name in ["operating_point", "dc", "ac", "transient"]:
+        setattr(CircuitSimulator, name, counted(getattr(CircuitSimulator, name)))
+    SpiceSession._analysis = counted(SpiceSession._analysis)
+
+
+def load_tasks(task_id_spec):
+    tasks = []
+    with open(os.path.join(repo_dir, "problem_set.tsv"), "r") as f:
+        for row in csv.DictReader(f, delimiter="\t"):
+            task_id = int(row["Id"])
+            if os.path.exists(os.path.join(repo_dir, "sample_design", f"p{task_id}", f"p{task_id}.py")):
+                tasks.append((task_id, row["Type"], row["Input"], row["Output"]))
+    if task_id_spec == "all":
+        return tasks
+    wanted = set()
+    for part in task_id_spec.split(","):
+        if "-" in part:
+            start, end = part.split("-", 1)
+            wanted.update(range(int(start), int(end) + 1))
+        else:
+            wanted.add(int(part))
+    return [task for task in tasks if task[0] in wanted]
+
+
+def build_script(task_id, task_type, input, output, out_dir):
+    # the generated part of a sample design ends at circuit.simulator(), like
+    # extract_code() cuts an LLM answer
+    code = ""
+    for line in open(os.path.join(repo_dir, "sample_design", f"p{task_id}", f"p{task_id}.py"), "r"):
+        code += line.rstrip("\n") + "\n"
+        if "circuit.simulator()" in line:
+            break
+    if "simulator = circuit.simulator()" not in code:
+        code += "\nsimulator = circuit.simulator()\n"
+    prefix = os.path.join(out_dir, f"p{task_id}")
+    if task_type in complex_task_type:
+        shutil.copy(os.path.join(repo_dir, "opamp.py"), out_dir)
+        code = "import math\n" + code + testbench_template.replace("[TASK_TYPE]", task_type) \
+            .replace("[FIGURE_PATH]", prefix + "_figure").replace("[BIAS_VOLTAGE]", "2.5")
+    else:
+        code += basic_eval_template.replace("[TASK_TYPE]", task_type).replace("[OP_PATH]", prefix + "_op.txt") \
+            .replace("[NETLIST_PATH]", prefix + "_netlist.sp").replace("[DC_PATH]", prefix + "_dc.npy") \
+            .replace("[TARGET_VOLTAGE]", "2.5").replace("[NETLIST_CHECK]", repr((task_id, input, output, False)))
+    script_path = prefix + "_bench.py"
+    with open(script_path, "w") as f:
+        f.write(bench_header + code)
+    return script_path
+
+
+def run_script(script_path, timeout):
+    # wait4() gives the peak RSS of exactly this child
+    env = os.environ.copy()
+    env["PYTHONPATH"] = repo_dir + os.pathsep + env.get("PYTHONPATH", "")
+    env.pop("SIM_CACHE_DIR", None)
+    log_path = script_path.rsplit(".", 1)[0] + ".log"
+    start = time.time()
+    timed_out = False
+    with open(log_path, "w") as log:
+        process = subprocess.Popen([sys.executable, "-u", os.path.join(repo_dir, "sim_result.py"), script_path],
+                                   stdout=log, stderr=subprocess.STDOUT, env=env)
+        while True:
+            pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+            if pid != 0:
+                break
+            if time.time() - start > timeout:
+                os.kill(process.pid, signal.SIGKILL)
+                pid, status, usage = os.wait4(process.pid, 0)
+                timed_out = True
+                break
+            time.sleep(0.01)
+    # reaped here, so Popen must not wait for it again
+    process.returncode = returncode = os.waitstatus_to_exitcode(status)
+    wall = time.time() - start
+    record = sim_result.load(script_path) or {}
+    eval_result = record.get("eval")
+    if eval_result is not None:
+        passed = eval_result["func_error"] == 0 and eval_result["dc_sweep_error"] == 0 and record["status"] == "ok" \
+            and not eval_result.get("netlist_warning")
+    else:
+        passed = returncode == 0 and record.get("status") == "ok"
+    return {
+        "passed": passed,
+        "returncode": returncode,
+        "timeout": timed_out,
+        "wall_seconds": wall,
+        "sim_seconds": record.get("seconds", 0.0),
+        "analyses": record.get("analyses", 0),
+        # streamed transients bypass the simulator methods count_points() wraps
+        "points": record.get("points", 0) + record.get("stages", {}).get("transient", {}).get("points", 0),
+        "peak_rss_mb": usage.ru_maxrss / 1024,
+        "transient": record.get("stages", {}).get("transient"),
+    }
+
+
+def run_task(task_id, task_type, input, output, out_dir, repeat, timeout):
+    task_dir = os.path.join(out_dir, f"p{task_id}")
+    os.makedirs(task_dir, exist_ok=True)
+    script_path = build_script(task_id, task_type, input, output, task_dir)
+    runs = [run_script(script_path, timeout) for _ in range(repeat)]
+    result = dict(runs[0])
+    result["task_type"] = task_type
+    for field in ["wall_seconds", "sim_seconds", "peak_rss_mb"]:
+        result[field] = statistics.median(run[field] for run in runs)
+    result["passed"] = all(run["passed"] for run in runs)
+    return result
+
+
+def compare(results, baseline, tolerance, min_seconds, min_mb):
+    regressions = []
+    for task_id, result in results.items():
+        base = baseline.get(task_id)
+        if base is None:
+            continue
+        if base["passed"] and not result["passed"]:
+            regressions.append(f"p{task_id}: passed in the baseline, fails now")
+        for field, min_delta in [("wall_seconds", min_seconds), ("peak_rss_mb", min_mb)]:
+            old, new = base[field], result[field]
+            if new > old * (1 + tolerance) and new - old > min_delta:
+                regressions.append(f"p{task_id}: {field} {old:.2f} -> {new:.2f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--task_id", type=str, default="all", help="e.g. 1 / 1,3,5-8 / all")
+    parser.add_argument("--out_dir", type=str, default="bench_out")
+    parser.add_argument("--baseline", type=str, default="bench_baseline.json")
+    parser.add_argument("--update_baseline", action="store_true", default=False)
+    parser.add_argument("--repeat", type=int, default=1, help="runs per design; timings are medians")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative growth reported as a regression")
+    parser.add_argument("--min_seconds", type=float, default=0.5, help="smaller slowdowns are ignored")
+    parser.add_argument("--min_mb", type=float, default=20, help="smaller peak memory growth is ignored")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"{'task':<6}{'type':<16}{'pass':<6}{'wall (s)':>10}{'sim (s)':>10}{'points':>9}{'peak MB':>9}")
+    for task_id, task_type, input, output in load_tasks(args.task_id):
+        result = run_task(task_id, task_type, input, output, os.path.abspath(args.out_dir), args.repeat, args.timeout)
+        results[str(task_id)] = result
+        print(f"p{task_id:<5}{task_type:<16}{'yes' if result['passed'] else 'NO':<6}{result['wall_seconds']:>10.2f}"
+              f"{result['sim_seconds']:>10.2f}{result['points']:>9}{result['peak_rss_mb']:>9.0f}")
+    for task_id, result in results.items():
+        transient = result["transient"]
+        if transient and transient.get("end_time"):
+            saved = 1 - transient["simulated_time"] / transient["end_time"]
+            print(f"p{task_id}: streamed transient simulated {transient['simulated_time'] * 1e3:.3g} ms of "
+                  f"{transient['end_time'] * 1e3:.3g} ms ({100 * saved:.0f}% saved, verdict {transient.get('verdict')})")
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            baseline = json.load(open(args.baseline, "r"))
+        baseline.update(results)
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=1, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update_baseline to create one.")
+        return
+    regressions = compare(results, json.load(open(args.baseline, "r")), args.tolerance, args.min_seconds, args.min_mb)
+    for regression in regressions:
+        print("REGRESSION", regression)
+    if regressions:
+        sys.exit(1)
+    print("No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
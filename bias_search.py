@@ -0,0 +1,106 @@
+import numpy as np
+from scipy.optimize import brentq, minimize_scalar
+
+import sim_result
+from measure import crossing_indices
+from spice_session import SpiceSession
+
+# Input bias search of the Opamp / Amplifier DC sweep (dc_sweep_template.py):
+# one coarse DC sweep over the allowed input range; a flat transfer curve ends
+# the search right there. Otherwise the input voltage where Vout crosses the
+# target is bracketed by two neighbouring sweep points and solved with Brent's
+# method on single operating points, each an `alter` of the input source in
+# an already loaded ngspice session. Without a crossing, a closest point
+# inside the range is refined with a bounded Brent minimisation instead.
+
+
+class _OperatingPoints:
+    # Vout and the input node voltage at a given input source value
+    def __init__(self, circuit, simulator, source, vin_node, vout_node):
+        self.circuit, self.simulator = circuit, simulator
+        self.source, self.vin_node, self.vout_node = source, str(vin_node), vout_node
+        try:
+            self.session = SpiceSession(simulator)
+        except ValueError:
+            self.session = None
+        self.vin, self.vout, self.solved = [], [], {}
+
+    def _read(self, analysis):
+        return np.array(analysis[self.vin_node]).real, np.array(analysis[self.vout_node]).real
+
+    def sweep(self, low, high, step):
+        if self.session is not None:
+            analysis = self.session.dc(self.source, low, high, step)
+        else:
+            analysis = self.simulator.dc(**{self.source: slice(low, high, step)})
+        vin, vout = self._read(analysis)
+        self.vin.append(vin)
+        self.vout.append(vout)
+        for value, out in zip(np.array(analysis.sweep).real, vout):
+            self.solved[float(value)] = float(out)
+        return np.array(analysis.sweep).real, vout
+
+    def solve(self, value):
+        value = float(value)
+        if value in self.solved:
+            return self.solved[value]
+        if self.session is not None:
+            self.session.alter(self.source, dc=value)
+            analysis = self.session.operating_point()
+        else:
+            element = self.circuit.element(self.source)
+            original = element.dc_value
+            element.dc_value = value
+            try:
+                analysis = self.simulator.operating_point()
+            finally:
+                element.dc_value = original
+        vin, vout = self._read(analysis)
+        self.vin.append(vin)
+        self.vout.append(vout)
+        self.solved[value] = float(vout[0])
+        return self.solved[value]
+
+    def points(self):
+        # every simulated (input node, Vout) pair, ordered by input voltage
+        vin, vout = np.concatenate(self.vin), np.concatenate(self.vout)
+        order = np.argsort(vin, kind="stable")
+        return vin[order], vout[order]
+
+
+def find_bias(circuit, simulator, source, vin_node, low, high, target, coarse_steps=20, xtol=1e-6,
+              vout_node="Vout"):
+    # Returns (vin, vout, search): all simulated points ordered by input node
+    # voltage, and a dict with the source value found ("best"; None if the
+    # transfer curve is flat), whether it is an exact crossing, and the
+    # number of points and single op solves.
+    start = sim_result.clock()
+    points = _OperatingPoints(circuit, simulator, source, vin_node, vout_node)
+    sweep, vout = points.sweep(low, high, (high - low) / coarse_steps)
+    search = {"best": None, "crossing": False, "flat": bool(np.ptp(vout) < 1e-6), "solves": 0}
+    if not search["flat"]:
+        best = int(np.argmin(np.abs(vout - target)))
+        search["best"] = float(sweep[best])
+        crossings = crossing_indices(vout, target)
+        try:
+            if len(crossings):
+                # the crossing next to the coarse point closest to the target
+                i = int(crossings[np.argmin(np.abs(crossings + 0.5 - best))])
+                search["best"] = float(brentq(lambda v: points.solve(v) - target, sweep[i], sweep[i + 1], xtol=xtol))
+                search["crossing"] = True
+            elif 0 < best < len(sweep) - 1:
+                # a local extremum short of the target; at either end of the
+                # range the end point is already the closest
+                bounds = (sweep[best - 1], sweep[best + 1])
+                result = minimize_scalar(lambda v: abs(points.solve(v) - target), bounds=bounds, method="bounded",
+                                         options={"xatol": xtol})
+                if abs(points.solve(result.x) - target) < abs(vout[best] - target):
+                    search["best"] = float(result.x)
+        except Exception as e:
+            # keep the best coarse point
+            search["error"] = f"{type(e).__name__}: {e}"
+        search["solves"] = len(points.solved) - len(sweep)
+    vin, vout = points.points()
+    search["points"] = len(vin)
+    sim_result.stage("bias_search", start, **search)
+    return vin, vout, search
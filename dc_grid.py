@@ -0,0 +1,50 @@
+import numpy as np
+
+import sim_result
+
+# Multi-point DC tests for the Adder and Subtractor testbenches. Instead of one
+# simulator and one operating point per input combination, the whole grid is
+# a single nested `.dc inner ... outer ...` sweep; ngspice returns the inner
+# sweep repeated for every outer value as one vector, which is reshaped here.
+
+
+def _sweep(values):
+    # evenly spaced values as a .dc range; the stop half a step past the last
+    # value so rounding cannot add or drop a point
+    step = values[1] - values[0] if len(values) > 1 else 1.0
+    return slice(float(values[0]), float(values[-1] + step / 2), float(step))
+
+
+def dc_grid(circuit, node, inner, inner_values, outer, outer_values):
+    # Voltage of node for every combination of the two sources' DC values,
+    # shape (len(outer_values), len(inner_values)). If the nested sweep fails
+    # or comes back with the wrong number of points, every combination is run
+    # as its own operating point; errors of those are raised.
+    start = sim_result.clock()
+    inner_values = np.asarray(inner_values, dtype=float)
+    outer_values = np.asarray(outer_values, dtype=float)
+    shape = (len(outer_values), len(inner_values))
+    try:
+        analysis = circuit.simulator().dc(**{inner: _sweep(inner_values), outer: _sweep(outer_values)})
+        voltages = np.array(analysis[node]).real
+        if voltages.size != shape[0] * shape[1]:
+            raise ValueError(f"nested DC sweep returned {voltages.size} points instead of {shape[0] * shape[1]}")
+        grid = voltages.reshape(shape)
+        sim_result.stage("dc_grid", start, points=grid.size, sweeps=1)
+        return grid
+    except Exception as e:
+        sim_result.stage("dc_grid", start, error=e, fatal=False)
+
+    start = sim_result.clock()
+    original = circuit.element(inner).dc_value, circuit.element(outer).dc_value
+    grid = np.empty(shape)
+    try:
+        for i, outer_value in enumerate(outer_values):
+            circuit.element(outer).dc_value = outer_value
+            for j, inner_value in enumerate(inner_values):
+                circuit.element(inner).dc_value = inner_value
+                grid[i, j] = np.array(circuit.simulator().operating_point()[node]).real[0]
+    finally:
+        circuit.element(inner).dc_value, circuit.element(outer).dc_value = original
+    sim_result.stage("dc_grid_op", start, points=grid.size)
+    return grid
@@ -0,0 +1,60 @@
+# Code run.py adds around a generated PySpice script to evaluate it; the
+# placeholders in brackets are filled by run.py and by bench_testbenches.py,
+# which has to build the same scripts for its timings to mean anything.
+
+# task types checked by a problem_check testbench instead of the basic eval
+complex_task_type = ['Oscillator', 'Integrator', 'Differentiator', 'OscillatorFFT',
+                     'Adder', 'Subtractor', 'Schmitt', 'VCO', 'PLL', 'Comparator',
+                     'Mixer',
+                     'BandPass', 'BandStop', 'LowPass', 'HighPass'
+                     ]
+
+pyspice_template = """
+import sim_result
+import warm_start
+from sim_cache import cached_call, circuit_key
+def _operating_point():
+    start = sim_result.clock()
+    try:
+        analysis, fields = warm_start.operating_point(simulator)
+        fopen = open("[OP_PATH]", "w")
+        for node in analysis.nodes.values(): 
+            fopen.write(f"{str(node)}\\t{float(analysis[str(node)][0]):.6f}\\n")
+        fopen.close()
+        sim_result.stage("op", start, **fields)
+    except Exception as e:
+        sim_result.stage("op", start, error=e)
+        print("Analysis failed due to an error:")
+        print(str(e))
+cached_call("op", circuit_key(globals(), "op"), _operating_point, paths=["[OP_PATH]"])
+"""
+
+
+output_netlist_template = """
+source = str(circuit)
+print(source)
+"""
+
+testbench_template = """
+from sim_cache import run_testbench
+run_testbench(globals(), "[TASK_TYPE]", "[FIGURE_PATH]", [BIAS_VOLTAGE])
+"""
+
+warm_start_template = """
+import warm_start
+warm_start.apply(globals(), "[OP_PATH]")
+"""
+
+rebias_template = """
+import sim_result
+from basic_eval import sweep_and_rebias
+dc_sweep_error, best_voltage, biased_sources = sweep_and_rebias(circuit, "[TASK_TYPE]", "[VINN_NAME]", [VINP_NAME],
+    "[OP_PATH]", "[NETLIST_PATH]", "[DC_PATH]", [TARGET_VOLTAGE])
+sim_result.update(eval={"dc_sweep_error": int(dc_sweep_error), "best_voltage": float(best_voltage),
+                        "biased_sources": biased_sources})
+"""
+
+basic_eval_template = """
+from basic_eval import evaluate_basic
+evaluate_basic(globals(), "[TASK_TYPE]", "[OP_PATH]", "[NETLIST_PATH]", "[DC_PATH]", [TARGET_VOLTAGE], [NETLIST_CHECK])
+"""
@@ -0,0 +1,226 @@
+import contextlib
+import json
+import os
+import sys
+import threading
+import types
+
+import numpy as np
+
+# Lazy testbench figures. While a testbench runs inside deferred(), `import
+# matplotlib.pyplot as plt` (and matplotlib.ticker) gives a stand-in that only
+# records the plotting calls and their arrays; plt.savefig() writes them to
+# <figure>.npz instead of rasterising a PNG. The figure is only needed when
+# work() asks the VLM about a failed attempt, and render() replays the
+# recording with the real matplotlib then:
+#
+#   python figure_render.py <figure>.npz   ->  <figure>.png
+
+
+def _subplots_shape(args, kwargs):
+    # what iterating over plt.subplots(...) gives: the figure (not iterable)
+    # and the axes, one Axes or an array of them as matplotlib squeezes it
+    nrows = int(kwargs.get("nrows", args[0] if len(args) > 0 else 1))
+    ncols = int(kwargs.get("ncols", args[1] if len(args) > 1 else 1))
+    if not kwargs.get("squeeze", True):
+        axes = (nrows, ncols)
+    elif nrows == 1 and ncols == 1:
+        axes = None
+    elif nrows == 1 or ncols == 1:
+        axes = (nrows * ncols,)
+    else:
+        axes = (nrows, ncols)
+    return [None, axes]
+
+
+def _result_shape(name, args, kwargs):
+    # A recorded call result's shape for iteration: None (not iterable), a
+    # list with the shape of each item, or an array shape.
+    if name == "subplots":
+        return _subplots_shape(args, kwargs)
+    if name == "values":
+        # `for spine in ax.spines.values()`
+        return (4,)
+    return None
+
+
+def _item_shapes(shape):
+    if isinstance(shape, list):
+        return shape
+    return [shape[1:] or None] * shape[0]
+
+
+class _Recording:
+    def __init__(self, figure_path):
+        self.figure_path = figure_path
+        self.ops = []
+        self.arrays = []
+
+    def add(self, op, shape=None):
+        op["id"] = len(self.ops) + 1
+        self.ops.append(op)
+        return _Proxy(self, op["id"], op.get("name"), shape)
+
+    def pack(self, value):
+        if isinstance(value, _Proxy):
+            return {"__ref__": value._id}
+        if isinstance(value, np.ndarray):
+            self.arrays.append(np.asarray(value))
+            return {"__array__": len(self.arrays) - 1}
+        if isinstance(value, np.generic):
+            return value.item()
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        if isinstance(value, (list, tuple)):
+            packed = [self.pack(item) for item in value]
+            return packed if isinstance(value, list) else {"__tuple__": packed}
+        if isinstance(value, dict):
+            return {"__dict__": [[self.pack(key), self.pack(item)] for key, item in value.items()]}
+        try:
+            # PySpice unit values, ranges, ...
+            return float(value)
+        except (TypeError, ValueError):
+            return self.pack(np.asarray(value))
+
+    def save(self):
+        # a figure that cannot be recorded is missing from the VLM prompt, it
+        # does not fail the testbench
+        try:
+            arrays = {f"array{i}": array for i, array in enumerate(self.arrays)}
+            np.savez(self.figure_path + ".npz", ops=np.array(json.dumps(self.ops)), **arrays)
+        except Exception as e:
+            print(f"Recording {self.figure_path}.npz failed: {type(e).__name__}: {e}")
+
+
+class _Proxy:
+    def __init__(self, recording, id, name=None, shape=None):
+        self._recording = recording
+        self._id = id
+        self._name = name
+        self._shape = shape
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return self._recording.add({"op": "getattr", "target": self._id, "name": name})
+
+    def __getitem__(self, key):
+        # a row of a 2-D axes array is iterable again
+        shape = None
+        if isinstance(self._shape, tuple) and isinstance(key, (int, np.integer)):
+            shape = self._shape[1:] or None
+        return self._recording.add({"op": "getitem", "target": self._id, "key": self._recording.pack(key)}, shape)
+
+    def __call__(self, *args, **kwargs):
+        recording = self._recording
+        op = {"op": "call", "target": self._id, "name": self._name,
+              "args": [recording.pack(arg) for arg in args],
+              "kwargs": {key: recording.pack(value) for key, value in kwargs.items()}}
+        if self._name == "savefig":
+            # always the testbench figure, wherever the recording is replayed
+            op["args"] = op["args"][1:]
+            op["kwargs"].pop("fname", None)
+        proxy = recording.add(op, _result_shape(self._name, args, kwargs))
+        if self._name == "savefig":
+            recording.save()
+        return proxy
+
+    def __iter__(self):
+        if self._shape is None:
+            raise TypeError(f"cannot iterate over a recorded {self._name or 'value'}")
+        for i, shape in enumerate(_item_shapes(self._shape)):
+            yield self._recording.add({"op": "item", "target": self._id, "index": i}, shape)
+
+
+class _Module(types.ModuleType):
+    def __init__(self, name, proxy):
+        super().__init__(name)
+        self._proxy = proxy
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self._proxy, name)
+
+
+@contextlib.contextmanager
+def deferred(figure_path):
+    # figure_path without the .png extension, as [FIGURE_PATH] in the testbenches
+    recording = _Recording(figure_path)
+    modules = {
+        "matplotlib": _Module("matplotlib", _Proxy(recording, "matplotlib")),
+        "matplotlib.pyplot": _Module("matplotlib.pyplot", _Proxy(recording, "pyplot")),
+        "matplotlib.ticker": _Module("matplotlib.ticker", _Proxy(recording, "ticker")),
+    }
+    modules["matplotlib"].pyplot = modules["matplotlib.pyplot"]
+    modules["matplotlib"].ticker = modules["matplotlib.ticker"]
+    saved = {name: sys.modules.get(name) for name in modules}
+    sys.modules.update(modules)
+    try:
+        yield recording
+    finally:
+        for name, module in saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+
+
+_render_lock = threading.Lock()
+
+
+def _unpack(value, objects, data):
+    if isinstance(value, list):
+        return [_unpack(item, objects, data) for item in value]
+    if not isinstance(value, dict):
+        return value
+    if "__ref__" in value:
+        return objects[value["__ref__"]]
+    if "__array__" in value:
+        return data[f"array{value['__array__']}"]
+    if "__tuple__" in value:
+        return tuple(_unpack(item, objects, data) for item in value["__tuple__"])
+    return {_unpack(key, objects, data): _unpack(item, objects, data) for key, item in value["__dict__"]}
+
+
+def render(figure_path):
+    # Replay <figure_path>.npz into <figure_path>.png; returns the PNG path, or
+    # None if the testbench saved no figure or the replay failed.
+    npz_path, png_path = figure_path + ".npz", figure_path + ".png"
+    if not os.path.exists(npz_path):
+        return png_path if os.path.exists(png_path) else None
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import matplotlib.ticker
+    with _render_lock, matplotlib.rc_context():
+        try:
+            with np.load(npz_path) as data:
+                ops = json.loads(str(data["ops"]))
+                objects = {"matplotlib": matplotlib, "pyplot": plt, "ticker": matplotlib.ticker}
+                for op in ops:
+                    target = objects[op["target"]]
+                    if op["op"] == "getattr":
+                        result = getattr(target, op["name"])
+                    elif op["op"] == "getitem":
+                        result = target[_unpack(op["key"], objects, data)]
+                    elif op["op"] == "item":
+                        result = list(target)[op["index"]]
+                    else:
+                        args = _unpack(op["args"], objects, data)
+                        kwargs = {key: _unpack(value, objects, data) for key, value in op["kwargs"].items()}
+                        if op["name"] == "savefig":
+                            args = [png_path] + args
+                        result = target(*args, **kwargs)
+                    objects[op["id"]] = result
+        except Exception as e:
+            print(f"Rendering {npz_path} failed: {type(e).__name__}: {e}")
+            return None
+        finally:
+            plt.close("all")
+    return png_path if os.path.exists(png_path) else None
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        print(render(path.rsplit(".npz", 1)[0]))
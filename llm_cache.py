@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+from openai.types.chat import ChatCompletion
+
+
+class CacheMissError(Exception):
+    # Raised in replay mode; retrying cannot help, so the retry policy gives up.
+    retryable = False
+
+
+def request_key(request, sample):
+    # `sample` tells apart requests that are identical on purpose: the pass@k
+    # iteration and how many times this exact request was already made in it.
+    payload = json.dumps({"request": request, "sample": sample}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+# On-disk cache of chat completions, one JSON file per request hash. Entries are
+# touched on every hit and the least recently used ones are removed once the
+# cache grows past max_entries / max_mb. With replay=True a miss raises instead
+# of going to the model, so a whole run can be repeated offline.
+class LLMCache:
+    def __init__(self, cache_dir, max_entries=0, max_mb=0, replay=False):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_mb * 1024 * 1024
+        self.replay = replay
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+            os.utime(path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            if self.replay:
+                raise CacheMissError(f"no cached completion for request {key} in {self.cache_dir}")
+            return None
+        with self._lock:
+            self.hits += 1
+        return ChatCompletion.model_validate(entry["completion"])
+
+    def put(self, key, request, completion):
+        if self.replay:
+            return
+        entry = {"model": request.get("model"), "completion": completion.model_dump()}
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._puts += 1
+            check = self._puts % 20 == 1
+        if check:
+            self.evict()
+
+    def evict(self):
+        if not self.max_entries and not self.max_bytes:
+            return
+        entries = []
+        for sub_dir in os.scandir(self.cache_dir):
+            if not sub_dir.is_dir():
+                continue
+            for entry in os.scandir(sub_dir.path):
+                if entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+        total_bytes = sum(size for _, size, _ in entries)
+        count = len(entries)
+        for _, size, path in entries:
+            if (not self.max_entries or count <= self.max_entries) and \
+               (not self.max_bytes or total_bytes <= self.max_bytes):
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            count -= 1
+            total_bytes -= size
@@ -0,0 +1,246 @@
+import asyncio
+import email.utils
+import inspect
+import random
+import re
+import threading
+import time
+
+import openai
+from openai import AsyncOpenAI
+
+
+RETRYABLE_STATUS = [408, 409, 429]
+
+
+def new_wait_stats():
+    return {"requests": 0, "retries": 0, "cache_hits": 0, "backoff_wait": 0.0, "rate_limit_wait": 0.0, "slot_wait": 0.0}
+
+
+def parse_duration(value):
+    # Seconds from header values such as "20", "0.5", "20ms", "1s", "6m0s" or an HTTP date.
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    parts = re.findall(r"([0-9.]+)(ms|h|m|s)", value)
+    if parts and "".join(number + unit for number, unit in parts) == value:
+        scale = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+        return sum(float(number) * scale[unit] for number, unit in parts)
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def retry_after(headers):
+    if not headers:
+        return None
+    if headers.get("retry-after-ms") is not None:
+        delay = parse_duration(headers.get("retry-after-ms"))
+        if delay is not None:
+            return delay / 1000
+    delay = parse_duration(headers.get("retry-after"))
+    if delay is not None:
+        return delay
+    resets = []
+    for kind in ["requests", "tokens"]:
+        if headers.get(f"x-ratelimit-remaining-{kind}") == "0":
+            resets.append(parse_duration(headers.get(f"x-ratelimit-reset-{kind}")))
+    resets = [reset for reset in resets if reset is not None]
+    return max(resets) if resets else None
+
+
+def error_headers(error):
+    response = getattr(error, "response", None)
+    return getattr(response, "headers", None)
+
+
+class RetryPolicy:
+    # Exponential backoff with full jitter. A Retry-After or x-ratelimit-reset-*
+    # hint from the server replaces the computed delay; client errors that cannot
+    # succeed on retry (bad request, auth, ...) are raised instead.
+    def __init__(self, base_delay=2.0, max_delay=60.0, max_attempts=0):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+
+    def retryable(self, error):
+        if getattr(error, "retryable", True) is False:
+            return False
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code in RETRYABLE_STATUS or error.status_code >= 500
+        return True
+
+    def delay(self, attempt, error=None):
+        hint = retry_after(error_headers(error))
+        if hint is not None:
+            return hint + random.uniform(0, self.base_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def backoff(self, stats=None):
+        return Backoff(self, stats)
+
+
+class Backoff:
+    # Retry state for one request loop: call wait() (with the exception, if any)
+    # where the loop used to sleep a fixed time.
+    def __init__(self, policy, stats=None):
+        self.policy = policy
+        self.stats = stats if stats is not None else new_wait_stats()
+        self.attempt = 0
+
+    def wait(self, error=None):
+        if not self.policy.retryable(error):
+            raise error
+        if self.policy.max_attempts and self.attempt + 1 >= self.policy.max_attempts:
+            if error is not None:
+                raise error
+            raise RuntimeError(f"no usable completion after {self.attempt + 1} attempts")
+        delay = self.policy.delay(self.attempt, error)
+        self.attempt += 1
+        self.stats["retries"] += 1
+        self.stats["backoff_wait"] += delay
+        print(f"LLM request retry {self.attempt} in {delay:.1f}s")
+        time.sleep(delay)
+
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount):
+        # Take `amount` now, going into debt if needed; return how long the caller
+        # has to wait for the debt to be paid back.
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= amount
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    def refund(self, amount):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class RateLimiter:
+    # Client-side requests/min and tokens/min buckets, plus a shared pause when
+    # the server says a limit is exhausted. Only used from the event loop thread.
+    def __init__(self, requests_per_minute=0, tokens_per_minute=0):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.paused_until = 0.0
+
+    async def acquire(self, tokens):
+        delay = max(0.0, self.paused_until - time.monotonic())
+        if self.requests is not None:
+            delay = max(delay, self.requests.reserve(1))
+        if self.tokens is not None:
+            delay = max(delay, self.tokens.reserve(tokens))
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def settle(self, estimated, used):
+        if self.tokens is not None and used is not None:
+            self.tokens.refund(estimated - used)
+
+    def observe(self, headers):
+        delay = retry_after(headers)
+        if delay is not None and delay > 0:
+            self.paused_until = max(self.paused_until, time.monotonic() + delay)
+
+
+def estimate_tokens(messages, max_tokens=None):
+    chars = 0
+    for message in messages:
+        content = message.get("content", "")
+        if isinstance(content, str):
+            chars += len(content)
+            continue
+        for part in content:
+            chars += len(part.get("text", "")) if part.get("type") == "text" else 4000
+    return chars // 4 + (max_tokens or 0)
+
+
+# AsyncOpenAI on a background event loop. Requests from any thread share the loop,
+# so attempts running in different threads overlap their round trips while at most
+# max_concurrency requests are in flight. create() is the blocking bridge used by
+# the synchronous pipeline, submit() returns a concurrent.futures.Future.
+class AsyncLLMClient:
+    def __init__(self, api_key=None, base_url=None, max_concurrency=4,
+                 requests_per_minute=0, tokens_per_minute=0):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._loop = None
+        self._thread = None
+        self._client = None
+        self._semaphore = None
+        self._limiter = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        # Started on first use so processes that never talk to the model
+        # (e.g. simulation workers importing run.py) do not get a loop thread.
+        with self._lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=loop.run_forever, name="llm-client", daemon=True)
+            self._thread.start()
+            self._loop = loop
+            asyncio.run_coroutine_threadsafe(self._setup(), loop).result()
+
+    async def _setup(self):
+        # Retries are done by RetryPolicy in the caller, not inside the SDK.
+        self._client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, max_retries=0)
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._limiter = RateLimiter(self.requests_per_minute, self.tokens_per_minute)
+
+    async def acreate(self, stats=None, **kwargs):
+        estimated = estimate_tokens(kwargs.get("messages", []), kwargs.get("max_tokens"))
+        async with self._semaphore:
+            waited = await self._limiter.acquire(estimated)
+            if stats is not None:
+                stats["requests"] += 1
+                stats["rate_limit_wait"] += waited
+            try:
+                response = await self._client.chat.completions.with_raw_response.create(**kwargs)
+            except openai.APIStatusError as e:
+                self._limiter.observe(e.response.headers)
+                self._limiter.settle(estimated, 0)
+                raise
+            self._limiter.observe(response.headers)
+            completion = response.parse()
+            if inspect.isawaitable(completion):
+                completion = await completion
+        usage = getattr(completion, "usage", None)
+        self._limiter.settle(estimated, getattr(usage, "total_tokens", None))
+        return completion
+
+    def submit(self, stats=None, **kwargs):
+        self._start()
+        return asyncio.run_coroutine_threadsafe(self.acreate(stats=stats, **kwargs), self._loop)
+
+    def create(self, stats=None, **kwargs):
+        return self.submit(stats=stats, **kwargs).result()
+
+    def close(self):
+        with self._lock:
+            loop, self._loop = self._loop, None
+        if loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._client.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        self._thread.join()
+        loop.close()
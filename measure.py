@@ -0,0 +1,192 @@
+import numpy as np
+
+# Waveform measurements shared by the testbenches in problem_check/. Every
+# function works on whole NumPy arrays (no per-sample Python loops), takes the
+# time / frequency axis and the waveform as returned by PySpice, and returns
+# plain floats or arrays. Missing measurements are None (trigger points) or
+# nan (periods, settling), never an exception.
+#
+# test_measure.py checks the functions against the loop versions the
+# testbenches used before; `python measure.py` times both.
+
+
+def crossing_indices(y, level, direction=0):
+    # i where y[i] and y[i + 1] lie on different sides of level; direction 1
+    # keeps only upward crossings, -1 only downward ones
+    above = np.asarray(y) > level
+    change = above[1:] != above[:-1]
+    if direction > 0:
+        change &= above[1:]
+    elif direction < 0:
+        change &= above[:-1]
+    return np.flatnonzero(change)
+
+
+def crossings(x, y, level, direction=0):
+    # x positions of the level crossings of y(x), linearly interpolated
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    i = crossing_indices(y, level, direction)
+    dy = y[i + 1] - y[i]
+    t = np.divide(level - y[i], dy, out=np.zeros_like(dy), where=dy != 0)
+    return x[i] + t * (x[i + 1] - x[i])
+
+
+def edges(time, v, level=None):
+    # rising and falling edge times at level (default: half way between the
+    # waveform's extremes)
+    v = np.asarray(v, dtype=float)
+    if level is None:
+        level = (np.max(v) + np.min(v)) / 2
+    return crossings(time, v, level, 1), crossings(time, v, level, -1)
+
+
+def period(event_times):
+    # mean spacing of repeating events (edges, peaks) and its relative spread
+    periods = np.diff(np.asarray(event_times, dtype=float))
+    if len(periods) == 0:
+        return np.nan, np.nan
+    mean = np.mean(periods)
+    return mean, np.std(periods) / mean if mean != 0 else np.nan
+
+
+def frequency(time, v, level=None):
+    # from the rising edges; nan with fewer than two of them
+    mean, _ = period(edges(time, v, level)[0])
+    return 1 / mean if mean > 0 else np.nan
+
+
+def amplitude(v):
+    # peak to peak
+    v = np.asarray(v, dtype=float)
+    return float(np.max(v) - np.min(v))
+
+
+def levels(v, threshold=None):
+    # mean of the samples above threshold and of those at or below it, i.e.
+    # the high and low level of a square-ish wave
+    v = np.asarray(v, dtype=float)
+    if threshold is None:
+        threshold = (np.max(v) + np.min(v)) / 2
+    high = v > threshold
+    n_high = np.count_nonzero(high)
+    high_level = np.sum(v, where=high) / n_high if n_high else np.nan
+    low_level = np.sum(v, where=~high) / (len(v) - n_high) if n_high < len(v) else np.nan
+    return high_level, low_level
+
+
+def duty_cycle(time, v, level=None):
+    # share of the time spent above level
+    time, v = np.asarray(time, dtype=float), np.asarray(v, dtype=float)
+    if level is None:
+        level = (np.max(v) + np.min(v)) / 2
+    return float(np.sum(np.diff(time) * (v[:-1] > level)) / (time[-1] - time[0]))
+
+
+def settling_time(time, v, final=None, tolerance=0.02):
+    # time from the first sample until v stays within tolerance (relative to
+    # the step size) of its final value; nan if it never does
+    time, v = np.asarray(time, dtype=float), np.asarray(v, dtype=float)
+    if final is None:
+        final = v[-1]
+    band = tolerance * (abs(final - v[0]) or abs(final))
+    outside = np.flatnonzero(np.abs(v - final) > band)
+    if len(outside) == 0:
+        return 0.0
+    if outside[-1] == len(v) - 1:
+        return np.nan
+    return float(time[outside[-1] + 1] - time[0])
+
+
+def harmonics(time, v, fundamental, count=5, points_per_period=64):
+    # amplitudes of the first `count` harmonics of fundamental, from the last
+    # whole number of periods resampled onto a uniform grid (transient time
+    # steps are not uniform)
+    time, v = np.asarray(time, dtype=float), np.asarray(v, dtype=float)
+    periods = int(np.floor((time[-1] - time[0]) * fundamental))
+    if periods < 1:
+        return np.full(count, np.nan)
+    n = periods * points_per_period
+    grid = time[-1] - periods / fundamental + np.arange(n) / (n / periods * fundamental)
+    samples = np.interp(grid, time, v)
+    k = np.arange(1, count + 1)
+    basis = np.exp(-2j * np.pi * fundamental * np.outer(k, grid - grid[0]))
+    return 2 * np.abs(basis @ samples) / n
+
+
+def thd(time, v, fundamental, count=5):
+    # total harmonic distortion up to the count-th harmonic, as a ratio
+    amplitudes = harmonics(time, v, fundamental, count)
+    return float(np.sqrt(np.sum(amplitudes[1:] ** 2)) / amplitudes[0])
+
+
+def corner_frequency(frequencies, gain_db, level_db=None, start_index=0, direction=1):
+    # first frequency where the gain crosses level_db (default: 3 dB below the
+    # maximum), scanning from start_index towards higher (direction=1) or lower
+    # (-1) frequencies; interpolated in log f, nan without a crossing
+    frequencies, gain_db = np.asarray(frequencies, dtype=float), np.asarray(gain_db, dtype=float)
+    if level_db is None:
+        level_db = np.max(gain_db) - 3
+    i = crossing_index(gain_db, level_db, start_index, direction)
+    if i is None:
+        return np.nan
+    low, high = np.log10(frequencies[i]), np.log10(frequencies[i + 1])
+    return float(10 ** crossings([low, high], gain_db[i:i + 2], level_db)[0])
+
+
+def crossing_index(y, level, start_index=0, direction=1):
+    # first crossing_indices() entry met when scanning from start_index up
+    # (direction=1) or down (-1); None if there is none
+    if direction > 0:
+        i = crossing_indices(np.asarray(y)[start_index:], level)
+        return int(i[0]) + start_index if len(i) else None
+    i = crossing_indices(np.asarray(y)[:start_index + 1], level)
+    return int(i[-1]) if len(i) else None
+
+
+def closest_index(values, target, keys=None):
+    # index of the value closest to target; among equally close values the one
+    # with the largest key at or above target wins, else the first one
+    values = np.asarray(values, dtype=float)
+    keys = np.arange(len(values)) if keys is None else np.asarray(keys, dtype=float)
+    distance = np.abs(values - target)
+    candidates = np.flatnonzero(distance == np.min(distance))
+    above = candidates[values[candidates] >= target]
+    if len(above):
+        return int(above[np.argmax(keys[above])])
+    return int(candidates[0])
+
+
+def hysteresis(vin, vout, threshold):
+    # input voltages at which vout first crosses threshold while vin rises and
+    # while vin falls (None when it does not), from the samples of each slope
+    vin, vout = np.asarray(vin, dtype=float), np.asarray(vout, dtype=float)
+    slope = np.diff(vin)
+    triggers = []
+    for indices in [np.flatnonzero(slope > 0), np.flatnonzero(slope < 0)]:
+        points = crossings(vin[indices], vout[indices], threshold)
+        triggers.append(float(points[0]) if len(points) else None)
+    return tuple(triggers)
+
+
+if __name__ == "__main__":
+    import timeit
+
+    from test_measure import (loop_closest, loop_crossing, loop_hysteresis, loop_levels, lowpass_response,
+                              schmitt_response, transient_time)
+
+    def bench(name, vectorized, loop, number=20):
+        new = timeit.timeit(vectorized, number=number) / number
+        old = timeit.timeit(loop, number=number) / number
+        print(f"{name:<16}{old * 1e3:>10.3f} ms{new * 1e3:>10.3f} ms{old / new:>8.1f}x")
+
+    time = transient_time()
+    square = 2.5 + 0.6 * np.sign(np.sin(2 * np.pi * 10 * time))
+    frequencies, gain_db = lowpass_response()
+    vin, vout = schmitt_response()
+
+    print(f"{'measurement':<16}{'loop':>13}{'vectorized':>13}{'speedup':>9}")
+    bench("levels", lambda: levels(square, 2.5), lambda: loop_levels(square, 2.5), number=3)
+    bench("closest_index", lambda: closest_index(np.sin(time), 0.5, time),
+          lambda: loop_closest(np.sin(time), time, 0.5), number=3)
+    bench("hysteresis", lambda: hysteresis(vin, vout, 2.5), lambda: loop_hysteresis(vin, vout, 2.5))
+    bench("crossing", lambda: crossing_index(gain_db, -60), lambda: loop_crossing(frequencies, gain_db, -60), 200)
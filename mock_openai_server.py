@@ -0,0 +1,153 @@
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A minimal OpenAI-compatible /v1/chat/completions endpoint for running run.py
+# without a real model, e.g.
+#   python mock_openai_server.py --answer sample_design/p1/p1.py --latency 2
+#   python run.py --task_id 1 --base_url http://127.0.0.1:8000/v1 --api_key mock
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--host", type=str, default="127.0.0.1")
+parser.add_argument("--port", type=int, default=8000)
+parser.add_argument("--answer", type=str, default=None, help="python file returned as the code block of every answer")
+parser.add_argument("--latency", type=float, default=0.0, help="seconds before each response")
+parser.add_argument("--error_rate", type=float, default=0.0, help="fraction of requests answered with 429")
+parser.add_argument("--retry_after", type=float, default=1.0, help="Retry-After seconds sent with a 429")
+parser.add_argument("--rpm", type=int, default=0, help="requests per minute before answering 429 (0 = no limit)")
+
+stats = {"requests": 0, "in_flight": 0, "max_in_flight": 0}
+stats_lock = threading.Lock()
+request_times = []
+
+
+def make_answer(answer_path):
+    if answer_path is None:
+        code = "from PySpice.Spice.Netlist import Circuit\nfrom PySpice.Unit import *\n\n" \
+               "circuit = Circuit('mock')\n" \
+               "circuit.V('dd', 'Vdd', circuit.gnd, 5.0)\n" \
+               "circuit.R('1', 'Vdd', 'Vout', 1@u_kOhm)\n" \
+               "circuit.R('2', 'Vout', circuit.gnd, 1@u_kOhm)\n" \
+               "simulator = circuit.simulator()\n"
+    else:
+        code = open(answer_path, "r").read()
+    return "Here is the design.\n```python\n" + code + "\n```\n"
+
+
+def make_completion(model, content, prompt_tokens):
+    completion_tokens = len(content.split())
+    return {
+        "id": "chatcmpl-" + uuid.uuid4().hex,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+class Handler(BaseHTTPRequestHandler):
+    answer = ""
+    latency = 0.0
+    error_rate = 0.0
+    retry_after = 1.0
+    rpm = 0
+
+    def rate_limit_headers(self):
+        # Sliding one-minute window, reported with OpenAI's x-ratelimit-* headers.
+        if self.rpm <= 0:
+            return True, {}
+        now = time.time()
+        with stats_lock:
+            while request_times and request_times[0] < now - 60:
+                request_times.pop(0)
+            allowed = len(request_times) < self.rpm
+            if allowed:
+                request_times.append(now)
+            reset = 60 - (now - request_times[0]) if request_times else 0.0
+            remaining = self.rpm - len(request_times)
+        headers = {
+            "x-ratelimit-limit-requests": str(self.rpm),
+            "x-ratelimit-remaining-requests": str(remaining),
+            "x-ratelimit-reset-requests": f"{reset:.3f}s",
+        }
+        if not allowed:
+            headers["Retry-After"] = f"{reset:.3f}"
+        return allowed, headers
+
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/stats"):
+            with stats_lock:
+                self.send_json(200, dict(stats))
+        else:
+            self.send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_json(404, {"error": {"message": "not found"}})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with stats_lock:
+            stats["requests"] += 1
+            stats["in_flight"] += 1
+            stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        try:
+            time.sleep(self.latency)
+            allowed, headers = self.rate_limit_headers()
+            if not allowed:
+                self.send_json(429, {"error": {"message": "Rate limit reached", "type": "requests"}}, headers)
+                return
+            if random.random() < self.error_rate:
+                self.send_json(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                               {"Retry-After": str(self.retry_after)})
+                return
+            prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in request.get("messages", []))
+            self.send_json(200, make_completion(request.get("model", "mock"), self.answer, prompt_tokens), headers)
+        finally:
+            with stats_lock:
+                stats["in_flight"] -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    args = parser.parse_args()
+    Handler.answer = make_answer(args.answer)
+    Handler.latency = args.latency
+    Handler.error_rate = args.error_rate
+    Handler.retry_after = args.retry_after
+    Handler.rpm = args.rpm
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    print(f"mock OpenAI server on http://{args.host}:{args.port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import os
+
+from netlist_graph import REGION_CHECKS, NetlistGraph
+from warm_start import load_operating_point
+
+# Operating-point check of basic tasks: input / output nodes present, and every
+# MOSFET in a region where the circuit can work (netlist_graph region checks),
+# plus the structure some tasks ask for (resistor load, Miller capacitor,
+# diode-connected load, ...). Runs in the simulation script before the
+# functional check (basic_eval) and in run.py with --no_fused_eval.
+
+
+# check_netlist messages per failed MOSFET region check (netlist_graph.REGION_CHECKS);
+# "vds" / "vgs" follow the drain / gate findings that need a fix
+_REGION_MESSAGES = {
+    "NMOS": {
+        "drain_on_rail": "Suggetions: Please avoid connect {mos_type} {name} drain to the ground.\n",
+        "drain_at_rail": "For {mos_type} {name}, the drain node ({drain}) voltage is 0.\n",
+        "vds_reversed": "For {mos_type} {name}, the drain node ({drain}) voltage is lower than the source node ({source}) voltage.\n",
+        "vds": "Suggestion: Please set {mos_type} {name} with an activated state and make sure V_DS > V_GS - V_TH.\n",
+        "vgs_reversed": "For {mos_type} {name}, the gate node ({gate}) voltage is lower than the source node ({source}) voltage.\n",
+        "below_threshold": "For {mos_type} {name}, the gate node ({gate}) voltage is lower than the source node ({source}) voltage plus the threshold voltage.\n",
+        "vgs": "Suggestion: Please set {mos_type} {name} with an activated state by increasing the gate voltage or decreasing the source voltage and make sure V_GS > V_TH.\n",
+    },
+    "PMOS": {
+        "drain_on_rail": "Suggestion: Please avoid connect {mos_type} {name} drain to the vdd.\n",
+        "drain_at_rail": "For {mos_type} {name}, the drain node ({drain}) voltage is V_dd.\n",
+        "vds_reversed": "For {mos_type} {name}, the drain node ({drain}) voltage is higher than the source node ({source}) voltage.\n",
+        "vds": "Suggestion: Please set {mos_type} {name} with an activated state and make sure V_DS < V_GS - V_TH.\n",
+        "vgs_reversed": "For {mos_type} {name}, the gate node ({gate}) voltage is higher than the source node ({source}) voltage.\n",
+        "below_threshold": "For {mos_type} {name}, the gate node ({gate}) voltage is higher than the source node ({source}) voltage plus the threshold voltage.\n",
+        "vgs": "Suggestion: Please set {mos_type} {name} with an activated state by decreasing the gate voltage or incresing the source voltage and make sure V_GS < V_TH.\n",
+    },
+}
+for _messages in _REGION_MESSAGES.values():
+    _messages["gate_source_short"] = "For {mos_type} {name}, the gate node ({gate}) is connected to the source node ({source}).\n" \
+        "Suggestion: Please {mos_type} {name}, please divide its gate ({gate}) and source ({source}) connection.\n"
+    _messages["vgs_zero"] = "For {mos_type} {name}, the gate node ({gate}) voltage is equal to the source node ({source}) voltage.\n"
+
+
+def check_netlist(netlist_path, operating_point_path, input, output, task_id, task_type, optimize = False):
+    warning = 0
+    warning_message = ""
+    if not os.path.exists(operating_point_path):
+        return 0, ""
+    voltages = load_operating_point(operating_point_path)
+    # matched as part of a node name of the op point
+    for input_node in input.split(", "):
+        if not any(input_node.lower() in node for node in voltages):
+            warning_message += "The given input node ({}) is not found in the netlist.\n".format(input_node)
+            warning = 1
+    for output_node in output.split(", "):
+        if not any(output_node.lower() in node for node in voltages):
+            warning_message += "The given output node ({}) is not found in the netlist.\n".format(output_node)
+            warning = 1
+
+    if warning == 1:
+        warning_message += "Suggestion: You can replace the nodes actually used for input/output with the given names. Please rewrite the corrected complete code.\n"
+
+    if task_type == "Inverter":
+        return warning, warning_message
+    with open(netlist_path, 'r') as f:
+        graph = NetlistGraph(f.read(), voltages)
+    vdd_voltage = graph.voltage("vdd", 5.0)
+
+    if graph.voltage("vinn", 1.0) != graph.voltage("vinp", 1.0):
+        warning_message += "The given input voltages of Vinn and Vinp are not equal.\n"
+        warning = 1
+        warning_message += "Suggestion: Please make sure the input voltages are equal.\n"
+
+    vthn = 0.5
+    vthp = 0.5
+
+    if optimize:
+        vthn = 0.01
+        vthp = 0.01
+    # all region checks of all MOSFETs in one pass over the graph's arrays
+    regions = graph.mosfet_regions(vthn, vthp, vdd_voltage)
+    for i, device in enumerate(graph.mosfets):
+        drain, gate = device.terminals["drain"], device.terminals["gate"]
+        if task_id == 4:
+            if drain == "vin" or gate == "vin":
+                warning_message += (f"For a common-gate amplifier, the vin should be connected to source.\n")
+                warning_message += (f"Suggestion: Please connect the vin to the source node.\n")
+                warning = 1
+        elif task_id == 3:
+            if drain == "vout" or gate == "vout":
+                warning_message += (f"For a common-drain amplifier, the vout should be connected to source.\n")
+                warning_message += (f"Suggestion: Please connect the vout to the source node.\n")
+                warning = 1
+
+        mos_type = "NMOS" if graph.polarity[i] > 0 else "PMOS"
+        messages = _REGION_MESSAGES[mos_type]
+        fields = dict(device.terminals, mos_type=mos_type, name=device.name)
+        for checks, suggestion in [(REGION_CHECKS[:3], "vds"), (REGION_CHECKS[3:], "vgs")]:
+            failed = [check for check in checks if regions[check][i]]
+            for check in failed:
+                warning_message += messages[check].format(**fields)
+            if set(failed) - {"drain_on_rail", "gate_source_short"}:
+                warning_message += messages[suggestion].format(**fields)
+
+    resistance_exist = len(graph.devices_of("R")) > 0
+    has_diodeload = bool(graph.diode_connected().any())
+    # the first stage drives the second one from the drain of the input transistor
+    input_devices = graph.devices_at("vin", kind="M", terminal="gate")
+    first_stage_out = input_devices[-1][0].terminals["drain"] if input_devices else None
+    capacitors = graph.devices_of("C")
+    if task_id in [1, 2, 3, 4, 5, 6, 8, 13]:
+        if resistance_exist == 0:
+            warning_message += "There is no resistance in the netlist.\n"
+            warning_message += "Suggestion: Please add a resistance load in the netlist.\n"
+            warning = 1
+    if task_id == 9:
+        if first_stage_out == None:
+            warning_message += "There is no first stage output in the netlist.\n"
+            warning_message += "Suggestion: Please add a first stage output in the netlist.\n"
+            warning = 1
+        elif any(graph.connects(capacitor, first_stage_out, "vout") for capacitor in capacitors):
+            pass
+        elif not capacitors:
+            warning_message += "There no Miller capacitor in the netlist.\n"
+            warning_message += "Suggestion: Please correctly connect the Miller compensation capacitor."
+            warning = 1
+        else:
+            warning_message += "The Miller compensation capacitor is not correctly connected.\n"
+            warning_message += "Suggestion: Please correctly connect the Miller compensation capacitor."
+            warning = 1
+    if task_id == 10 and has_diodeload == 0:
+        warning_message += "There is no diode-connected load in the netlist.\n"
+        warning_message += "Suggestion: Please add a diode-connected load in the netlist.\n"
+        warning = 1
+    warning_message = warning_message.strip()
+    if warning_message == "":
+        warning = 0
+    else:
+        warning = 1
+        warning_message = "According to the operating point check, there are some issues, which defy the general operating principles of MOSFET devices. \n" + warning_message + "\n"
+        warning_message += "\nPlease help me fix the issues and rewrite the corrected complete code.\n"
+    return warning, warning_message
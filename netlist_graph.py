@@ -0,0 +1,176 @@
+import sys
+
+import numpy as np
+
+from warm_start import load_operating_point
+
+# Parsed form of a flat SPICE netlist (netlist.sp / str(circuit)) and its
+# operating point (p{id}_{it}_{k}_op.txt): devices with named terminals,
+# node -> (device, terminal) adjacency and the node voltages as one array
+# indexed like graph.nodes (nan where the op file has no value, 0 for ground).
+# The MOSFETs are also kept as index arrays per terminal, so the region
+# checks of netlist_check.check_netlist are evaluated for all of them at once:
+#
+#   graph = NetlistGraph.from_files("p1_0_0_netlist.sp", "p1_0_0_op.txt")
+#   regions = graph.mosfet_regions(vthn=0.5, vthp=0.5, vdd=5.0)
+#   graph.mosfet_names[regions["below_threshold"]]
+#
+#   python netlist_graph.py <netlist.sp> <op.txt>   # device table
+
+GROUND = ("0", "gnd")
+
+# terminal names by element letter (others: two nodes p, n)
+_TERMINALS = {"M": ("drain", "gate", "source", "bulk"), "R": ("p", "n"), "C": ("p", "n"), "L": ("p", "n"),
+              "V": ("p", "n"), "I": ("p", "n"), "D": ("anode", "cathode"), "Q": ("collector", "base", "emitter"),
+              "E": ("p", "n", "cp", "cn"), "G": ("p", "n", "cp", "cn")}
+
+# order of the checks in mosfet_regions(), as reported by check_netlist
+REGION_CHECKS = ["drain_on_rail", "drain_at_rail", "vds_reversed",
+                 "gate_source_short", "vgs_zero", "vgs_reversed", "below_threshold"]
+
+
+class Device:
+    def __init__(self, name, kind, terminals, model=None):
+        self.name = name            # without the element letter, as in the messages
+        self.kind = kind            # element letter (upper case)
+        self.terminals = terminals  # {terminal: node (lower case)}
+        self.model = model
+
+    @property
+    def nodes(self):
+        return list(self.terminals.values())
+
+
+class NetlistGraph:
+    def __init__(self, netlist, voltages=None):
+        # netlist: its text; voltages: {node: V} as load_operating_point gives
+        self.devices = []
+        depth = 0
+        for line in netlist.split("\n"):
+            fields = line.split()
+            if not fields or fields[0].startswith(("*", "+")):
+                continue
+            keyword = fields[0].lower()
+            if keyword == ".subckt":
+                depth += 1
+            elif keyword == ".ends":
+                depth = max(depth - 1, 0)
+            # only top-level elements: subcircuit bodies have their own nodes
+            if keyword.startswith(".") or depth:
+                continue
+            self.devices.append(_device(fields))
+
+        self.nodes, self.node_index, self.adjacency = [], {}, {}
+        for device in self.devices:
+            for terminal, node in device.terminals.items():
+                self._index(node)
+                self.adjacency.setdefault(node, []).append((device, terminal))
+        voltages = voltages or {}
+        for node in voltages:
+            self._index(node)
+        self.voltages = np.array([voltages.get(node, np.nan) for node in self.nodes], dtype=float)
+        self.voltages[[self.node_index[node] for node in GROUND if node in self.node_index]] = 0.0
+
+        self.mosfets = [device for device in self.devices if device.kind == "M" and len(device.terminals) == 4]
+        self.mosfet_names = np.array([device.name for device in self.mosfets], dtype=object)
+        # +1 NMOS, -1 PMOS: the region conditions of both in one expression
+        self.polarity = np.array([1 if "nmos" in (device.model or "").lower() else -1 for device in self.mosfets],
+                                 dtype=int)
+        self.mosfet_nodes = {terminal: np.array([self.node_index[device.terminals[terminal]] for device in self.mosfets],
+                                                dtype=int)
+                             for terminal in _TERMINALS["M"]}
+
+    @classmethod
+    def from_files(cls, netlist_path, operating_point_path=None):
+        with open(netlist_path, "r") as f:
+            netlist = f.read()
+        voltages = load_operating_point(operating_point_path) if operating_point_path else None
+        return cls(netlist, voltages)
+
+    def _index(self, node):
+        if node not in self.node_index:
+            self.node_index[node] = len(self.nodes)
+            self.nodes.append(node)
+
+    def op_nodes(self):
+        # the nodes that have a voltage
+        return [node for node, voltage in zip(self.nodes, self.voltages) if not np.isnan(voltage)]
+
+    def voltage(self, node, default=np.nan):
+        index = self.node_index.get(node.lower())
+        if index is None or np.isnan(self.voltages[index]):
+            return default
+        return float(self.voltages[index])
+
+    def devices_at(self, node, kind=None, terminal=None):
+        # (device, terminal) pairs connected to node, optionally filtered
+        return [(device, name) for device, name in self.adjacency.get(node.lower(), [])
+                if (kind is None or device.kind == kind) and (terminal is None or name == terminal)]
+
+    def devices_of(self, kind):
+        return [device for device in self.devices if device.kind == kind]
+
+    def connects(self, device, node_a, node_b):
+        # whether device sits between the two (distinct) nodes
+        nodes = device.nodes
+        return node_a.lower() != node_b.lower() and node_a.lower() in nodes and node_b.lower() in nodes
+
+    def terminal_voltages(self, terminal):
+        # voltage of every MOSFET's terminal, in graph.mosfets order
+        return self.voltages[self.mosfet_nodes[terminal]]
+
+    def diode_connected(self):
+        return self.mosfet_nodes["gate"] == self.mosfet_nodes["drain"]
+
+    def mosfet_regions(self, vthn=0.5, vthp=0.5, vdd=5.0):
+        # One boolean array per check (REGION_CHECKS), True where a MOSFET
+        # fails it. The drain checks are exclusive in this order, and so are
+        # the gate checks; a node without a voltage fails nothing.
+        vd, vg, vs = self.terminal_voltages("drain"), self.terminal_voltages("gate"), self.terminal_voltages("source")
+        nmos = self.polarity > 0
+        drain, gate, source = self.mosfet_nodes["drain"], self.mosfet_nodes["gate"], self.mosfet_nodes["source"]
+        # the rail the drain must stay away from: ground for NMOS, VDD for PMOS
+        rail_nodes = np.array([self.node_index.get(node, -1) for node in GROUND + ("vdd",)])
+        on_rail_node = np.where(nmos, np.isin(drain, rail_nodes[:2]), drain == rail_nodes[2])
+        at_rail = vd == np.where(nmos, 0.0, vdd)
+        with np.errstate(invalid="ignore"):
+            vds = self.polarity * (vd - vs)
+            vgs = self.polarity * (vg - vs)
+            equal = vg == vs
+            return {
+                "drain_on_rail": at_rail & on_rail_node,
+                "drain_at_rail": at_rail & ~on_rail_node,
+                "vds_reversed": ~at_rail & (vds < 0),
+                "gate_source_short": equal & (gate == source),
+                "vgs_zero": equal & (gate != source),
+                "vgs_reversed": ~equal & (vgs < 0),
+                "below_threshold": ~equal & (vgs >= 0) & (vgs <= np.where(nmos, vthn, vthp)),
+            }
+
+
+def _device(fields):
+    kind, name = fields[0][0].upper(), fields[0][1:]
+    if kind == "X":
+        # subcircuit instance: its nodes, then the subcircuit name
+        nodes, model = fields[1:-1], fields[-1]
+        names = tuple(f"n{i}" for i in range(len(nodes)))
+    else:
+        names = _TERMINALS.get(kind, ("p", "n"))
+        nodes = fields[1:1 + len(names)]
+        model = fields[1 + len(names)] if kind in "MDQ" and len(fields) > 1 + len(names) else None
+    return Device(name, kind, dict(zip(names, [node.lower() for node in nodes])), model)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("usage: python netlist_graph.py <netlist.sp> <op.txt>")
+        sys.exit(1)
+    graph = NetlistGraph.from_files(sys.argv[1], sys.argv[2])
+    regions = graph.mosfet_regions()
+    print(f"{len(graph.devices)} devices, {len(graph.nodes)} nodes")
+    print(f"{'mosfet':<10}{'type':>6}{'Vd':>9}{'Vg':>9}{'Vs':>9}  failed checks")
+    for i, name in enumerate(graph.mosfet_names):
+        failed = [check for check in REGION_CHECKS if regions[check][i]]
+        print(f"{name:<10}{'NMOS' if graph.polarity[i] > 0 else 'PMOS':>6}"
+              + "".join(f"{graph.terminal_voltages(terminal)[i]:>9.3f}" for terminal in ["drain", "gate", "source"])
+              + "  " + (", ".join(failed) or "-"))
@@ -6,75 +6,48 @@ tolerance = 0.2  # 20% tolerance
 
 # Testing approach: We'll run multiple tests to determine if the circuit functions as an adder
 
-# Test 1: Get baseline with original values
-simulator = circuit.simulator()
+import sys
+import numpy as np
+from dc_grid import dc_grid
+
+# Find the Vin1 and Vin2 sources to modify
+vin_names = {}
+for vin in ['vin1', 'vin2']:
+    for element in circuit.elements:
+        if element.name.lower() == vin or (element.name.lower().startswith('v') and vin in [str(pin.node).lower() for pin in element.pins]):
+            vin_names[vin] = element.name
+            break
+    if vin not in vin_names:
+        print(f"Could not find {vin.capitalize()} source to modify")
+        sys.exit(2)
+
+# Every test point below lies on this grid; it is simulated as one nested DC
+# sweep, vout_grid[i, j] is the output for Vin1 = input_values[i], Vin2 = input_values[j]
+input_values = np.array([2.5, 3.0, 3.5])
 try:
-    analysis_baseline = simulator.operating_point()
+    vout_grid = dc_grid(circuit, 'Vout', vin_names['vin2'], input_values, vin_names['vin1'], input_values)
 except Exception as e:
     print(f"DC analysis failed: {str(e)}")
     sys.exit(2)
 
-baseline_output = float(analysis_baseline.Vout)
+def output_at(v1, v2):
+    # scalars or arrays of input voltages on the grid
+    grid_index = lambda v: np.abs(np.subtract.outer(v, input_values)).argmin(axis=-1)
+    return vout_grid[grid_index(v1), grid_index(v2)]
+
+# Test 1: Get baseline
+baseline_output = float(output_at(v1_amp, v2_amp))
 print(f"Baseline output: {baseline_output:.4f} V with Vin1 = {v1_amp:.4f} V, Vin2 = {v2_amp:.4f} V")
 
 # Test 2: Change Vin1 and check effect
-# First, find the Vin1 source to modify
-vin1_found = False
-for element in circuit.elements:
-    if element.name.lower() == 'vin1' or (element.name.lower().startswith('v') and 'vin1' in [str(pin.node).lower() for pin in element.pins]):
-        circuit.element(element.name).dc_value = v1_amp + 0.5
-        vin1_found = True
-        break
-
-if not vin1_found:
-    print("Could not find Vin1 source to modify")
-    sys.exit(2)
-
-# Run analysis with modified Vin1
-simulator = circuit.simulator()
-try:
-    analysis_vin1_mod = simulator.operating_point()
-except Exception as e:
-    print(f"DC analysis failed with modified Vin1: {str(e)}")
-    sys.exit(2)
-
-vin1_mod_output = float(analysis_vin1_mod.Vout)
-vin1_effect = vin1_mod_output - baseline_output
+vin1_effect = float(output_at(v1_amp + 0.5, v2_amp)) - baseline_output
 print(f"Effect of increasing Vin1 by 0.5V: {vin1_effect:.4f} V change in output")
 
-# Reset Vin1 to original value
-for element in circuit.elements:
-    if element.name.lower() == 'vin1' or (element.name.lower().startswith('v') and 'vin1' in [str(pin.node).lower() for pin in element.pins]):
-        circuit.element(element.name).dc_value = v1_amp
-        break
-
 # Test 3: Change Vin2 and check effect
-vin2_found = False
-for element in circuit.elements:
-    if element.name.lower() == 'vin2' or (element.name.lower().startswith('v') and 'vin2' in [str(pin.node).lower() for pin in element.pins]):
-        circuit.element(element.name).dc_value = v2_amp + 0.5
-        vin2_found = True
-        break
-
-if not vin2_found:
-    print("Could not find Vin2 source to modify")
-    sys.exit(2)
-
-# Run analysis with modified Vin2
-simulator = circuit.simulator()
-try:
-    analysis_vin2_mod = simulator.operating_point()
-except Exception as e:
-    print(f"DC analysis failed with modified Vin2: {str(e)}")
-    sys.exit(2)
-
-vin2_mod_output = float(analysis_vin2_mod.Vout)
-vin2_effect = vin2_mod_output - baseline_output
+vin2_effect = float(output_at(v1_amp, v2_amp + 0.5)) - baseline_output
 print(f"Effect of increasing Vin2 by 0.5V: {vin2_effect:.4f} V change in output")
 
 # Verify adder properties
-import sys
-import numpy as np
 
 # Check if inputs affect the output significantly
 if abs(vin1_effect) < 0.05:
@@ -108,62 +81,27 @@ test_points = [
     (3.0, 3.0),   # Both above reference (baseline)
 ]
 
-results = []
-for v1, v2 in test_points:
-    # Set Vin1
-    for element in circuit.elements:
-        if element.name.lower() == 'vin1' or (element.name.lower().startswith('v') and 'vin1' in [str(pin.node).lower() for pin in element.pins]):
-            circuit.element(element.name).dc_value = v1
-            break
-    
-    # Set Vin2
-    for element in circuit.elements:
-        if element.name.lower() == 'vin2' or (element.name.lower().startswith('v') and 'vin2' in [str(pin.node).lower() for pin in element.pins]):
-            circuit.element(element.name).dc_value = v2
-            break
-    
-    # Run analysis
-    simulator = circuit.simulator()
-    try:
-        analysis = simulator.operating_point()
-        vout = float(analysis.Vout)
-        results.append((v1, v2, vout))
-    except Exception as e:
-        print(f"Analysis failed for Vin1 = {v1:.4f} V, Vin2 = {v2:.4f} V: {str(e)}")
-
-# Calculate the adder's gain factor from data
-input_diffs = []
-output_diffs = []
-
-for i in range(1, len(results)):
-    v1, v2, vout = results[i]
-    v1_ref, v2_ref, vout_ref = results[0]  # Reference point (both at 2.5V)
-    
-    input_diff = (v1 - bias_voltage) + (v2 - bias_voltage)
-    output_diff = vout_ref - vout  # For inverting adder, output decreases as input increases
-    
-    if abs(input_diff) > 0.01:  # Avoid division by near-zero
-        input_diffs.append(input_diff)
-        output_diffs.append(output_diff)
+v1_points, v2_points = np.array(test_points).T
+vout_points = output_at(v1_points, v2_points)
+
+# Calculate the adder's gain factor from data, relative to the reference point (both at 2.5V)
+input_diffs = (v1_points[1:] - bias_voltage) + (v2_points[1:] - bias_voltage)
+output_diffs = vout_points[0] - vout_points[1:]  # For inverting adder, output decreases as input increases
+usable = np.abs(input_diffs) > 0.01  # Avoid division by near-zero
 
 # Calculate average gain factor
-if input_diffs:
-    gain_factors = [o/i for i, o in zip(input_diffs, output_diffs)]
-    avg_gain = sum(gain_factors) / len(gain_factors)
+if np.any(usable):
+    avg_gain = np.mean(output_diffs[usable] / input_diffs[usable])
 else:
     avg_gain = 0.5  # Default fallback if we couldn't calculate
 
 # Verify if output follows the adder formula with the determined gain
-all_valid = True
-for v1, v2, actual_vout in results:
-    # Expected output based on inverting adder formula with measured gain
-    expected_vout = bias_voltage - avg_gain * ((v1 - bias_voltage) + (v2 - bias_voltage))
-    
-    # Check if within tolerance
-    if not np.isclose(actual_vout, expected_vout, rtol=tolerance):
-        all_valid = False
-        print(f"Output doesn't match formula at Vin1={v1:.2f}V, Vin2={v2:.2f}V:")
-        print(f"  Expected: {expected_vout:.4f}V, Actual: {actual_vout:.4f}V")
+expected_vouts = bias_voltage - avg_gain * ((v1_points - bias_voltage) + (v2_points - bias_voltage))
+valid = np.isclose(vout_points, expected_vouts, rtol=tolerance)
+all_valid = bool(np.all(valid))
+for v1, v2, expected_vout, actual_vout in zip(v1_points[~valid], v2_points[~valid], expected_vouts[~valid], vout_points[~valid]):
+    print(f"Output doesn't match formula at Vin1={v1:.2f}V, Vin2={v2:.2f}V:")
+    print(f"  Expected: {expected_vout:.4f}V, Actual: {actual_vout:.4f}V")
 
 if not all_valid:
     print("The circuit does not consistently follow the adder formula within 20% tolerance")
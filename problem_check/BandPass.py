@@ -11,13 +11,6 @@ if not has_vin:
 import sys
 import numpy as np
 import matplotlib.pyplot as plt
-try:
-    # Only AC analysis
-    ac_analysis = simulator.ac(start_frequency=1@u_Hz, stop_frequency=1@u_GHz, 
-                              number_of_points=1000, variation='dec')
-except:
-    print("Analysis failed.")
-    sys.exit(2)
 
 node = 'Vout'
 has_node = False
@@ -36,11 +29,18 @@ if has_node == False:
                 node = str(pin.node)
                 break
 
+from ac_sweep import AcSweep
+try:
+    # Only AC analysis: 50 points per decade, refined around the peak and its -3dB points
+    sweep = AcSweep(simulator, node, start_frequency=1, stop_frequency=1e9)
+except:
+    print("Analysis failed.")
+    sys.exit(2)
+
 # Get frequency response data
-frequencies = np.array(ac_analysis.frequency)
-vout_ac = np.array(ac_analysis[node])
-gain_db = 20 * np.log10(np.abs(vout_ac)+1e-12)  # Avoid log(0)
-phase = np.angle(vout_ac, deg=True)
+frequencies = sweep.frequencies
+gain_db = sweep.gain_db  # floored at -240 dB to avoid log(0)
+phase = sweep.phase
 
 # Create frequency domain plot
 plt.figure(figsize=(10, 6))
@@ -57,8 +57,7 @@ plt.tight_layout()
 plt.savefig('[FIGURE_PATH].png')
 
 max_gain_idx = np.argmax(gain_db)
-max_gain = gain_db[max_gain_idx]
-peak_freq = frequencies[max_gain_idx]
+peak_freq, max_gain = sweep.extremum("max")
 
 print(f"Maximum gain: {max_gain:.2f} dB at frequency {peak_freq:.2e} Hz")
 
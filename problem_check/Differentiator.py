@@ -124,9 +124,10 @@ trough_voltages = vout[troughs]
 mean_peak = np.mean(peak_voltages)
 mean_trough = np.mean(trough_voltages)
 
+from measure import levels
+
 def is_square_wave(waveform, mean_peak, mean_trough, rtol=0.1):
-    high_level = np.mean([x for x in waveform if x > (mean_peak + mean_trough) / 2])
-    low_level = np.mean([x for x in waveform if x <= (mean_peak + mean_trough) / 2])
+    high_level, low_level = levels(waveform, (mean_peak + mean_trough) / 2)
     is_high_close = np.isclose(high_level, mean_peak, rtol=rtol)
     is_low_close = np.isclose(low_level, mean_trough, rtol=rtol)
     return is_high_close and is_low_close
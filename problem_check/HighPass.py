@@ -11,16 +11,7 @@ if not has_vin:
 import sys
 import numpy as np
 import matplotlib.pyplot as plt
-try:
-    # Only AC analysis
-    ac_analysis = simulator.ac(start_frequency=1@u_Hz, stop_frequency=1@u_GHz, 
-                              number_of_points=1000, variation='dec')
-except:
-    print("Analysis failed.")
-    sys.exit(2)
 
-# Get frequency response data
-frequencies = np.array(ac_analysis.frequency)
 
 node = 'Vout'
 
@@ -40,9 +31,18 @@ if has_node == False:
                 node = str(pin.node)
                 break
 
-vout_ac = np.array(ac_analysis[node])
-gain_db = 20 * np.log10(np.abs(vout_ac))
-phase = np.angle(vout_ac, deg=True)
+from ac_sweep import AcSweep
+try:
+    # Only AC analysis: 50 points per decade, refined around the -3dB point
+    sweep = AcSweep(simulator, node, start_frequency=1, stop_frequency=1e9)
+except:
+    print("Analysis failed.")
+    sys.exit(2)
+
+# Get frequency response data
+frequencies = sweep.frequencies
+gain_db = sweep.gain_db
+phase = sweep.phase
 
 # Create frequency domain plot
 plt.figure(figsize=(10, 6))
@@ -66,25 +66,13 @@ print(f"Gain at lowest frequency ({frequencies[0]:.2f} Hz): {low_freq_gain:.2f}
 low_freq_attenuation = high_freq_gain - low_freq_gain
 print(f"Low frequency attenuation: {low_freq_attenuation:.2f} dB")
 
-idx_3db = np.argmin(np.abs(gain_db - (high_freq_gain-3)))
-cutoff_freq = frequencies[idx_3db]
+cutoff_freq, _ = sweep.crossing(high_freq_gain - 3, start_index=len(frequencies) - 1, direction=-1)
 print(f"Approximate -3dB cutoff frequency: {cutoff_freq:.2f} Hz")
 
-window_size = min(11, len(gain_db) // 20)
-if window_size % 2 == 0:
-    window_size += 1
-    
-if window_size > 2:
-    from scipy.signal import savgol_filter
-    smoothed_gain = savgol_filter(gain_db, window_size, 1)
-else:
-    smoothed_gain = gain_db
-    
-diff_gain = np.diff(smoothed_gain)
-non_monotonic_points = np.sum(diff_gain < -0.5)
+non_monotonic_share = sweep.non_monotonic_fraction(rising=True)
 
-if non_monotonic_points > 0:
-    monotonic_percentage = 100 * (1 - non_monotonic_points / len(diff_gain))
+if non_monotonic_share > 0:
+    monotonic_percentage = 100 * (1 - non_monotonic_share)
     print(f"Warning: Gain is not strictly monotonically increasing.")
     print(f"Monotonicity: {monotonic_percentage:.1f}% of frequency points")
     if monotonic_percentage < 90:
@@ -92,7 +80,7 @@ if non_monotonic_points > 0:
 else:
     print("Filter response is monotonically increasing with frequency, as expected.")
 
-if low_freq_attenuation > 2 and (non_monotonic_points == 0 or monotonic_percentage >= 90):
+if low_freq_attenuation > 2 and (non_monotonic_share == 0 or monotonic_percentage >= 90):
     print("The circuit exhibits proper high-pass filter characteristics.")
     sys.exit(0)
 else:
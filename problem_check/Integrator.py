@@ -41,10 +41,10 @@ if c_name is None:
     sys.exit(2)
 circuit.element(c_name).capacitance = "3u"
 
-simulator = circuit.simulator()
-
+from transient_stream import steady_state_transient
+# 800 ms is 40 input periods: settle with 100 us steps, capture the last 200 ms at 1 us
 try:
-    analysis = simulator.transient(step_time=1@u_us, end_time=1000@u_ms, start_time=800@u_ms)
+    analysis, time_offset = steady_state_transient(circuit, 1@u_us, 1000@u_ms, 800@u_ms, 100@u_us)
 except:
     print("analysis failed.")
     sys.exit(2)
@@ -69,7 +69,7 @@ plt.rcParams.update({
 })
 
 # Plot the step response
-time = np.array(analysis.time)
+time = np.array(analysis.time) + time_offset
 vin = np.array(analysis['vin'])
 vout = np.array(analysis['vout'])
 
@@ -11,13 +11,6 @@ if not has_vin:
 import sys
 import numpy as np
 import matplotlib.pyplot as plt
-try:
-    # Only AC analysis
-    ac_analysis = simulator.ac(start_frequency=1@u_Hz, stop_frequency=1@u_GHz, 
-                              number_of_points=1000, variation='dec')
-except:
-    print("Analysis failed.")
-    sys.exit(2)
 
 
 node = 'Vout'
@@ -36,11 +29,18 @@ if has_node == False:
                 node = str(pin.node)
                 break
 
+from ac_sweep import AcSweep
+try:
+    # Only AC analysis: 50 points per decade, refined around the -3dB point
+    sweep = AcSweep(simulator, node, start_frequency=1, stop_frequency=1e9)
+except:
+    print("Analysis failed.")
+    sys.exit(2)
+
 # Get frequency response data
-frequencies = np.array(ac_analysis.frequency)
-vout_ac = np.array(ac_analysis[node])
-gain_db = 20 * np.log10(np.abs(vout_ac))
-phase = np.angle(vout_ac, deg=True)
+frequencies = sweep.frequencies
+gain_db = sweep.gain_db
+phase = sweep.phase
 
 # Create frequency domain plot
 plt.figure(figsize=(10, 6))
@@ -65,25 +65,13 @@ print(f"Gain at highest frequency ({frequencies[-1]:.2f} Hz): {high_freq_gain:.2
 high_freq_attenuation = low_freq_gain - high_freq_gain
 print(f"High frequency attenuation: {high_freq_attenuation:.2f} dB")
 
-idx_3db = np.argmin(np.abs(gain_db - (low_freq_gain-3)))
-cutoff_freq = frequencies[idx_3db]
+cutoff_freq, _ = sweep.crossing(low_freq_gain - 3)
 print(f"Approximate -3dB cutoff frequency: {cutoff_freq:.2f} Hz")
 
-window_size = min(11, len(gain_db) // 20)
-if window_size % 2 == 0:
-    window_size += 1
-    
-if window_size > 2:
-    from scipy.signal import savgol_filter
-    smoothed_gain = savgol_filter(gain_db, window_size, 1)
-else:
-    smoothed_gain = gain_db
-    
-diff_gain = np.diff(smoothed_gain)
-non_monotonic_points = np.sum(diff_gain > 0.5)
+non_monotonic_share = sweep.non_monotonic_fraction(rising=False)
 
-if non_monotonic_points > 0:
-    monotonic_percentage = 100 * (1 - non_monotonic_points / len(diff_gain))
+if non_monotonic_share > 0:
+    monotonic_percentage = 100 * (1 - non_monotonic_share)
     print(f"Warning: Gain is not strictly monotonically decreasing.")
     print(f"Monotonicity: {monotonic_percentage:.1f}% of frequency points")
     if monotonic_percentage < 90:
@@ -91,7 +79,7 @@ if non_monotonic_points > 0:
 else:
     print("Filter response is monotonically decreasing with frequency, as expected.")
 
-if high_freq_attenuation > 2 and (non_monotonic_points == 0 or monotonic_percentage >= 90):
+if high_freq_attenuation > 2 and (non_monotonic_share == 0 or monotonic_percentage >= 90):
     print("The circuit exhibits proper low-pass filter characteristics.")
     sys.exit(0)
 else:
@@ -1,6 +1,8 @@
 # Gilbert Cell Mixer Functionality Test with FFT Analysis
 import sys
 import numpy as np
+from measure import closest_index
+import spectrum
 
 detached_voltage_source = ['Vrfp', 'Vrfn', 'Vlop', 'Vlon']
 for source in detached_voltage_source:
@@ -27,25 +29,11 @@ voutp = np.array(analysis['Voutp'])
 vlop = np.array(analysis['Vlop'])
 
 
-# find the best operating point for Vrfp which can make the Voutp closest to 2.5V
-best_i = 0
-best_vlop = 2.5
-for i in range(len(voutp)):
-    # If current voutp is closer to 2.5V than the previously found best
-    if abs(voutp[i] - 2.5) < abs(voutp[best_i] - 2.5):
-        best_i = i
-        best_vlop = vlop[i]
-        best_voutp = voutp[i]
-    # If current voutp is equally distant from 2.5V as the previously found best
-    elif abs(voutp[i] - 2.5) == abs(voutp[best_i] - 2.5):
-        # When multiple vlop values meet the requirements, we need to select the one with voutp closest to 2.5V
-        # Since abs(voutp[i] - 2.5) == abs(voutp[best_i] - 2.5), we need to compare actual values
-        # Choose the one closer to 2.5V (to handle cases where one is above 2.5 and one is below)
-        if abs(voutp[i] - 2.5) == (voutp[i] - 2.5):  # Current value is >= 2.5
-            if abs(voutp[best_i] - 2.5) != (voutp[best_i] - 2.5) or vlop[i] > best_vlop:
-                best_i = i
-                best_vlop = vlop[i]
-                best_voutp = voutp[i]
+# find the best operating point for Vrfp which can make the Voutp closest to 2.5V;
+# among equally close points, the highest Vlop with Voutp >= 2.5V
+best_i = closest_index(voutp, 2.5, vlop)
+best_vlop = vlop[best_i]
+best_voutp = voutp[best_i]
 
 
 print(f"Best Vlop: {best_vlop:.2f} V, Best Voutp: {best_voutp:.2f} V")
@@ -107,19 +95,15 @@ vout_diff = voutp - voutn  # Differential output
 
 # Perform FFT analysis
 
-from scipy.fft import fft
 from matplotlib import pyplot as plt
 
-# Calculate FFT
-n = len(time)
-fft_vout = fft(vout_diff)
-fft_magnitude = np.abs(fft_vout) / n * 2  # Normalize magnitude
-freq = np.fft.fftfreq(n, sampling_rate)  # Frequency axis
+rf_freq = 1e3  # 1 kHz
+lo_freq = 1.2e3  # 1.2 kHz
 
-# Keep only positive frequencies
-positive_freq_mask = freq > 0
-freq = freq[positive_freq_mask]
-fft_magnitude = fft_magnitude[positive_freq_mask]
+# Spectrum of the output resampled at the 20x LO rate (ngspice time steps are
+# uneven), over whole periods of all mixing products
+freq, fft_magnitude = spectrum.spectrum(time, vout_diff, rate=1 / sampling_rate,
+                                        base=spectrum.base_frequency([rf_freq, lo_freq]))
 
 # Output major frequency components
 print("\nFFT Analysis Results - Major Frequency Components:")
@@ -129,28 +113,19 @@ for i in indices:
     print(f"Frequency: {freq[i]:.1f} Hz, Magnitude: {fft_magnitude[i]:.6f} V")
 
 # Check for mixing products
-rf_freq = 1e3  # 1 kHz
-lo_freq = 1.2e3  # 1.2 kHz
-expected_if_down = abs(lo_freq - rf_freq)  # Down-conversion: 200 Hz
-expected_if_up = lo_freq + rf_freq  # Up-conversion: 2.2 kHz
-
-# Search for expected IF frequencies in FFT results
-tolerance = 50  # Hz
-found_if_down = False
-found_if_up = False
-if_down_magnitude = 0
-if_up_magnitude = 0
-
-for i, f in enumerate(freq):
-    if abs(f - expected_if_down) < tolerance and fft_magnitude[i] > 1e-3:
-        found_if_down = True
-        if_down_magnitude = fft_magnitude[i]
-        print(f"\nDetected down-conversion IF signal (LO-RF): {f:.1f} Hz, Magnitude: {if_down_magnitude:.6f} V")
-    
-    if abs(f - expected_if_up) < tolerance and fft_magnitude[i] > 1e-3:
-        found_if_up = True
-        if_up_magnitude = fft_magnitude[i]
-        print(f"Detected up-conversion IF signal (LO+RF): {f:.1f} Hz, Magnitude: {if_up_magnitude:.6f} V")
+products = spectrum.mixer_products(time, vout_diff, rf_freq, lo_freq, rate=1 / sampling_rate)
+expected_if_down = products["if_down"]["frequency"]  # Down-conversion: 200 Hz
+expected_if_up = products["if_up"]["frequency"]  # Up-conversion: 2.2 kHz
+
+# Amplitudes of the expected IF tones
+if_down_magnitude = products["if_down"]["amplitude"]
+if_up_magnitude = products["if_up"]["amplitude"]
+found_if_down = if_down_magnitude > 1e-3
+found_if_up = if_up_magnitude > 1e-3
+if found_if_down:
+    print(f"\nDetected down-conversion IF signal (LO-RF): {expected_if_down:.1f} Hz, Magnitude: {if_down_magnitude:.6f} V")
+if found_if_up:
+    print(f"Detected up-conversion IF signal (LO+RF): {expected_if_up:.1f} Hz, Magnitude: {if_up_magnitude:.6f} V")
 
 # Plot transient simulation and FFT results
 plt.figure(figsize=(12, 10))
@@ -247,24 +222,16 @@ plt.savefig('[FIGURE_PATH].png')
 if found_if_down and found_if_up:
     print("\nMixer functioning correctly: Mixing products detected!")
     
-    # Calculate conversion efficiency
-    rf_index = np.argmin(np.abs(freq - rf_freq))
-    rf_magnitude = fft_magnitude[rf_index]
-    
-    if found_if_down:
-        conversion_gain_down = 20 * np.log10(if_down_magnitude / rf_magnitude)
-        print(f"Down-conversion gain: {conversion_gain_down:.2f} dB")
-    
-    if found_if_up:
-        conversion_gain_up = 20 * np.log10(if_up_magnitude / rf_magnitude)
-        print(f"Up-conversion gain: {conversion_gain_up:.2f} dB")
+    # Calculate conversion efficiency (relative to the RF feedthrough)
+    conversion_gain_down = products["if_down"]["gain_db"]
+    print(f"Down-conversion gain: {conversion_gain_down:.2f} dB")
+    conversion_gain_up = products["if_up"]["gain_db"]
+    print(f"Up-conversion gain: {conversion_gain_up:.2f} dB")
     
     # Evaluate LO leakage
-    lo_index = np.argmin(np.abs(freq - lo_freq))
-    lo_leakage = fft_magnitude[lo_index]
-    if found_if_down:
-        lo_rejection = 20 * np.log10(if_down_magnitude / lo_leakage)
-        print(f"LO rejection ratio: {lo_rejection:.2f} dB")
+    lo_leakage = products["lo"]["amplitude"]
+    lo_rejection = 20 * np.log10(if_down_magnitude / lo_leakage) if lo_leakage > 0 else np.inf
+    print(f"LO rejection ratio: {lo_rejection:.2f} dB")
     
     # Overall evaluation
     print("\nMixer performance assessment:")
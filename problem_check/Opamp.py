@@ -1,4 +1,5 @@
-simulator_id = circuit.simulator()
+from spice_session import SpiceSession
+
 mosfet_names = []
 import PySpice.Spice.BasicElement
 for element in circuit.elements:
@@ -9,8 +10,19 @@ mosfet_name_ids = []
 for mosfet_name in mosfet_names:
     mosfet_name_ids.append(f"@{mosfet_name}[id]")
 
-simulator_id.save_internal_parameters(*mosfet_name_ids)
-analysis_id = simulator_id.operating_point()
+# The op point check and both AC runs share one loaded circuit in one ngspice
+# session; without a shared ngspice every analysis runs on the generated
+# simulator. Both use its settings, with the drain currents saved.
+simulator.save_internal_parameters(*mosfet_name_ids)
+try:
+    session = SpiceSession(simulator)
+except ValueError:
+    session = None
+
+if session is not None:
+    analysis_id = session.operating_point()
+else:
+    analysis_id = simulator.operating_point()
 
 id_correct = 1
 for mosfet_name in mosfet_names:
@@ -27,8 +39,11 @@ if id_correct == 0:
 
 
 frequency = 100@u_Hz
-analysis = simulator.ac(start_frequency=frequency, stop_frequency=frequency*10, 
-    number_of_points=2, variation='dec')
+if session is not None:
+    analysis = session.ac(start_frequency=frequency, stop_frequency=frequency)
+else:
+    analysis = simulator.ac(start_frequency=frequency, stop_frequency=frequency*10, 
+        number_of_points=2, variation='dec')
 
 import numpy as np
 
@@ -65,11 +80,16 @@ for element in circuit.elements:
         vinn_name = element.name
 
 
-circuit.element(vinn_name).dc_value += " 180"
+vinn_source = circuit.element(vinn_name)
+if session is not None:
+    # flip the AC phase of Vinn in place: same parsed circuit, same op point
+    session.alter(vinn_source.name, acphase=180)
+    analysis2 = session.ac(start_frequency=frequency, stop_frequency=frequency)
+else:
+    vinn_source.dc_value += " 180"
 
-simulator2 = circuit.simulator()
-analysis2 = simulator2.ac(start_frequency=frequency, stop_frequency=frequency, 
-                        number_of_points=1, variation='dec')
+    analysis2 = simulator.ac(start_frequency=frequency, stop_frequency=frequency, 
+                           number_of_points=1, variation='dec')
 
 output_voltage2 = np.abs(analysis2[node].as_ndarray()[0])
 gain2 = output_voltage2 / (1e-9)
@@ -18,12 +18,6 @@ params = {pin_name: 2.51, pin_name_n: 2.5}
 simulator = circuit.simulator()
 simulator.initial_condition(**params)
 
-try:
-    analysis = simulator.transient(step_time=1@u_us, end_time=20@u_ms)
-except:
-    print("analysis failed.")
-    sys.exit(2)
-
 node = 'Vout'
 # find any node with "vout"
 has_node = False
@@ -42,6 +36,16 @@ if has_node == False:
                 break
 
 import numpy as np
+from transient_stream import streamed_transient, oscillation_verdict
+# stop as soon as the oscillation is clearly steady
+end_time = 20@u_ms
+try:
+    analysis = streamed_transient(simulator, 1@u_us, end_time, 2@u_ms,
+        lambda analysis: oscillation_verdict(np.array(analysis[node]), np.array(analysis.time)))
+except:
+    print("analysis failed.")
+    sys.exit(2)
+
 # Get the output node voltage
 vout = np.array(analysis[node])
 
@@ -51,8 +51,9 @@ for node_name in analysis.nodes.keys():
 
 time = np.array(analysis.time)
 
-from scipy.signal import find_peaks, firwin, lfilter
+from scipy.signal import find_peaks
 import sys
+import spectrum
 import matplotlib.pyplot as plt
 from matplotlib.ticker import ScalarFormatter, FormatStrFormatter
 
@@ -139,17 +140,10 @@ def analyze_last_section(vout, time, fraction=0.5):
 
 last_vout, last_time = analyze_last_section(vout, time, 0.5)
 
-last_vout_ac = last_vout - np.mean(last_vout)
-
-dt = np.mean(np.diff(last_time))
-sampling_freq = 1.0 / dt
-
-fft_result = np.fft.fft(last_vout_ac)
-fft_freq = np.fft.fftfreq(len(last_vout_ac), dt)
-
-positive_freq_idx = fft_freq > 0
-fft_freq_positive = fft_freq[positive_freq_idx]
-fft_magnitude = np.abs(fft_result[positive_freq_idx]) * 2 / len(last_vout_ac)
+# resampled onto a uniform grid at the simulator's typical step (ngspice
+# time steps are uneven), Hann window
+sampling_freq = spectrum.sample_rate(last_time)
+fft_freq_positive, fft_magnitude = spectrum.spectrum(last_time, last_vout, sampling_freq)
 
 axs[2].plot(fft_freq_positive, fft_magnitude, color='blue', linewidth=2)
 axs[2].set_title('FFT Spectrum (Latter Half of Signal)', fontsize=16)
@@ -159,9 +153,10 @@ axs[2].tick_params(axis='both', which='major', labelsize=12)
 axs[2].grid(True, linestyle='--', alpha=0.7)
 axs[2].set_xlim([0, sampling_freq / 2])
 
-peak_idx = np.argmax(fft_magnitude)
-dominant_freq = fft_freq_positive[peak_idx]
-dominant_magnitude = fft_magnitude[peak_idx]
+# fundamental between bins, its amplitude and harmonics over whole periods
+tone = spectrum.tone_analysis(last_time, last_vout, rate=sampling_freq)
+dominant_freq = tone["fundamental"]
+dominant_magnitude = tone["amplitude"]
 
 axs[2].axvline(x=dominant_freq, color='red', linestyle='--', linewidth=2, 
                label=f'Peak: {dominant_freq:.2f} Hz ({dominant_magnitude:.4f} V)')
@@ -170,6 +165,8 @@ axs[2].legend(fontsize=12, loc='best')
 print(f"\nFFT Analysis:")
 print(f"Dominant frequency: {dominant_freq:.2f} Hz")
 print(f"Dominant frequency magnitude: {dominant_magnitude:.6f} V")
+print(f"Harmonic amplitudes: {', '.join(f'{a:.6f}' for a in tone['harmonics'])} V")
+print(f"THD: {100 * tone['thd']:.2f} %, SFDR: {tone['sfdr_db']:.1f} dB")
 print(f"Sampling frequency: {sampling_freq:.2f} Hz")
 
 plt.tight_layout()
@@ -3,10 +3,13 @@ for element in circuit.elements:
         v_name = element.name
 
 circuit.element(v_name).detach()
-circuit.SinusoidalVoltageSource('in', 'Vin', circuit.gnd, 
-                               amplitude=0.8@u_V,
-                               offset=2.5@u_V,
-                               frequency=0.1@u_kHz)
+# The input used to be a 2.5 V +- 0.8 V, 100 Hz sine over 50 ms. The circuit
+# follows it quasi-statically, so one and a half periods of a triangle over
+# the same range (up to 3.3 V, down to 1.7 V, up again) cross both trip points
+# in both directions in a quarter of the simulated time.
+circuit.PieceWiseLinearVoltageSource('in', 'Vin', circuit.gnd,
+                                     values=[(0@u_ms, 2.5@u_V), (2.5@u_ms, 3.3@u_V),
+                                             (7.5@u_ms, 1.7@u_V), (12.5@u_ms, 3.3@u_V)])
 pin_name = "Vinp"
 pin_name_n = "Vinn"
 pin_name_out = "Vout"
@@ -24,13 +27,14 @@ circuit.C('stab3', pin_name_out, circuit.gnd, 1@u_pF)
 
 import sys
 try:
-    analysis = simulator.transient(step_time=10@u_us, end_time=50@u_ms, 
+    analysis = simulator.transient(step_time=10@u_us, end_time=12.5@u_ms, 
                                   use_initial_condition=True)
 except:
     print("Analysis failed.")
     sys.exit(2)
 
 import numpy as np
+from measure import hysteresis
 # Extract data
 time = np.array(analysis.time)
 vin = np.array(analysis['Vin'])
@@ -99,46 +103,14 @@ plt.savefig("[FIGURE_PATH].png")
 print("\nStarting trigger point analysis...")
 
 try:
-    # Find rising edge trigger point
-    rising_cross_indices = np.where(np.diff(vout_rising > threshold) > 0)[0]
-    if len(rising_cross_indices) > 0:
-        rising_index = rising_cross_indices[0]
-        # Use linear interpolation for more precise trigger point
-        v1 = vout_rising[rising_index]
-        v2 = vout_rising[rising_index + 1]
-        i1 = vin_rising[rising_index]
-        i2 = vin_rising[rising_index + 1]
-        
-        # Linear interpolation to calculate exact trigger voltage
-        if v2 != v1:  # Avoid division by zero
-            t = (threshold - v1) / (v2 - v1)
-            trigger_vin_rising = i1 + t * (i2 - i1)
-        else:
-            trigger_vin_rising = i1
-    else:
+    # First threshold crossing of the output on the rising and on the falling
+    # input slope, linearly interpolated
+    trigger_vin_rising, trigger_vin_falling = hysteresis(vin, vout, threshold)
+    if trigger_vin_rising is None:
         print("Warning: No threshold crossing detected for rising edge")
-        trigger_vin_rising = None
-
-    # Find falling edge trigger point
-    falling_cross_indices = np.where(np.diff(vout_falling < threshold) > 0)[0]
-    if len(falling_cross_indices) > 0:
-        falling_index = falling_cross_indices[0]
-        # Use linear interpolation for more precise trigger point
-        v1 = vout_falling[falling_index]
-        v2 = vout_falling[falling_index + 1]
-        i1 = vin_falling[falling_index]
-        i2 = vin_falling[falling_index + 1]
-        
-        # Linear interpolation to calculate exact trigger voltage
-        if v2 != v1:  # Avoid division by zero
-            t = (threshold - v1) / (v2 - v1)
-            trigger_vin_falling = i1 + t * (i2 - i1)
-        else:
-            trigger_vin_falling = i1
-    else:
+    if trigger_vin_falling is None:
         print("Warning: No threshold crossing detected for falling edge")
-        trigger_vin_falling = None
-        
+
     # Output detection results
     if trigger_vin_rising is not None and trigger_vin_falling is not None:
         hysteresis_width = abs(trigger_vin_rising - trigger_vin_falling)
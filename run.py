@@ -1,4 +1,3 @@
-from openai import OpenAI
 import openai
 import argparse
 import re
@@ -10,6 +9,25 @@ import sys
 import shutil
 
 import base64
+import atexit
+import json
+import contextlib
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from sim_pool import SimWorkerPool
+import figure_render
+import sim_cache
+import sim_result
+import waveform_store
+from llm_client import AsyncLLMClient, RetryPolicy, new_wait_stats
+from llm_cache import LLMCache, request_key
+from basic_eval import get_vin_name
+from netlist_check import check_netlist
+from eval_templates import complex_task_type, pyspice_template, output_netlist_template, testbench_template, warm_start_template, \
+    rebias_template, basic_eval_template
+from attempt_trace import AttemptTrace, TRACE_NAME
 
 parser = argparse.ArgumentParser()
 parser.add_argument('--model', type=str, default="gpt-5-mini")
@@ -17,7 +35,7 @@ parser.add_argument('--temperature', type=float, default=0.5)
 parser.add_argument('--num_per_task', type=int, default=30)
 parser.add_argument('--num_of_retry', type=int, default=3)
 parser.add_argument("--num_of_done", type=int, default=0)
-parser.add_argument("--task_id", type=int, default=1)
+parser.add_argument("--task_id", type=str, default="1", help="task ids from problem_set.tsv, e.g. 1 / 1,3,5-8 / all")
 parser.add_argument("--ngspice", action="store_true", default=False)
 parser.add_argument("--no_prompt", action="store_true", default=False)
 parser.add_argument("--no_tool", action="store_true", default=False)
@@ -28,6 +46,25 @@ parser.add_argument("--port", type=int, default=5000)
 parser.add_argument("--no_vlm", action="store_true")
 parser.add_argument("--api_key", type=str, default=None, help="API key (or set OPENAI_API_KEY)")
 parser.add_argument("--base_url", type=str, default=None, help="API base URL (or set OPENAI_BASE_URL)")
+parser.add_argument("--sim_workers", type=int, default=2, help="pre-imported simulation workers (0 = spawn a new interpreter per run)")
+parser.add_argument("--sim_worker_jobs", type=int, default=50, help="recycle a simulation worker after this many runs")
+parser.add_argument("--jobs", type=int, default=1, help="(task_id, it) jobs run at the same time")
+parser.add_argument("--job_executor", type=str, default="process", choices=["process", "thread"], help="run jobs in separate processes or as threads of this process")
+parser.add_argument("--llm_concurrency", type=int, default=0, help="max LLM requests in flight across jobs (0 = --jobs)")
+parser.add_argument("--sim_concurrency", type=int, default=0, help="max simulations running across jobs (0 = --jobs)")
+parser.add_argument("--llm_rpm", type=int, default=0, help="client-side LLM requests per minute (0 = unlimited)")
+parser.add_argument("--llm_tpm", type=int, default=0, help="client-side LLM tokens per minute (0 = unlimited)")
+parser.add_argument("--llm_backoff", type=float, default=2.0, help="base delay (s) of the LLM retry backoff")
+parser.add_argument("--llm_backoff_max", type=float, default=60.0, help="max delay (s) of the LLM retry backoff")
+parser.add_argument("--llm_cache_dir", type=str, default=None, help="cache LLM completions in this directory")
+parser.add_argument("--llm_cache_max_entries", type=int, default=0, help="evict least recently used completions beyond this count (0 = no limit)")
+parser.add_argument("--llm_cache_max_mb", type=int, default=0, help="evict least recently used completions beyond this size (0 = no limit)")
+parser.add_argument("--llm_replay", action="store_true", default=False, help="answer only from --llm_cache_dir, fail on a cache miss")
+parser.add_argument("--sim_cache_dir", type=str, default=None, help="reuse op / dc sweep / testbench results of electrically identical circuits from this directory")
+parser.add_argument("--waveform_dir", type=str, default=None, help="store the node vectors of every analysis in this directory (see waveform_store.py)")
+parser.add_argument("--dc_sweep_file", type=str, default="npy", choices=["npy", "txt", "none"], help="copy of the input dc sweep kept next to the op point (none: only handed over in memory; the --no_fused_eval sweep always writes one)")
+parser.add_argument("--warm_start", action="store_true", default=False, help="seed each retry's op point (.nodeset) with the node voltages of the previous retry")
+parser.add_argument("--no_fused_eval", action="store_true", default=False, help="evaluate basic tasks with separate op / netlist / dc sweep / check runs")
 
 args = parser.parse_args()
 args.api_key = args.api_key or os.environ.get("OPENAI_API_KEY", "")
@@ -35,41 +72,25 @@ args.base_url = args.base_url or os.environ.get("OPENAI_BASE_URL")
 
 if "gpt-5" in args.model:
     args.temperature = 1
-if args.task_id > 50:
-    args.temperature += 0.3
-
-complex_task_type = ['Oscillator', 'Integrator', 'Differentiator', 'OscillatorFFT',
-                     'Adder', 'Subtractor', 'Schmitt', 'VCO', 'PLL', 'Comparator',
-                     'Mixer',
-                     'BandPass', 'BandStop', 'LowPass', 'HighPass'
-                     ]
-bias_usage = "Please increase the gain as much as possible to maintain oscillation."
 
 
-dc_sweep_template = open("dc_sweep_template.py", "r").read()
+def get_temperature(task_id):
+    if task_id > 50:
+        return args.temperature + 0.3
+    return args.temperature
 
-pyspice_template = """
-try:
-    analysis = simulator.operating_point()
-    fopen = open("[OP_PATH]", "w")
-    for node in analysis.nodes.values(): 
-        fopen.write(f"{str(node)}\\t{float(analysis[str(node)][0]):.6f}\\n")
-    fopen.close()
-except Exception as e:
-    print("Analysis failed due to an error:")
-    print(str(e))
-"""
 
+if args.sim_cache_dir is not None:
+    # read by sim_cache in the simulation processes
+    os.environ[sim_cache.CACHE_DIR_ENV] = os.path.abspath(args.sim_cache_dir)
+    os.environ.setdefault(sim_cache.RUN_ID_ENV, f"{os.getpid()}-{time.time():.0f}")
 
-output_netlist_template = """
-source = str(circuit)
-print(source)
-"""
+if args.waveform_dir is not None:
+    # read by waveform_store in the simulation processes
+    os.environ[waveform_store.WAVEFORM_DIR_ENV] = os.path.abspath(args.waveform_dir)
+
+bias_usage = "Please increase the gain as much as possible to maintain oscillation."
 
-import_template = """
-from PySpice.Spice.Netlist import Circuit
-from PySpice.Unit import *
-"""
 
 
 sin_voltage_source_template = """
@@ -82,12 +103,117 @@ optimize_template = open("optimize_template.md", "r").read()
 global client
 
 
-client = OpenAI(api_key=args.api_key, base_url=args.base_url)
+# The rate limits are per client; with one process per job each gets its share.
+llm_processes = args.jobs if args.job_executor == "process" and args.jobs > 1 else 1
+client = AsyncLLMClient(api_key=args.api_key, base_url=args.base_url,
+                        max_concurrency=args.llm_concurrency or args.jobs,
+                        requests_per_minute=args.llm_rpm / llm_processes,
+                        tokens_per_minute=args.llm_tpm / llm_processes)
+retry_policy = RetryPolicy(args.llm_backoff, args.llm_backoff_max)
+
+llm_cache = None
+if args.llm_cache_dir is not None:
+    llm_cache = LLMCache(args.llm_cache_dir, args.llm_cache_max_entries, args.llm_cache_max_mb, replay=args.llm_replay)
+elif args.llm_replay:
+    parser.error("--llm_replay needs --llm_cache_dir")
+atexit.register(client.close)
 
 client_vlm = None
 vlm_model = args.model
 if not args.no_vlm:
-    client_vlm = OpenAI(api_key=args.api_key, base_url=args.base_url)
+    client_vlm = client
+
+
+# Limits shared by all scheduler jobs; main() swaps in process-shared semaphores
+# when several jobs run at once.
+llm_slots = contextlib.nullcontext()
+sim_slots = contextlib.nullcontext()
+# warm interpreters of this process's simulation worker pool
+sim_pool_size = args.sim_workers
+
+
+def init_job_worker(llm_semaphore, sim_semaphore, pool_size=None):
+    global llm_slots, sim_slots, sim_pool_size
+    llm_slots = llm_semaphore
+    sim_slots = sim_semaphore
+    if pool_size is not None:
+        sim_pool_size = pool_size
+
+
+# LLM state of the job running in the current thread: wait statistics, the
+# sample (iteration) index and how often each request was already sent.
+llm_task = threading.local()
+
+
+def start_llm_task(sample):
+    llm_task.stats = new_wait_stats()
+    llm_task.sample = sample
+    llm_task.seen = {}
+
+
+def task_llm_stats():
+    if not hasattr(llm_task, "stats"):
+        start_llm_task(None)
+    return llm_task.stats
+
+
+def chat_completion(llm_client, **kwargs):
+    stats = task_llm_stats()
+    key = None
+    if llm_cache is not None:
+        # Only answered requests count, so a replay sees the same sequence of
+        # answers (empty ones included) as the recorded run.
+        first_key = request_key(kwargs, [llm_task.sample, 0])
+        repeat = llm_task.seen.get(first_key, 0)
+        key = request_key(kwargs, [llm_task.sample, repeat])
+        completion = llm_cache.get(key)
+        if completion is not None:
+            llm_task.seen[first_key] = repeat + 1
+            stats["cache_hits"] += 1
+            return completion
+    start = time.time()
+    with llm_slots:
+        stats["slot_wait"] += time.time() - start
+        completion = llm_client.create(stats=stats, **kwargs)
+    if key is not None:
+        llm_task.seen[first_key] = repeat + 1
+        llm_cache.put(key, kwargs, completion)
+    return completion
+
+
+def trace_completion(trace, name, start, completion, cache_hits, **fields):
+    usage = getattr(completion, "usage", None)
+    trace.add(name, time.time() - start, cached=task_llm_stats()["cache_hits"] > cache_hits,
+              prompt_tokens=getattr(usage, "prompt_tokens", 0), completion_tokens=getattr(usage, "completion_tokens", 0), **fields)
+
+
+sim_pool = None
+sim_pool_lock = threading.Lock()
+
+
+def run_python(file, timeout=None):
+    # a record left by an earlier run of the same file must not be read back
+    # if this one dies before writing its own
+    if os.path.exists(sim_result.result_path(file)):
+        os.remove(sim_result.result_path(file))
+    with sim_slots:
+        return _run_python(file, timeout)
+
+
+def _run_python(file, timeout=None):
+    global sim_pool
+    if args.sim_workers <= 0:
+        env = os.environ.copy()
+        # generated scripts import helpers (basic_eval, ...) from the repo root
+        env["PYTHONPATH"] = os.path.dirname(os.path.abspath(__file__)) + os.pathsep + env.get("PYTHONPATH", "")
+        runner = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sim_result.py")
+        return subprocess.run(["python", "-u", runner, file], check=True, text=True,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout, env=env)
+    with sim_pool_lock:
+        if sim_pool is None:
+            sim_pool = SimWorkerPool(sim_pool_size, args.sim_worker_jobs)
+            atexit.register(sim_pool.close)
+    return sim_pool.run(file, timeout=timeout, check=True)
 
 
 def encode_image(image_path):
@@ -128,275 +254,79 @@ def extract_code(generated_content):
 
     return empty_code_error, new_code
 
-def run_code(file):
-    simulation_error = 0
-    execution_error = 0
+def dc_sweep_path(prefix, required=False):
+    if args.dc_sweep_file == "none" and not required:
+        return ""
+    return prefix + ("_dc.txt" if args.dc_sweep_file == "txt" else "_dc.npy")
+
+
+def get_warm_start_template(operating_point_path):
+    # --warm_start: seeds the circuit with the previous retry's op point
+    if not args.warm_start:
+        return ""
+    return warm_start_template.replace("[OP_PATH]", operating_point_path)
+
+
+def get_eval_template(task_type, operating_point_path, optimize=False, netlist_check=None):
+    # netlist_check: (task_id, input, output) to run check_netlist in the
+    # fused eval, ahead of the functional check
+    if task_type in complex_task_type or args.no_fused_eval:
+        return get_warm_start_template(operating_point_path) + pyspice_template.replace("[OP_PATH]", operating_point_path)
+    prefix = operating_point_path.rsplit("_op.txt", 1)[0]
+    return get_warm_start_template(operating_point_path) + basic_eval_template.replace("[TASK_TYPE]", task_type).replace("[OP_PATH]", operating_point_path) \
+        .replace("[NETLIST_PATH]", prefix + "_netlist.sp").replace("[DC_PATH]", dc_sweep_path(prefix)) \
+        .replace("[TARGET_VOLTAGE]", "2.5" if not optimize else "0.6") \
+        .replace("[NETLIST_CHECK]", repr(netlist_check + (optimize,)) if netlist_check else "None")
+
+
+def record_errors(record, stdout, stderr):
+    # run_code's (execution_error, simulation_error, info, floating_node) from
+    # the record the script wrote instead of from the layout of its output
+    if record["status"] == "ok":
+        return 0, 0, "", ""
+    if record["status"] == "simulation_error":
+        return 0, 1, "Simulation failed.", record["floating_node"]
+    # ngspice prints "singular matrix: check node <name>" to the process's
+    # stderr / stdout, while PySpice's exception only says the command failed
+    floating_node = sim_result.floating_node_of(stderr) or sim_result.floating_node_of(stdout)
+    if floating_node:
+        return 0, 1, "Simulation failed.", floating_node
+    if record["returncode"] != 0:
+        return 1, 0, stdout + stderr, ""
     execution_error_info = ""
-    floating_node = ""
+    for line in record["error_message"].split("\n")[:3]:
+        for marker in ["ERROR", "Error"]:
+            if marker in line:
+                execution_error_info += "\n" + marker + line.split(marker)[-1]
+                break
+    return 1, 0, execution_error_info.lstrip("\n") or "Simulation failed.", ""
+
+
+def run_code(file):
+    # (execution_error, simulation_error, execution_error_info, floating_node),
+    # decided by the sim_result record the script wrote; without one the
+    # interpreter died before it could write it
     try:
-        result = subprocess.run(["python", "-u", file], check=True, text=True,
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60, env=os.environ.copy())
-        if len(result.stdout.split("\n")) >= 2 and ("failed" in result.stdout.split("\n")[-2] or "failed" in result.stdout.split("\n")[-1]):
-            if len(result.stdout.split("\n")) >= 2:
-                if "check node" in result.stdout.split("\n")[1]:
-                    # print("simulation error, check node")
-                    simulation_error = 1
-                    floating_node = result.stdout.split("\n")[1].split()[-1]
-                    # print("floating_node", floating_node)
-                else:
-                    execution_error = 1
-                    if "ERROR" in result.stdout.split("\n")[1]:
-                        execution_error_info = "ERROR" + result.stdout.split("\n")[1].split("ERROR")[-1]
-                    elif "Error" in result.stdout.split("\n")[1]:
-                        execution_error_info = "Error" + result.stdout.split("\n")[1].split("Error")[-1]
-                    if len(result.stdout.split("\n"))>=3 and "ERROR" in result.stdout.split("\n")[2]:
-                        execution_error_info += "\nERROR" + result.stdout.split("\n")[2].split("ERROR")[-1]
-                    elif len(result.stdout.split("\n"))>=3 and "Error" in result.stdout.split("\n")[2]:
-                        execution_error_info += "\nError" + result.stdout.split("\n")[2].split("Error")[-1]
-                    if len(result.stdout.split("\n"))>=4 and "ERROR" in result.stdout.split("\n")[3]:
-                        execution_error_info += "\nERROR" + result.stdout.split("\n")[3].split("ERROR")[-1]
-                    elif len(result.stdout.split("\n"))>=4 and "Error" in result.stdout.split("\n")[3]:
-                        execution_error_info += "\nError" + result.stdout.split("\n")[3].split("Error")[-1]
-            if len(result.stderr.split("\n")) >= 2:
-                if "check node" in result.stderr.split("\n")[1]:
-                    simulation_error = 1
-                    floating_node = result.stderr.split("\n")[1].split()[-1]
-                else:
-                    execution_error = 1
-                    if "ERROR" in result.stderr.split("\n")[1]:
-                        execution_error_info = "ERROR" + result.stderr.split("\n")[1].split("ERROR")[-1]
-                    elif "Error" in result.stderr.split("\n")[1]:
-                        execution_error_info = "Error" + result.stderr.split("\n")[1].split("Error")[-1]
-                    if len(result.stdout.split("\n"))>=3 and "ERROR" in result.stderr.split("\n")[2]:
-                        execution_error_info += "\nERROR" + result.stderr.split("\n")[2].split("ERROR")[-1]
-                    elif len(result.stdout.split("\n"))>=3 and "Error" in result.stdout.split("\n")[2]:
-                        execution_error_info += "\nError" + result.stdout.split("\n")[2].split("Error")[-1]
-                    if len(result.stdout.split("\n"))>=4 and "ERROR" in result.stderr.split("\n")[3]:
-                        execution_error_info += "\nERROR" + result.stderr.split("\n")[3].split("ERROR")[-1]
-                    elif len(result.stdout.split("\n"))>=4 and "Error" in result.stderr.split("\n")[3]:
-                        execution_error_info += "\nError" + result.stderr.split("\n")[3].split("Error")[-1]
-            if simulation_error == 1:
-                execution_error = 0
-            if execution_error_info == "" and execution_error == 1:
-                execution_error_info = "Simulation failed."
-        code_content = open(file, "r").read()
-        if "circuit.X" in code_content:
-            execution_error_info += "\nPlease avoid using the subcircuit (X) in the code."
-        if "error" in result.stdout.lower() and not "<<NAN, error".lower() in result.stdout.lower() and simulation_error == 0:
-            execution_error = 1
-            execution_error_info = result.stdout + result.stderr
-        return execution_error, simulation_error, execution_error_info, floating_node
+        result = run_python(file, timeout=60)
+        stdout, stderr = result.stdout, result.stderr
     except subprocess.CalledProcessError as e:
         print(f"error when running: {e}")
         print("stderr", e.stderr, file=sys.stderr)
-        if "failed" in e.stdout:
-            if len(e.stderr.split("\n")) >= 2:
-                if "check node" in e.stderr.split("\n")[1]:
-                    simulation_error = 1
-                    floating_node = e.stderr.split("\n")[1].split()[-1]
-        execution_error = 1
-        
-        execution_error_info = e.stdout + e.stderr
-        if simulation_error == 1:
-            execution_error = 0
-            execution_error_info = "Simulation failed."
-        return execution_error, simulation_error, execution_error_info, floating_node
+        stdout, stderr = e.stdout, e.stderr
     except subprocess.TimeoutExpired:
         print(f"Time out error when running code.")
-        execution_error = 1
         execution_error_info = "Time out error when running code.\n"
         execution_error_info = "Suggestion: Avoid letting users input in Python code.\n"
-        return execution_error, simulation_error, execution_error_info, floating_node
+        return 1, 0, execution_error_info, ""
+    record = sim_result.load(file)
+    if record is None:
+        return 1, 0, (stdout + stderr) or "Simulation failed.", ""
+    execution_error, simulation_error, execution_error_info, floating_node = record_errors(record, stdout, stderr)
+    if execution_error == 1 and "circuit.X" in open(file, "r").read():
+        execution_error_info += "\nPlease avoid using the subcircuit (X) in the code."
+    return execution_error, simulation_error, execution_error_info, floating_node
 
 
-
-
-def check_netlist(netlist_path, operating_point_path, input, output, task_id, task_type, optimize = False):
-    warning = 0
-    warning_message = ""
-    if not os.path.exists(operating_point_path):
-        return 0, ""
-    fopen_op = open(operating_point_path, 'r').read()
-    for input_node in input.split(", "):
-        if input_node.lower() not in fopen_op.lower():
-            warning_message += "The given input node ({}) is not found in the netlist.\n".format(input_node)
-            warning = 1
-    for output_node in output.split(", "):
-        if output_node.lower() not in fopen_op.lower():
-            warning_message += "The given output node ({}) is not found in the netlist.\n".format(output_node)
-            warning = 1
-
-    if warning == 1:
-        warning_message += "Suggestion: You can replace the nodes actually used for input/output with the given names. Please rewrite the corrected complete code.\n"
-
-    if task_type == "Inverter":
-        return warning, warning_message
-    vdd_voltage = 5.0
-    vinn_voltage = 1.0
-    vinp_voltage = 1.0
-    for line in fopen_op.split("\n"):
-        line = line.lower()
-        if line.startswith("vdd"):
-            vdd_voltage = float(line.split("\t")[-1])
-        if line.startswith("vinn"):
-            vinn_voltage = float(line.split("\t")[-1])
-        if line.startswith("vinp"):
-            vinp_voltage = float(line.split("\t")[-1])
-    
-    if vinn_voltage != vinp_voltage:
-        warning_message += "The given input voltages of Vinn and Vinp are not equal.\n"
-        warning = 1
-        warning_message += "Suggestion: Please make sure the input voltages are equal.\n"
-    
-    fopen_netlist = open(netlist_path, 'r')
-    voltages = {}
-    for line in fopen_op.split("\n"):
-        if line.strip() == "":
-            continue
-        node, voltage = line.split()
-        voltages[node] = float(voltage)
-    voltages["0"] = 0
-    voltages["gnd"] = 0
-
-    vthn = 0.5
-    vthp = 0.5
-
-    if optimize:
-        vthn = 0.01
-        vthp = 0.01
-    miller_node_1 = None
-    miller_node_2 = None
-    resistance_exist = 0
-    has_diodeload = 0
-    first_stage_out = None
-    for line in fopen_netlist.readlines():
-        if line.startswith('.'):
-            continue
-        if line.startswith("C"):
-            if task_id == 9:
-                miller_node_1 = line.split()[1].lower()
-                miller_node_2 = line.split()[2].lower()
-        if line.startswith("R"):
-            resistance_exist = 1
-        if line.startswith("M"):
-            name, drain, gate, source, bulk, model = line.split()[:6]
-            name = name[1:]
-            drain = drain.lower()
-            source = source.lower()
-            bulk = bulk.lower()
-            gate = gate.lower()
-            mos_type = "NMOS" if "nmos" in model.lower() else "PMOS"
-            if task_id == 4:
-                if drain == "vin" or gate == "vin":
-                    warning_message += (f"For a common-gate amplifier, the vin should be connected to source.\n")
-                    warning_message += (f"Suggestion: Please connect the vin to the source node.\n")
-                    warning = 1
-            elif task_id == 3:
-                if drain == "vout" or gate == "vout":
-                    warning_message += (f"For a common-drain amplifier, the vout should be connected to source.\n")
-                    warning_message += (f"Suggestion: Please connect the vout to the source node.\n")
-                    warning = 1
-            elif task_id == 10:
-                if gate == drain:
-                    has_diodeload = 1
-                    
-            elif task_id == 9:
-                if gate == "vin":
-                    first_stage_out = drain
-            
-            if mos_type == "NMOS":
-                vds_error = 0
-                if voltages[drain] == 0.0:
-                    if drain.lower() == "0" or drain.lower() == "gnd":
-                        warning_message += (f"Suggetions: Please avoid connect {mos_type} {name} drain to the ground.\n")
-                    else:
-                        vds_error = 1
-                        warning_message += (f"For {mos_type} {name}, the drain node ({drain}) voltage is 0.\n")
-                elif voltages[drain] < voltages[source]:
-                    vds_error = 1
-                    warning_message += (f"For {mos_type} {name}, the drain node ({drain}) voltage is lower than the source node ({source}) voltage.\n")
-                if vds_error == 1:
-                    warning_message += (f"Suggestion: Please set {mos_type} {name} with an activated state and make sure V_DS > V_GS - V_TH.\n")
-                vgs_error = 0
-                if voltages[gate] == voltages[source]:
-                    if gate == source:
-                        warning_message += (f"For {mos_type} {name}, the gate node ({gate}) is connected to the source node ({source}).\n")
-                        warning_message += (f"Suggestion: Please {mos_type} {name}, please divide its gate ({gate}) and source ({source}) connection.\n")
-                    else:
-                        vgs_error = 1
-                        warning_message += (f"For {mos_type} {name}, the gate node ({gate}) voltage is equal to the source node ({source}) voltage.\n")
-                elif voltages[gate] < voltages[source]:
-                    vgs_error = 1
-                    warning_message += (f"For {mos_type} {name}, the gate node ({gate}) voltage is lower than the source node ({source}) voltage.\n")
-                elif voltages[gate] <= voltages[source] + vthn:
-                    vgs_error = 1
-                    warning_message += (f"For {mos_type} {name}, the gate node ({gate}) voltage is lower than the source node ({source}) voltage plus the threshold voltage.\n")
-                if vgs_error == 1:
-                    warning_message += (f"Suggestion: Please set {mos_type} {name} with an activated state by increasing the gate voltage or decreasing the source voltage and make sure V_GS > V_TH.\n")
-            if mos_type == "PMOS":
-                vds_error = 0
-                if voltages[drain] == vdd_voltage:
-                    if drain.lower() == "vdd":
-                        warning_message += (f"Suggestion: Please avoid connect {mos_type} {name} drain to the vdd.\n")
-                    else:
-                        vds_error = 1
-                        warning_message += (f"For {mos_type} {name}, the drain node ({drain}) voltage is V_dd.\n")
-                elif voltages[drain] > voltages[source]:
-                    vds_error = 1
-                    warning_message += (f"For {mos_type} {name}, the drain node ({drain}) voltage is higher than the source node ({source}) voltage.\n")
-                if vds_error == 1:
-                    warning_message += (f"Suggestion: Please set {mos_type} {name} with an activated state and make sure V_DS < V_GS - V_TH.\n")
-                vgs_error = 0
-                if voltages[gate] == voltages[source]:
-                    if gate == source:
-                        warning_message += (f"For {mos_type} {name}, the gate node ({gate}) is connected to the source node ({source}).\n")
-                        warning_message += f"Suggestion: Please {mos_type} {name}, please divide its gate ({gate}) and source ({source}) connection.\n"
-                    else:
-                        vgs_error = 1
-                        warning_message += (f"For {mos_type} {name}, the gate node ({gate}) voltage is equal to the source node ({source}) voltage.\n")
-                elif voltages[gate] > voltages[source]:
-                    vgs_error = 1
-                    warning_message += (f"For {mos_type} {name}, the gate node ({gate}) voltage is higher than the source node ({source}) voltage.\n")
-                elif voltages[gate] >= voltages[source] - vthp:
-                    vgs_error = 1
-                    warning_message += (f"For {mos_type} {name}, the gate node ({gate}) voltage is higher than the source node ({source}) voltage plus the threshold voltage.\n")
-                if vgs_error == 1:
-                    warning_message += (f"Suggestion: Please set {mos_type} {name} with an activated state by decreasing the gate voltage or incresing the source voltage and make sure V_GS < V_TH.\n")
-
-    if task_id in [1, 2, 3, 4, 5, 6, 8, 13]:
-        if resistance_exist == 0:
-            warning_message += "There is no resistance in the netlist.\n"
-            warning_message += "Suggestion: Please add a resistance load in the netlist.\n"
-            warning = 1
-    if task_id == 9:
-        if first_stage_out == None:
-            warning_message += "There is no first stage output in the netlist.\n"
-            warning_message += "Suggestion: Please add a first stage output in the netlist.\n"
-            warning = 1
-        elif (first_stage_out == miller_node_1 and miller_node_2 == "vout") or (first_stage_out == miller_node_2 and miller_node_1 == "vout"):
-            pass
-        elif miller_node_1 == None:
-            warning_message += "There no Miller capacitor in the netlist.\n"
-            warning_message += "Suggestion: Please correctly connect the Miller compensation capacitor."
-            warning = 1
-        else:
-            warning_message += "The Miller compensation capacitor is not correctly connected.\n"
-            warning_message += "Suggestion: Please correctly connect the Miller compensation capacitor."
-            warning = 1
-    if task_id == 10 and has_diodeload == 0:
-        warning_message += "There is no diode-connected load in the netlist.\n"
-        warning_message += "Suggestion: Please add a diode-connected load in the netlist.\n"
-        warning = 1
-    warning_message = warning_message.strip()
-    if warning_message == "":
-        warning = 0
-    else:
-        warning = 1
-        warning_message = "According to the operating point check, there are some issues, which defy the general operating principles of MOSFET devices. \n" + warning_message + "\n"
-        warning_message += "\nPlease help me fix the issues and rewrite the corrected complete code.\n"
-    return warning, warning_message
-
-    
 def check_function(task_id, code_path, task_type):
     fwrite_code_path = "{}_check.py".format(code_path.rsplit(".", 1)[0])
     fwrite_code = open(fwrite_code_path, 'w')
@@ -407,26 +337,12 @@ def check_function(task_id, code_path, task_type):
         fwrite_code.write(code)
         fwrite_code.close()
     elif task_type == "Amplifier" or task_type == "Opamp":
-        voltage = "1.0"
         test_code = open(f"problem_check/{task_type}.py", "r").read()
-        for line in open(code_path, 'r').readlines():
-            if line.startswith("circuit.V") and "vin" in line.lower():
-                
-                parts = line.split("#")[0].strip().rstrip(")").split(",")
-                raw_voltage = parts[-1].strip()
-                if raw_voltage[0] == "\"" or raw_voltage[0] == "'":
-                    raw_voltage = raw_voltage[1:-1]
-                if "dc" in raw_voltage.lower():
-                    voltage = raw_voltage.split(" ")[1]
-                else:
-                    voltage = raw_voltage
-                new_voltage = " \"dc {} ac 1n\"".format(voltage)
-                parts[-1] = new_voltage
-                line = ",".join(parts) + ")\n"
-
-            fwrite_code.write(line)
-        fwrite_code.write("\n")
-        fwrite_code.write(test_code)
+        code = open(code_path, 'r').read()
+        # the AC input on the live circuit, after any bias assignments of the
+        # code (as the fused eval does), instead of editing its circuit.V lines
+        code = code + "\nfrom basic_eval import set_ac_input\nset_ac_input(circuit)\n" + test_code
+        fwrite_code.write(code)
         fwrite_code.close()
     elif task_type == "Inverter":
         test_code = open("problem_check/Inverter.py", "r").read()
@@ -437,109 +353,34 @@ def check_function(task_id, code_path, task_type):
     else:
         return 0, ""
     try:
-        result = subprocess.run(["python", "-u", fwrite_code_path], check=True, text=True,
-                stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=os.environ.copy())
-        func_error = 0
-        return_message = ""
+        stdout = run_python(fwrite_code_path).stdout
     except subprocess.CalledProcessError as e:
-        func_error = 1
-        return_message = "\n".join(e.stdout.split("\n"))
-
-    return func_error, return_message
-
-import numpy as np
-def get_best_voltage(dc_file_path, target_voltage=2.5):
-    fopen = open(dc_file_path, 'r')
-    vin = np.array([float(x) for x in fopen.readline().strip().split(" ")])
-    vout = np.array([float(x) for x in fopen.readline().strip().split(" ")])
-    if np.max(vout) - np.min(vout) < 1e-6:
-        return 1, 0
-
-    distances = np.abs(vout - target_voltage)
-    min_distance = np.min(distances)
-    min_indices = np.where(distances == min_distance)[0]
-    best_index = min_indices[np.argmin(np.abs(vin[min_indices] - target_voltage))]
-    
-    return 0, vin[best_index]
-
-
-def get_vin_name(netlist_content, task_type):
-    vinn_name = "in"
-    vinp_name = None
-    for line in netlist_content.split("\n"):
-        if not line.lower().startswith("v"):
-            continue
-        if len(line.lower().split()) < 2:
-            continue
-        if task_type == "Amplifier" and "vin" in line.lower().split()[1]:
-            vinn_name = line.split()[0][1:]
-        if task_type == "Opamp" and "vinp" in line.lower().split()[1]:
-            vinp_name = line.split()[0][1:]
-        if task_type == "Opamp" and "vinn" in line.lower().split()[1]:
-            vinn_name = line.split()[0][1:]
-    return vinn_name, vinp_name
-
-
-def replace_voltage(raw_code, best_voltage, vinn_name, vinp_name):
-    target_sources = []
-    if vinn_name:
-        target_sources.append(vinn_name.lower())
-    if vinp_name:
-        target_sources.append(vinp_name.lower())
-
-    replacements = 0
-    new_code_lines = []
-    for line_num, line in enumerate(raw_code.split("\n"), 1):
-        if "circuit.v(" in line.lower():
-            try:
-                start_idx = line.lower().find("circuit.v(")
-                open_parens = 1
-                close_idx = start_idx + len("circuit.v(")
-                while open_parens > 0 and close_idx < len(line):
-                    if line[close_idx] == '(':
-                        open_parens += 1
-                    elif line[close_idx] == ')':
-                        open_parens -= 1
-                    close_idx += 1
-                if open_parens == 0:
-                    v_def = line[start_idx:close_idx]
-                    v_parts = v_def.split(',')
-                    name_part = v_parts[0].split('(')[1].strip()
-                    if (name_part.startswith("'") and name_part.endswith("'")) or \
-                       (name_part.startswith('"') and name_part.endswith('"')):
-                        name_part = name_part[1:-1]
-                    if name_part.lower() in target_sources:
-                        if len(v_parts) >= 3:
-                            last_part = v_parts[-1].strip()
-                            if '#' in last_part:
-                                value_part, comment = last_part.split('#', 1)
-                                new_last_part = f" {best_voltage} #{comment}"
-                            else:
-                                if ')' in last_part:
-                                    new_last_part = f" {best_voltage})"
-                                else:
-                                    new_last_part = f" {best_voltage}"
-                            v_parts[-1] = new_last_part
-                            new_v_def = ','.join(v_parts)
-                            line = line[:start_idx] + new_v_def + line[close_idx:]
-                            replacements += 1
-            except Exception as e:
-                pass
-        new_code_lines.append(line)
-    return "\n".join(new_code_lines)
-
-def connect_vinn_vinp(dc_sweep_code, vinn_name, vinp_name):
-    new_code = ""
-    for line in dc_sweep_code.split("\n"):
-        if not line.lower().startswith("circuit.v"):
-            new_code += line + "\n"
-            continue
-        if vinp_name is not None and (line.lower().startswith(f"circuit.v('{vinp_name.lower()}'") or line.lower().startswith(f"circuit.v(\"{vinp_name.lower()}\"")):
-            new_line = "circuit.V('dc', 'Vinn', 'Vinp', 0.0)\n"
-            new_code += new_line
-        else:
-            new_code += line + "\n"
-    return new_code
+        stdout = e.stdout
+    # the testbench fails by exiting non-zero or by raising
+    record = sim_result.load(fwrite_code_path)
+    if record is None:
+        return 1, stdout or "Simulation failed."
+    if record["status"] == "ok" and record["returncode"] == 0:
+        return 0, ""
+    return_message = stdout
+    if record["status"] == "execution_error" and not return_message:
+        return_message = f"{record['error_class']}: {record['error_message']}"
+    return 1, return_message
+
+def rebias_code(code, best_voltage, sources, template=""):
+    # The attempt's code at the dc sweep's input bias: assignments to the
+    # re-biased sources after the circuit is built (ahead of
+    # `simulator = circuit.simulator()`, else of the eval template), so the
+    # generated circuit.V lines are kept as written.
+    if not sources:
+        return code
+    bias_lines = "".join(f"circuit.element({name!r}).dc_value = {best_voltage}\n" for name in sources)
+    match = re.search(r"^simulator = circuit", code, re.MULTILINE)
+    index = match.start() if match else (code.find(template) if template else -1)
+    if index < 0:
+        index = len(code)
+    head = code[:index].rstrip("\n")
+    return head + "\n# input bias from the dc sweep\n" + bias_lines + code[index:].lstrip("\n")
 
 def get_subcircuits_info(subcircuits, 
                     lib_data_path = "lib_info.tsv", task_data_path = "problem_set.tsv"):
@@ -641,7 +482,7 @@ global generator
 generator = None
 
 
-def write_pyspice_code(sp_code_path, code_path, op_path):
+def write_pyspice_code(sp_code_path, code_path, eval_code):
     sp_code = open(sp_code_path, 'r')
     code = open(code_path, 'w')
     import_template = """import math
@@ -736,7 +577,7 @@ from PySpice.Unit import *
     
     code.write("\n# Simulator\n")
     code.write("simulator = circuit.simulator()\n")
-    code.write(pyspice_template.replace("[OP_PATH]", op_path))
+    code.write(eval_code)
     code.close()
     sp_code.close()
 
@@ -771,20 +612,21 @@ def optimize_code(code_path, task_id, task_type, task):
             elif recording:
                 code += line
     optimize_prompt = optimize_template.replace("[CODE]", code)
+    backoff = retry_policy.backoff(task_llm_stats())
     while True:
         try:
             prompt_path = code_path.replace("_success.py", "_optimize_prompt.md")
             with open(prompt_path, 'w') as f:
                 f.write(optimize_prompt)
-            completion = client.chat.completions.create(
+            completion = chat_completion(client, 
                 model=args.model,
                 messages=[
                     {"role": "system", "content": "You are an analog integrated circuits expert."},
                     {"role": "user", "content": optimize_prompt}
                 ],
-                temperature=args.temperature)
+                temperature=get_temperature(task_id))
             if completion is None or type(completion)== str or completion.choices[0].message.content is None:
-                time.sleep(30)
+                backoff.wait()
             else:
                 result = completion.choices[0].message.content
                 answer_path = code_path.replace("_success.py", "_optimize_answer.md")
@@ -795,8 +637,7 @@ def optimize_code(code_path, task_id, task_type, task):
                     break
         except Exception as e:
             print(e)
-            print("sleep 30s")
-            time.sleep(30)
+            backoff.wait(e)
     answer_code_path = code_path.replace("_success.py", "_optimize.py")
     answer_code_name = answer_code_path.split("/")[-1]
     with open(answer_code_path, 'w') as f:
@@ -824,6 +665,8 @@ def work(task, input, output, task_id, it, background, task_type, flog = None,
 
     global generator
 
+    start_llm_task(it)
+    trace = AttemptTrace(task_id, it, task_type)
     total_tokens = 0
     total_prompt_tokens = 0
     total_completion_tokens = 0
@@ -905,23 +748,24 @@ def work(task, input, output, task_id, it, background, task_type, flog = None,
         messages[0]["content"] = "You are an analog integrated circuits expert." + messages[0]["content"]
     
     retry = True
-
+    backoff = retry_policy.backoff(task_llm_stats())
+    llm_start, cache_hits = time.time(), task_llm_stats()["cache_hits"]
     while retry:
         try:
             print("start {} completion".format(args.model))
-            completion = client.chat.completions.create(
+            completion = chat_completion(client, 
                 model=args.model,
                 messages=messages,
-                temperature=args.temperature
+                temperature=get_temperature(task_id)
             )
             if completion is None or type(completion) == str or completion.choices[0].message.content is None:
-                time.sleep(30)
+                backoff.wait()
             else:
                 break
-        except openai.APIStatusError as e:
+        except (openai.APIStatusError, openai.APIConnectionError) as e:
             print("Encountered an APIStatusError. Details:")
             print(e)
-            time.sleep(30)
+            backoff.wait(e)
 
     if "gpt" in args.model or "gemini" in args.model or "deepseek" in args.model or "qwen" in args.model.lower() or "claude" in args.model.lower() or "o1" in args.model:
         answer = completion.choices[0].message.content
@@ -938,6 +782,7 @@ def work(task, input, output, task_id, it, background, task_type, flog = None,
         print(f"Total tokens: {completion.usage.total_tokens}")
         print(f"Cumulative total: {total_tokens}")
         print(f"===================================\n")
+    trace_completion(trace, "llm", llm_start, completion, cache_hits, code_id=0)
 
     if "gpt-3" in args.model:
         model_dir = 'gpt3p5'
@@ -986,7 +831,7 @@ def work(task, input, output, task_id, it, background, task_type, flog = None,
     code_id = 0
     if not args.ngspice:
         if task_type != "Oscillator" and task_type != "Mixer":
-            code = raw_code + pyspice_template.replace("[OP_PATH]", operating_point_path)
+            code = raw_code + get_eval_template(task_type, operating_point_path, optimize, (task_id, input, output))
         else:
             code = raw_code
     else:
@@ -1001,10 +846,12 @@ def work(task, input, output, task_id, it, background, task_type, flog = None,
     
     existing_code_files = os.listdir("{}/p{}".format(model_dir, task_id))
     for existing_code_file in existing_code_files:
-        if existing_code_file.endswith(".sp"):
-            os.remove("{}/p{}/{}".format(model_dir, task_id, existing_code_file))
-        if existing_code_file.endswith("_op.txt"):
-            os.remove("{}/p{}/{}".format(model_dir, task_id, existing_code_file))
+        # other iterations of this task may be cleaning the same directory
+        if existing_code_file.endswith(".sp") or existing_code_file.endswith("_op.txt"):
+            try:
+                os.remove("{}/p{}/{}".format(model_dir, task_id, existing_code_file))
+            except FileNotFoundError:
+                pass
 
     if os.path.exists("{}/p{}/{}".format(model_dir, task_id, it)):
         existing_code_files = os.listdir("{}/p{}/{}".format(model_dir, task_id, it))
@@ -1031,7 +878,7 @@ def work(task, input, output, task_id, it, background, task_type, flog = None,
         if args.ngspice:
             sp_code_path = code_path
             code_path = code_path.replace(".sp", ".py")
-            write_pyspice_code(sp_code_path, code_path, operating_point_path)
+            write_pyspice_code(sp_code_path, code_path, get_eval_template(task_type, operating_point_path, optimize, (task_id, input, output)))
             answer_code = open(code_path, 'r').read()
             code = answer_code
         else:
@@ -1043,89 +890,100 @@ def work(task, input, output, task_id, it, background, task_type, flog = None,
         if task_type in complex_task_type and not args.no_tool:
             shutil.copy("opamp.py", "/".join(code_path.split("/")[:-1]))
         
-        execution_error, simulation_error, execution_error_info, floating_node = run_code(code_path)
+        with trace.stage("run_code", code_id=code_id):
+            execution_error, simulation_error, execution_error_info, floating_node = run_code(code_path)
+        trace.add_sim_record(sim_result.load(code_path), code_id=code_id)
 
         dc_sweep_error = 0
         dc_sweep_success = 0
+        recorded_figure = None
 
         if execution_error == 0 and simulation_error == 0:
             if task_type not in complex_task_type:
                 # basic task
-                _, code_netlist = None, answer_code
-                code_netlist += output_netlist_template
-                code_netlist_path = "{}/p{}/{}/p{}_{}_{}_netlist_gen.py".format(model_dir, task_id, it, task_id, it, code_id)
-                fwrite_code_netlist = open(code_netlist_path, 'w')
-                fwrite_code_netlist.write(code_netlist)
-                fwrite_code_netlist.close()
-                
-                netlist_path = "{}/p{}/{}/p{}_{}_{}_netlist.sp".format(model_dir, task_id, it, task_id, it, code_id)
-                result = subprocess.run(["python", "-u", code_netlist_path], check=True, text=True, 
-                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=os.environ.copy())
-                netlist_file_path = "{}/p{}/{}/p{}_{}_{}_netlist.sp".format(model_dir, task_id, it, task_id, it, code_id)
-                fwrite_netlist = open(netlist_file_path, 'w')
-                fwrite_netlist.write("\n".join(result.stdout.split("\n")[1:]))
-                fwrite_netlist.close()
-
-                ## special for Opamp: dc sweep
-                
-                if "Opamp" in task_type or "Amplifier" in task_type:
-                    vinn_name = "in"
-                    vinp_name = "inp"
-                    netlist_content = open(netlist_file_path, 'r').read()
-                    vinn_name, vinp_name = get_vin_name(netlist_content, task_type)
-                    dc_sweep_code_path = '{}/p{}/{}/p{}_{}_{}_dc_sweep.py'.format(model_dir, task_id, it, task_id, it, code_id)
-                    dc_file_path = '{}/p{}/{}/p{}_{}_{}_dc.txt'.format(model_dir, task_id, it, task_id, it, code_id)
-                    _, dc_sweep_code = None, answer_code
-                    if "simulator = circuit.simulator()" not in dc_sweep_code:
-                        dc_sweep_code += "\nsimulator = circuit.simulator()\n"
-                    if task_type == "Opamp":
-                        dc_sweep_code = connect_vinn_vinp(dc_sweep_code, vinn_name, vinp_name)
-                    dc_sweep_code += dc_sweep_template.replace("[IN_NAME]", vinn_name).replace("[DC_PATH]", dc_file_path)
-                    fwrite_dc_sweep_code = open(dc_sweep_code_path, 'w')
-                    fwrite_dc_sweep_code.write(dc_sweep_code)
-                    fwrite_dc_sweep_code.close()
-                    try:
-                        subprocess.run(["python", "-u", dc_sweep_code_path], check=True, text=True,
-                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=os.environ.copy())
-                        target_voltage = 2.5 if not optimize else 0.6
-                        dc_sweep_error, best_voltage = get_best_voltage(dc_file_path, target_voltage)
-                        file_name = "{}/p{}/{}/p{}_{}_{}_best_voltage.txt".format(model_dir, task_id, it, task_id, it, code_id)
-                        with open(file_name, 'w') as f:
-                            f.write(str(best_voltage))
-                        assert dc_sweep_error == 0
-                        os.rename(code_path, code_path + ".bak")
-                        _, raw_code = None, answer_code
-                        if "simulator = circuit.simulator()" not in raw_code:
-                            raw_code += "\nsimulator = circuit.simulator()\n"
-                        new_code = replace_voltage(raw_code, best_voltage, vinn_name, vinp_name)
-                        # write new op analysis code
+                if not args.no_fused_eval:
+                    netlist_path = "{}/p{}/{}/p{}_{}_{}_netlist.sp".format(model_dir, task_id, it, task_id, it, code_id)
+                    eval_result = {"dc_sweep_error": 0, "dc_sweep_success": 0, "func_error": 0, "func_error_message": ""}
+                    record = sim_result.load(code_path)
+                    if record is not None and "eval" in record:
+                        eval_result = record["eval"]
+                    dc_sweep_error = eval_result["dc_sweep_error"]
+                    dc_sweep_success = eval_result["dc_sweep_success"]
+                    if dc_sweep_success:
+                        # the op point and netlist are already re-biased; keep
+                        # the re-biased code as this attempt's code
+                        best_voltage = eval_result["best_voltage"]
+                        shutil.copy(code_path, code_path + ".bak")
+                        new_code = rebias_code(answer_code, best_voltage, eval_result.get("biased_sources", []),
+                                               get_eval_template(task_type, operating_point_path, optimize, (task_id, input, output)))
                         with open(f"{code_path}", "w") as f:
                             f.write(new_code)
-                        execution_error_1, simulation_error_1, execution_error_info_1, floating_node_1 = run_code(code_path)
-                        assert execution_error_1 == 0
-                        assert simulation_error_1 == 0
-                        # All dc sweep passed
-                        # generate a new netlist with the best voltage, replace _gen.py and .sp
-                        new_code_netlist = new_code + output_netlist_template
-                        code_netlist_path = "{}/p{}/{}/p{}_{}_{}_netlist_gen.py".format(model_dir, task_id, it, task_id, it, code_id)
-                        fwrite_code_netlist = open(code_netlist_path, 'w')
-                        fwrite_code_netlist.write(new_code_netlist)
-                        fwrite_code_netlist.close()
-                        netlist_path = "{}/p{}/{}/p{}_{}_{}_netlist.sp".format(model_dir, task_id, it, task_id, it, code_id)
-                        result = subprocess.run(["python", "-u", code_netlist_path], check=True, text=True, 
-                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=os.environ.copy())
-                        netlist_file_path = "{}/p{}/{}/p{}_{}_{}_netlist.sp".format(model_dir, task_id, it, task_id, it, code_id)
-                        fwrite_netlist = open(netlist_file_path, 'w')
-                        fwrite_netlist.write("\n".join(result.stdout.split("\n")[1:]))
-                        fwrite_netlist.close()
-                        dc_sweep_success = 1
-                    except:
-                        if os.path.exists(code_path + ".bak"):
-                            shutil.copy(code_path + ".bak", code_path)
-
-                warning, warning_message = check_netlist(netlist_path, operating_point_path, input, output, task_id, task_type, optimize)
+                else:
+                    _, code_netlist = None, answer_code
+                    code_netlist += output_netlist_template
+                    code_netlist_path = "{}/p{}/{}/p{}_{}_{}_netlist_gen.py".format(model_dir, task_id, it, task_id, it, code_id)
+                    fwrite_code_netlist = open(code_netlist_path, 'w')
+                    fwrite_code_netlist.write(code_netlist)
+                    fwrite_code_netlist.close()
+                
+                    netlist_path = "{}/p{}/{}/p{}_{}_{}_netlist.sp".format(model_dir, task_id, it, task_id, it, code_id)
+                    with trace.stage("netlist", code_id=code_id):
+                        result = run_python(code_netlist_path)
+                    netlist_file_path = "{}/p{}/{}/p{}_{}_{}_netlist.sp".format(model_dir, task_id, it, task_id, it, code_id)
+                    fwrite_netlist = open(netlist_file_path, 'w')
+                    fwrite_netlist.write("\n".join(result.stdout.split("\n")[1:]))
+                    fwrite_netlist.close()
+
+                    ## special for Opamp: dc sweep
+                
+                    if "Opamp" in task_type or "Amplifier" in task_type:
+                        vinn_name = "in"
+                        vinp_name = "inp"
+                        netlist_content = open(netlist_file_path, 'r').read()
+                        vinn_name, vinp_name = get_vin_name(netlist_content, task_type)
+                        dc_sweep_code_path = '{}/p{}/{}/p{}_{}_{}_dc_sweep.py'.format(model_dir, task_id, it, task_id, it, code_id)
+                        dc_file_path = dc_sweep_path('{}/p{}/{}/p{}_{}_{}'.format(model_dir, task_id, it, task_id, it, code_id), required=True)
+                        _, dc_sweep_code = None, answer_code
+                        if "simulator = circuit.simulator()" not in dc_sweep_code:
+                            dc_sweep_code += "\nsimulator = circuit.simulator()\n"
+                        # sweep, then re-bias the live circuit and write the op
+                        # point and netlist from it in the same script
+                        dc_sweep_code += rebias_template.replace("[TASK_TYPE]", task_type).replace("[VINN_NAME]", vinn_name) \
+                            .replace("[VINP_NAME]", repr(vinp_name)).replace("[OP_PATH]", operating_point_path) \
+                            .replace("[NETLIST_PATH]", netlist_path).replace("[DC_PATH]", dc_file_path) \
+                            .replace("[TARGET_VOLTAGE]", "2.5" if not optimize else "0.6")
+                        fwrite_dc_sweep_code = open(dc_sweep_code_path, 'w')
+                        fwrite_dc_sweep_code.write(dc_sweep_code)
+                        fwrite_dc_sweep_code.close()
+                        dc_sweep_start = time.time()
+                        try:
+                            run_python(dc_sweep_code_path)
+                            rebias_result = sim_result.load(dc_sweep_code_path)["eval"]
+                            dc_sweep_error, best_voltage = rebias_result["dc_sweep_error"], rebias_result["best_voltage"]
+                            assert dc_sweep_error == 0
+                            shutil.copy(code_path, code_path + ".bak")
+                            new_code = rebias_code(answer_code, best_voltage, rebias_result["biased_sources"],
+                                                   get_eval_template(task_type, operating_point_path, optimize, (task_id, input, output)))
+                            with open(f"{code_path}", "w") as f:
+                                f.write(new_code)
+                            dc_sweep_success = 1
+                        except:
+                            if os.path.exists(code_path + ".bak"):
+                                shutil.copy(code_path + ".bak", code_path)
+                        trace.add("dc_sweep", time.time() - dc_sweep_start, code_id=code_id, success=dc_sweep_success)
+
+                if not args.no_fused_eval and "netlist_warning" in eval_result:
+                    # checked by the simulation script, before its functional check
+                    warning, warning_message = eval_result["netlist_warning"], eval_result["netlist_warning_message"]
+                else:
+                    with trace.stage("check_netlist", code_id=code_id):
+                        warning, warning_message = check_netlist(netlist_path, operating_point_path, input, output, task_id, task_type, optimize)
                 if warning == 0:
-                    func_error, func_error_message = check_function(task_id, code_path, task_type)
+                    if not args.no_fused_eval:
+                        func_error, func_error_message = eval_result["func_error"], eval_result["func_error_message"]
+                    else:
+                        with trace.stage("check_function", code_id=code_id):
+                            func_error, func_error_message = check_function(task_id, code_path, task_type)
                     func_error_message = func_error_message.replace("Unsupported Ngspice version 38", "")
                     func_error_message = func_error_message.replace("Unsupported Ngspice version 36", "")
                     if func_error ==0:
@@ -1144,7 +1002,7 @@ def work(task, input, output, task_id, it, background, task_type, flog = None,
                         break
             else:
                 # complex task
-                pyspice_template_complex = open(f"problem_check/{task_type}.py", "r").read()
+                pyspice_template_complex = testbench_template.replace("[TASK_TYPE]", task_type)
                 figure_path = "{}/p{}/{}/p{}_{}_{}_figure".format(model_dir, task_id, it, task_id, it, code_id)
 
                 if not args.ngspice:
@@ -1159,7 +1017,9 @@ def work(task, input, output, task_id, it, background, task_type, flog = None,
                 print("copy file {} to {}".format(code_path, code_path.rsplit(".", 1)[0] + "_op.py"))
                 with open(f"{code_path}", "w") as f:
                     f.write(code)
-                execution_error, simulation_error, execution_error_info, floating_node = run_code(code_path)
+                with trace.stage("testbench", code_id=code_id):
+                    execution_error, simulation_error, execution_error_info, floating_node = run_code(code_path)
+                trace.add_sim_record(sim_result.load(code_path), code_id=code_id)
                 if execution_error == 0 and simulation_error == 0:
                     os.rename(code_path, code_path.rsplit(".", 1)[0]+"_success.py")
                     token_info_path = f'{model_dir}/p{task_id}/{it}/token_info_retry{code_id}.txt'
@@ -1171,6 +1031,10 @@ def work(task, input, output, task_id, it, background, task_type, flog = None,
                         ftmp_write.write(f"Status: Success\n")
                     
                     break
+                elif execution_error == 1 and simulation_error == 0 and client_vlm is not None and code_id < args.num_of_retry - 1:
+                    # the testbench only recorded its figure; the VLM branch below
+                    # renders it as a PNG
+                    recorded_figure = figure_path
         
         # Ignore the compatible error
         execution_error_info = execution_error_info.replace("Unsupported Ngspice version 38", "")
@@ -1198,8 +1062,11 @@ def work(task, input, output, task_id, it, background, task_type, flog = None,
                 ftmp = open("{}/p{}/{}/simulation_error_{}".format(model_dir, task_id, it, code_id), "w")
                 ftmp.close()
             elif execution_error == 1:
-                figure_path = "{}/p{}/{}/p{}_{}_{}_figure.png".format(model_dir, task_id, it, task_id, it, code_id)
-                if os.path.exists(figure_path) and client_vlm is not None and code_id < args.num_of_retry - 1:
+                figure_path = None
+                if recorded_figure is not None:
+                    with trace.stage("figure_render", code_id=code_id):
+                        figure_path = figure_render.render(recorded_figure)
+                if figure_path is not None and client_vlm is not None and code_id < args.num_of_retry - 1:
                     
                     prompt_vlm = prompt_vlm_template
                     prompt_vlm = prompt_vlm.replace("[TASK]", task)
@@ -1223,8 +1090,10 @@ def work(task, input, output, task_id, it, background, task_type, flog = None,
                         }
                     ]
                     vlm_retry = 3
+                    backoff = retry_policy.backoff(task_llm_stats())
+                    vlm_start, cache_hits = time.time(), task_llm_stats()["cache_hits"]
                     while vlm_retry > 0:
-                        completion_vlm = client_vlm.chat.completions.create(
+                        completion_vlm = chat_completion(client_vlm, 
                             model = vlm_model,
                             messages = messages_vlm,
                             temperature = 0.0,
@@ -1234,11 +1103,12 @@ def work(task, input, output, task_id, it, background, task_type, flog = None,
                             not hasattr(completion_vlm, 'choices') or
                             not completion_vlm.choices or
                             completion_vlm.choices[0].message.content is None):
-                            time.sleep(30)
+                            backoff.wait()
                         else:
                             answer_vlm = completion_vlm.choices[0].message.content
                             break
                         vlm_retry -= 1
+                    trace_completion(trace, "vlm", vlm_start, completion_vlm, cache_hits, code_id=code_id)
                     answer_vlm_path = "{}/p{}/{}/p{}_{}_{}_answer_vlm.md".format(model_dir, task_id, it, task_id, it, code_id)
                     with open(answer_vlm_path, "w") as f:
                         f.write(answer_vlm)
@@ -1279,21 +1149,23 @@ def work(task, input, output, task_id, it, background, task_type, flog = None,
         messages.append({"role": "user", "content": new_prompt})
 
         retry = True
+        backoff = retry_policy.backoff(task_llm_stats())
+        llm_start, cache_hits = time.time(), task_llm_stats()["cache_hits"]
         while retry:
             try:
-                completion = client.chat.completions.create(
+                completion = chat_completion(client, 
                     model=args.model,
                     messages=messages,
-                    temperature=args.temperature
+                    temperature=get_temperature(task_id)
                 )
                 if completion is None or type(completion) == str or completion.choices[0].message.content is None:
-                    time.sleep(30)
+                    backoff.wait()
                 else:
                     break
-            except openai.APIStatusError as e:
+            except (openai.APIStatusError, openai.APIConnectionError) as e:
                 print("Encountered an APIStatusError. Details:")
                 print(e)
-                time.sleep(30)
+                backoff.wait(e)
 
         fwrite_input.write("\n----------\n")
         fwrite_input.write(new_prompt)
@@ -1314,6 +1186,7 @@ def work(task, input, output, task_id, it, background, task_type, flog = None,
             print(f"Total tokens: {completion.usage.total_tokens}")
             print(f"Cumulative total: {total_tokens}")
             print(f"===================================\n")
+        trace_completion(trace, "llm", llm_start, completion, cache_hits, code_id=code_id)
 
         fwrite_output.write("\n----------\n")
         fwrite_output.write(answer)
@@ -1323,7 +1196,7 @@ def work(task, input, output, task_id, it, background, task_type, flog = None,
         operating_point_path = "{}/p{}/{}/p{}_{}_{}_op.txt".format(model_dir, task_id, it, task_id, it, code_id)
         if "simulator = circuit.simulator()" not in raw_code:
             raw_code += "\nsimulator = circuit.simulator()\n"
-        code = raw_code + pyspice_template.replace("[OP_PATH]", operating_point_path)
+        code = raw_code + get_eval_template(task_type, operating_point_path, optimize, (task_id, input, output))
 
     fwrite = open('{}/p{}/{}/p{}_{}_messages.txt'.format(model_dir, task_id, it, task_id, it), 'w')
     fwrite.write(str(messages))
@@ -1341,6 +1214,17 @@ def work(task, input, output, task_id, it, background, task_type, flog = None,
         f.write(f"Total prompt tokens: {total_prompt_tokens}\n")
         f.write(f"Total completion tokens: {total_completion_tokens}\n")
         f.write(f"=" * 50 + "\n")
+        llm_stats = llm_task.stats
+        f.write(f"LLM requests: {llm_stats['requests']}\n")
+        f.write(f"LLM cache hits: {llm_stats['cache_hits']}\n")
+        f.write(f"LLM retries: {llm_stats['retries']}\n")
+        f.write(f"LLM wait time: {llm_stats['backoff_wait'] + llm_stats['rate_limit_wait'] + llm_stats['slot_wait']:.2f}s "
+                f"(backoff {llm_stats['backoff_wait']:.2f}s, rate limit {llm_stats['rate_limit_wait']:.2f}s, "
+                f"concurrency limit {llm_stats['slot_wait']:.2f}s)\n")
+        f.write(f"=" * 50 + "\n")
+
+    trace.write(f'{model_dir}/p{task_id}/{it}/{TRACE_NAME}', code_id=code_id, total_tokens=total_tokens,
+                prompt_tokens=total_prompt_tokens, completion_tokens=total_completion_tokens)
 
     print(f"\n=== Final Token Usage Summary ===")
     print(f"Total retries: {code_id}")
@@ -1360,17 +1244,19 @@ def get_retrieval(task, task_id):
             {"role": "user", "content": prompt}
         ]
     if "gpt" in args.model and args.retrieval:
-        try:
-            completion = client.chat.completions.create(
-                model=args.model,
-                messages=messages,
-                temperature=args.temperature
-            )
-        except openai.APIStatusError as e:
-            print("Encountered an APIStatusError. Details:")
-            print(e)
-            print("sleep 30 seconds")
-            time.sleep(30)
+        backoff = retry_policy.backoff(task_llm_stats())
+        while True:
+            try:
+                completion = chat_completion(client, 
+                    model=args.model,
+                    messages=messages,
+                    temperature=get_temperature(task_id)
+                )
+                break
+            except (openai.APIStatusError, openai.APIConnectionError) as e:
+                print("Encountered an APIStatusError. Details:")
+                print(e)
+                backoff.wait(e)
         answer = completion.choices[0].message.content
         fretre_path = os.path.join(args.model.replace("-", ""), f"p{str(task_id)}", "retrieve.txt")
         fretre = open(fretre_path, "w")
@@ -1388,20 +1274,87 @@ def get_retrieval(task, task_id):
 
 
 
+def parse_task_ids(task_id_spec, all_ids):
+    if task_id_spec.strip().lower() == "all":
+        return list(all_ids)
+    task_ids = []
+    for part in task_id_spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            task_ids += list(range(int(start), int(end) + 1))
+        else:
+            task_ids.append(int(part))
+    for task_id in task_ids:
+        if task_id not in all_ids:
+            print(f"Task {task_id} is not in problem_set.tsv, skipped.")
+    return [task_id for task_id in task_ids if task_id in all_ids]
+
+
+problem_set = None
+
+
+def run_job(task_id, it):
+    global problem_set
+    if problem_set is None:
+        problem_set = pd.read_csv('problem_set.tsv', delimiter='\t')
+    row = problem_set[problem_set['Id'] == task_id].iloc[0]
+    remaining_money = 2
+    subcircuits = None
+    work(row['Circuit'], row['Input'].strip(), row['Output'].strip(), task_id, it,
+         None, row['Type'], None, money_quota=remaining_money,
+         subcircuits=subcircuits, normal_vout=row['Normal'], testbench=row['Testbench'],
+         optimize=task_id > 50)
+
+
+def print_sim_cache_stats():
+    if args.sim_cache_dir is None:
+        return
+    hits, lookups = sim_cache.hit_rate(args.sim_cache_dir, os.environ[sim_cache.RUN_ID_ENV])
+    print(f"Simulation cache: {hits}/{lookups} hits ({100.0 * hits / max(lookups, 1):.1f}%)")
+
+
 def main():
     data_path = 'problem_set.tsv'
     df = pd.read_csv(data_path, delimiter='\t')
-    remaining_money = 2
-    for index, row in df.iterrows():
-        circuit_id = row['Id']
-        if circuit_id != args.task_id:
-            continue
-        for it in range(args.num_of_done, args.num_per_task):
-            subcircuits = None
-            work(row['Circuit'], row['Input'].strip(), row['Output'].strip(), circuit_id, it,
-                 None, row['Type'], None, money_quota=remaining_money,
-                 subcircuits=subcircuits, normal_vout=row['Normal'], testbench=row['Testbench'],
-                 optimize=circuit_id > 50)
+    task_ids = parse_task_ids(args.task_id, df['Id'].tolist())
+    jobs = [(task_id, it) for task_id in task_ids for it in range(args.num_of_done, args.num_per_task)]
+    if args.jobs <= 1:
+        for task_id, it in jobs:
+            run_job(task_id, it)
+        print_sim_cache_stats()
+        return
+
+    if args.job_executor == "thread":
+        # One process: LLM requests overlap on the shared async client (which
+        # enforces --llm_concurrency) and simulations run on the worker pool.
+        init_job_worker(contextlib.nullcontext(), threading.BoundedSemaphore(args.sim_concurrency or args.jobs))
+        executor = ThreadPoolExecutor(max_workers=args.jobs)
+    else:
+        ctx = multiprocessing.get_context("spawn")
+        llm_semaphore = ctx.BoundedSemaphore(args.llm_concurrency or args.jobs)
+        sim_semaphore = ctx.BoundedSemaphore(args.sim_concurrency or args.jobs)
+        # a job runs one simulation at a time: one warm worker per job process,
+        # not --sim_workers each
+        executor = ProcessPoolExecutor(max_workers=args.jobs, mp_context=ctx, initializer=init_job_worker,
+                                       initargs=(llm_semaphore, sim_semaphore, 1))
+    failed = []
+    with executor:
+        futures = {executor.submit(run_job, task_id, it): (task_id, it) for task_id, it in jobs}
+        for future in as_completed(futures):
+            task_id, it = futures[future]
+            try:
+                future.result()
+                print(f"Task {task_id} iteration {it} finished.")
+            except Exception as e:
+                print(f"Task {task_id} iteration {it} failed: {e}")
+                failed.append((task_id, it))
+    print(f"{len(jobs) - len(failed)}/{len(jobs)} jobs finished.")
+    print_sim_cache_stats()
+    if failed:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,261 @@
+import contextlib
+import hashlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+
+import figure_render
+import sim_result
+
+
+repo_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Set by run.py; every generated script that runs a simulation sees them.
+CACHE_DIR_ENV = "SIM_CACHE_DIR"
+RUN_ID_ENV = "SIM_CACHE_RUN"
+
+# helpers the testbenches import; a change to them invalidates cached results
+TESTBENCH_HELPERS = ["transient_stream.py", "ac_sweep.py", "measure.py", "dc_grid.py", "spice_session.py",
+                     "figure_render.py", "spectrum.py"]
+
+
+def canonical_netlist(source):
+    # Electrically identical decks should hash the same: drop the title and
+    # comments, normalise whitespace and ignore element order (subcircuit bodies
+    # are sorted on their own and kept together). Element and node names stay,
+    # since testbench messages refer to them. "+" continuation lines are joined
+    # to their element first, so a parameter cannot be sorted away from it.
+    lines = []
+    for line in source.split("\n"):
+        line = line.split(";")[0].split("$ ")[0].strip()
+        if not line or line.startswith("*"):
+            continue
+        if line.startswith("+") and lines:
+            lines[-1] += " " + line[1:]
+        else:
+            lines.append(line)
+    units = []
+    block = None
+    for line in lines:
+        if line.lower().startswith(".title"):
+            continue
+        line = " ".join(line.split())
+        lower = line.lower()
+        if lower.startswith(".include") or lower.startswith(".lib"):
+            path = line.split(None, 1)[-1].strip("'\"").split()[0]
+            if os.path.isfile(path):
+                line += " #" + hashlib.sha256(open(path, "rb").read()).hexdigest()
+        if lower.startswith(".subckt"):
+            block = [line]
+            continue
+        if block is not None:
+            if lower.startswith(".ends"):
+                units.append("\n".join([block[0]] + sorted(block[1:]) + [line]))
+                block = None
+            else:
+                block.append(line)
+            continue
+        units.append(line)
+    if block is not None:
+        units.extend(block)
+    return "\n".join(sorted(units))
+
+
+def source_hash(*paths):
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(open(os.path.join(repo_dir, path), "rb").read())
+    return digest.hexdigest()
+
+
+def circuit_key(namespace, *parts):
+    # str(simulator) is the netlist plus simulator options; fall back to the bare
+    # circuit when the generated code did not create a simulator.
+    simulator = namespace.get("simulator")
+    deck = str(simulator) if simulator is not None and hasattr(simulator, "circuit") else str(namespace["circuit"])
+    payload = json.dumps([canonical_netlist(deck)] + [str(part) for part in parts])
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class SimCache:
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def get(self, key):
+        entry_dir = self._entry_dir(key)
+        try:
+            with open(os.path.join(entry_dir, "record.json"), "r") as f:
+                record = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        record["dir"] = entry_dir
+        return record
+
+    def put(self, key, record, files):
+        entry_dir = self._entry_dir(key)
+        if os.path.exists(entry_dir):
+            return
+        os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+        tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(entry_dir), prefix=".tmp_")
+        for name, path in files.items():
+            shutil.copyfile(path, os.path.join(tmp_dir, name))
+        with open(os.path.join(tmp_dir, "record.json"), "w") as f:
+            json.dump(record, f)
+        try:
+            os.rename(tmp_dir, entry_dir)
+        except OSError:
+            # another worker stored the same circuit first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def log(self, kind, hit):
+        with open(os.path.join(self.cache_dir, "stats.log"), "a") as f:
+            f.write(f"{os.environ.get(RUN_ID_ENV, '')}\t{kind}\t{'hit' if hit else 'miss'}\t{time.time():.3f}\n")
+
+
+def get_cache():
+    cache_dir = os.environ.get(CACHE_DIR_ENV)
+    if not cache_dir:
+        return None
+    return SimCache(cache_dir)
+
+
+class _Tee(io.TextIOBase):
+    def __init__(self, stream):
+        self.stream = stream
+        self.buffer = io.StringIO()
+
+    def write(self, text):
+        self.buffer.write(text)
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def _mask(text, paths):
+    for i, path in enumerate(paths):
+        text = text.replace(path, f"[PATH{i}]")
+    return text
+
+
+def _unmask(text, paths):
+    for i, path in enumerate(paths):
+        text = text.replace(f"[PATH{i}]", path)
+    return text
+
+
+def cached_call(kind, key, func, paths=()):
+    # Run func() once per key. A later call with the same key replays what the
+    # first one printed, the files in `paths` it wrote and how it exited
+    # (normal return, sys.exit code or exception) without simulating.
+    cache = get_cache()
+    if cache is None:
+        return func()
+    record = cache.get(key)
+    cache.log(kind, record is not None)
+    if record is not None:
+        for i, path in enumerate(paths):
+            if f"file{i}" in record["files"]:
+                shutil.copyfile(os.path.join(record["dir"], f"file{i}"), path)
+        result = record.get("result", {})
+        for stage in result.get("stages", {}).values():
+            stage["cached"] = True
+        sim_result.merge(result)
+        sys.stdout.write(_unmask(record["stdout"], paths))
+        sys.stderr.write(_unmask(record["stderr"], paths))
+        if record["exit"] is not None:
+            sys.exit(record["exit"])
+        return None
+
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+    out, err = _Tee(sys.stdout), _Tee(sys.stderr)
+    exit_code = None
+    stored_waveforms = len(sim_result.current().get("waveforms", []))
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+        try:
+            func()
+        except SystemExit as e:
+            exit_code = 0 if e.code is None else e.code
+            if not isinstance(exit_code, int):
+                print(exit_code, file=sys.stderr)
+                exit_code = 1
+        except Exception:
+            traceback.print_exc()
+            exit_code = 1
+    files = {f"file{i}": path for i, path in enumerate(paths) if os.path.exists(path)}
+    result = sim_result.snapshot()
+    for field in ["returncode", "seconds", "max_rss_mb"]:
+        result.pop(field, None)
+    # a hit replays only the waveforms stored by func() (see waveform_store)
+    result["waveforms"] = result.get("waveforms", [])[stored_waveforms:]
+    record = {
+        "result": result,
+        "kind": kind,
+        "stdout": _mask(out.buffer.getvalue(), paths),
+        "stderr": _mask(err.buffer.getvalue(), paths),
+        "exit": exit_code,
+        "files": sorted(files),
+    }
+    cache.put(key, record, files)
+    if exit_code is not None:
+        sys.exit(exit_code)
+    return None
+
+
+def run_testbench(namespace, task_type, figure_path, bias_voltage):
+    # Complex tasks: problem_check/{task_type}.py on the circuit built by the
+    # generated code, cached per (netlist, testbench, bias).
+    check_path = os.path.join("problem_check", f"{task_type}.py")
+    test_code = open(os.path.join(repo_dir, check_path), "r").read()
+    test_code = test_code.replace("[FIGURE_PATH]", figure_path).replace("[BIAS_VOLTAGE]", str(bias_voltage))
+    key = circuit_key(namespace, "testbench", task_type, bias_voltage, source_hash(check_path, *TESTBENCH_HELPERS))
+
+    def run():
+        before = sim_result.numeric_globals(namespace)
+        start = sim_result.clock()
+        try:
+            with figure_render.deferred(figure_path):
+                exec(compile(test_code, os.path.join(repo_dir, check_path), "exec"), namespace)
+            sim_result.stage("testbench", start, exit_code=0)
+        except SystemExit as e:
+            sim_result.stage("testbench", start, exit_code=e.code)
+            raise
+        except Exception as e:
+            sim_result.stage("testbench", start, error=e)
+            raise
+        finally:
+            sim_result.measure_new_globals(namespace, before)
+
+    # the figure is only recorded (see figure_render)
+    cached_call(task_type, key, run, paths=[figure_path + ".npz"])
+
+
+def hit_rate(cache_dir, run_id=None):
+    hits, lookups = 0, 0
+    stats_path = os.path.join(cache_dir, "stats.log")
+    if not os.path.exists(stats_path):
+        return 0, 0
+    for line in open(stats_path, "r"):
+        parts = line.rstrip("\n").split("\t")
+        if len(parts) < 3 or (run_id is not None and parts[0] != run_id):
+            continue
+        lookups += 1
+        hits += parts[2] == "hit"
+    return hits, lookups
+
+
+if __name__ == "__main__":
+    cache_dir = sys.argv[1] if len(sys.argv) > 1 else "sim_cache"
+    hits, lookups = hit_rate(cache_dir)
+    print(f"{hits}/{lookups} simulation cache hits ({100.0 * hits / max(lookups, 1):.1f}%)")
@@ -0,0 +1,171 @@
+import multiprocessing
+import os
+import queue
+import subprocess
+import sys
+import tempfile
+import threading
+
+import sim_result
+
+
+def _preload():
+    # Pay the import and ngspice start-up cost once per worker instead of once per run.
+    # matplotlib is left out: testbench figures are only recorded (figure_render).
+    import numpy
+    import scipy.signal
+    import scipy.stats
+    import scipy.fft
+    import PySpice.Spice.BasicElement
+    from PySpice.Spice.Netlist import Circuit
+    from PySpice.Unit import u_V
+    try:
+        circuit = Circuit('warmup')
+        circuit.V('dd', 'Vdd', circuit.gnd, 1@u_V)
+        circuit.R('load', 'Vdd', circuit.gnd, 1000)
+        circuit.simulator().operating_point()
+    except Exception:
+        pass
+
+
+def _cleanup(code_dir):
+    if "matplotlib.pyplot" in sys.modules:
+        # generated code that plots on its own
+        import matplotlib
+        import matplotlib.pyplot as plt
+        plt.close("all")
+        matplotlib.rc_file_defaults()
+    # Forget modules loaded from the job directory (opamp.py, p*_lib.py, ...) so the
+    # next job imports its own copy, like a fresh interpreter would.
+    for name, module in list(sys.modules.items()):
+        module_file = getattr(module, "__file__", None)
+        if module_file and os.path.dirname(os.path.abspath(module_file)) == code_dir:
+            del sys.modules[name]
+
+
+def _worker_main(conn):
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    _preload()
+    cwd = os.getcwd()
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+        path, stdout_path, stderr_path = job
+        sys.stdout.flush()
+        sys.stderr.flush()
+        saved_stdout, saved_stderr = os.dup(1), os.dup(2)
+        with open(stdout_path, "wb") as fout, open(stderr_path, "wb") as ferr:
+            os.dup2(fout.fileno(), 1)
+            os.dup2(ferr.fileno(), 2)
+            try:
+                returncode = sim_result.run_script(path)
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os.dup2(saved_stdout, 1)
+                os.dup2(saved_stderr, 2)
+                os.close(saved_stdout)
+                os.close(saved_stderr)
+        _cleanup(os.path.dirname(path))
+        os.chdir(cwd)
+        conn.send(returncode)
+
+
+class _Worker:
+    def __init__(self, ctx):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+
+    def stop(self, kill=False):
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class SimWorkerPool:
+    def __init__(self, num_workers=2, max_jobs_per_worker=50):
+        self._ctx = multiprocessing.get_context("spawn")
+        self._max_jobs = max_jobs_per_worker
+        self._tmp_dir = tempfile.mkdtemp(prefix="sim_pool_")
+        self._idle = queue.LifoQueue()
+        self._workers = []
+        self._lock = threading.Lock()
+        for _ in range(num_workers):
+            self._idle.put(self._spawn())
+
+    def _spawn(self):
+        worker = _Worker(self._ctx)
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+
+    def _replace(self, worker, kill=False):
+        with self._lock:
+            self._workers.remove(worker)
+        worker.stop(kill=kill)
+        return self._spawn()
+
+    def run(self, path, timeout=None, check=False):
+        path = os.path.abspath(path)
+        cmd = ["python", "-u", path]
+        fd_out, stdout_path = tempfile.mkstemp(dir=self._tmp_dir, suffix=".out")
+        fd_err, stderr_path = tempfile.mkstemp(dir=self._tmp_dir, suffix=".err")
+        os.close(fd_out)
+        os.close(fd_err)
+        worker = self._idle.get()
+        timed_out = False
+        try:
+            try:
+                worker.conn.send((path, stdout_path, stderr_path))
+                if worker.conn.poll(timeout):
+                    returncode = worker.conn.recv()
+                    worker.jobs += 1
+                    if worker.jobs >= self._max_jobs:
+                        worker = self._replace(worker)
+                else:
+                    timed_out = True
+                    worker = self._replace(worker, kill=True)
+            except (EOFError, BrokenPipeError, OSError):
+                # The worker crashed (e.g. ngspice aborted the process); report it like a
+                # failed interpreter and recycle the worker.
+                worker.process.join(timeout=5)
+                returncode = worker.process.exitcode or 1
+                worker = self._replace(worker, kill=True)
+        finally:
+            self._idle.put(worker)
+        stdout = open(stdout_path, "r", errors="replace").read()
+        stderr = open(stderr_path, "r", errors="replace").read()
+        os.remove(stdout_path)
+        os.remove(stderr_path)
+        if timed_out:
+            raise subprocess.TimeoutExpired(cmd, timeout, output=stdout, stderr=stderr)
+        if check and returncode != 0:
+            raise subprocess.CalledProcessError(returncode, cmd, stdout, stderr)
+        return subprocess.CompletedProcess(cmd, returncode, stdout, stderr)
+
+    def close(self):
+        with self._lock:
+            workers = list(self._workers)
+            self._workers = []
+        for worker in workers:
+            worker.stop()
+        try:
+            os.rmdir(self._tmp_dir)
+        except OSError:
+            pass
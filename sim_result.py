@@ -0,0 +1,181 @@
+import copy
+import json
+import numbers
+import os
+import resource
+import sys
+import time
+import traceback
+
+# One machine-readable record per executed script, written next to it as
+# <script>_result.json. run_script() fills in how the script ended; the
+# templates and testbench runners add stage outcomes and measurements:
+#
+#   {"status": "ok" | "simulation_error" | "execution_error" | "failed",
+#    "returncode": 0, "error_class": None, "error_message": "",
+#    "floating_node": "", "seconds": 1.2, "max_rss_mb": 180.0,
+#    "stages": {"op": {"status": "ok", "seconds": 0.1}, ...},
+#    "measurements": {...}, "eval": {...}}
+
+_record = None
+
+
+def result_path(script_path):
+    return script_path.rsplit(".", 1)[0] + "_result.json"
+
+
+def new_record():
+    return {"status": "ok", "returncode": 0, "error_class": None, "error_message": "",
+            "floating_node": "", "seconds": 0.0, "stages": {}, "measurements": {}}
+
+
+def current():
+    global _record
+    if _record is None:
+        _record = new_record()
+    return _record
+
+
+def clock():
+    return time.time()
+
+
+def floating_node_of(message):
+    # ngspice reports singular matrices as "... check node <name>"
+    for line in str(message).split("\n"):
+        if "check node" in line and line.split():
+            return line.split()[-1]
+    return ""
+
+
+def stage(name, start=None, error=None, fatal=True, **fields):
+    # Record the outcome of one simulation stage; a fatal error marks the whole run.
+    record = current()
+    entry = record["stages"].setdefault(name, {})
+    entry["status"] = "ok" if error is None else "error"
+    if start is not None:
+        entry["seconds"] = time.time() - start
+    if error is not None:
+        entry["error_class"] = type(error).__name__
+        entry["error_message"] = str(error)
+    if error is not None and fatal:
+        floating_node = floating_node_of(error)
+        if floating_node:
+            entry["floating_node"] = floating_node
+            record["floating_node"] = floating_node
+            record["status"] = "simulation_error"
+        else:
+            record["status"] = "execution_error"
+        record["error_class"] = type(error).__name__
+        record["error_message"] = str(error)
+    entry.update(fields)
+    return entry
+
+
+def update(**fields):
+    current().update(fields)
+
+
+def numeric_globals(namespace):
+    values = {}
+    for name, value in namespace.items():
+        if name.startswith("_") or isinstance(value, bool):
+            continue
+        if isinstance(value, numbers.Real):
+            values[name] = float(value)
+        elif type(value).__module__ == "numpy" and getattr(value, "shape", None) == ():
+            try:
+                values[name] = float(value)
+            except (TypeError, ValueError):
+                pass
+    return values
+
+
+def measure_new_globals(namespace, before):
+    # The testbenches keep their measurements in module globals; store the
+    # numeric ones the testbench created or changed.
+    measurements = current()["measurements"]
+    for name, value in numeric_globals(namespace).items():
+        if before.get(name) != value:
+            measurements[name] = value if value == value else None
+
+
+def snapshot():
+    return copy.deepcopy(current())
+
+
+def merge(record):
+    base = current()
+    for key, value in record.items():
+        if isinstance(value, dict) and isinstance(base.get(key), dict):
+            base[key].update(value)
+        elif isinstance(value, list) and isinstance(base.get(key), list):
+            base[key].extend(value)
+        else:
+            base[key] = value
+
+
+def load(script_path):
+    try:
+        with open(result_path(script_path), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def run_script(path):
+    # Execute a generated script like `python -u path` would and write its record.
+    import waveform_store
+    global _record
+    _record = new_record()
+    code_dir = os.path.dirname(path)
+    namespace = {"__name__": "__main__", "__file__": path, "__builtins__": __builtins__}
+    sys.path.insert(0, code_dir)
+    sys.argv = [path]
+    start = time.time()
+    error = None
+    try:
+        with open(path, "r") as f:
+            source = f.read()
+        with waveform_store.capture(path):
+            exec(compile(source, path, "exec"), namespace)
+        returncode = 0
+    except SystemExit as e:
+        if e.code is None:
+            returncode = 0
+        elif isinstance(e.code, int):
+            returncode = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            returncode = 1
+    except BaseException as e:
+        traceback.print_exc()
+        returncode = 1
+        error = e
+    finally:
+        if code_dir in sys.path:
+            sys.path.remove(code_dir)
+    record = _record
+    record["returncode"] = returncode
+    record["seconds"] = time.time() - start
+    record["max_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    if error is not None:
+        record["error_class"] = type(error).__name__
+        record["error_message"] = str(error)
+        record["status"] = "execution_error"
+    elif returncode != 0 and record["status"] == "ok":
+        record["status"] = "failed"
+    try:
+        with open(result_path(path), "w") as f:
+            json.dump(record, f, default=str)
+    except OSError:
+        pass
+    _record = None
+    return returncode
+
+
+if __name__ == "__main__":
+    # go through the importable module so the script's `import sim_result`
+    # updates the same record
+    import sim_result
+    sys.exit(sim_result.run_script(os.path.abspath(sys.argv[1])))
@@ -0,0 +1,49 @@
+import sim_result
+
+# Several analyses of one circuit in one ngspice session. The netlist is
+# loaded into the simulator's shared ngspice instance once; every analysis is
+# then an interactive ngspice command on the already parsed circuit, and
+# `alter` changes source / device parameters in place between them instead of
+# rebuilding a simulator and reloading the deck.
+
+
+class SpiceSession:
+    def __init__(self, simulator, save=()):
+        # save: extra vectors such as "@m1[id]" kept next to the node voltages
+        self.simulator = simulator
+        self.ngspice = getattr(simulator, "ngspice", None)
+        if self.ngspice is None:
+            raise ValueError("simulator has no shared ngspice session")
+        start = sim_result.clock()
+        if save:
+            simulator.save_internal_parameters(*save)
+        simulator.reset_analysis()
+        self.ngspice.destroy()
+        self.ngspice.load_circuit(str(simulator))
+        self.analyses = 0
+        sim_result.stage("session_load", start)
+
+    def _analysis(self, command):
+        self.ngspice.exec_command(command)
+        plot_name = self.ngspice.last_plot
+        if plot_name == "const":
+            raise NameError("Simulation failed")
+        # the vectors are copied out of ngspice, so the plot can go right away
+        analysis = self.ngspice.plot(self.simulator, plot_name).to_analysis()
+        self.ngspice.destroy(plot_name)
+        self.analyses += 1
+        return analysis
+
+    def operating_point(self):
+        return self._analysis("op")
+
+    def dc(self, source, start, stop, step):
+        # stop may lie below start with a negative step
+        return self._analysis(f"dc {source} {float(start):.9g} {float(stop):.9g} {float(step):.9g}")
+
+    def ac(self, start_frequency, stop_frequency, number_of_points=1, variation="dec"):
+        return self._analysis(f"ac {variation} {number_of_points} {float(start_frequency):.9g} "
+                              f"{float(stop_frequency):.9g}")
+
+    def alter(self, device, **parameters):
+        self.ngspice.alter_device(device, **parameters)
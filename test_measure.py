@@ -0,0 +1,124 @@
+import numpy as np
+
+from measure import (amplitude, closest_index, corner_frequency, crossing_index, duty_cycle, edges, frequency,
+                     hysteresis, levels, settling_time, thd)
+
+# The measure.py functions against known waveforms and against the per-sample
+# loops the testbenches used before (also timed by `python measure.py`).
+
+
+def loop_levels(waveform, threshold):
+    return (np.mean([x for x in waveform if x > threshold]),
+            np.mean([x for x in waveform if x <= threshold]))
+
+
+def loop_closest(voutp, vlop, target):
+    best_i, best_vlop = 0, vlop[0]
+    for i in range(len(voutp)):
+        if abs(voutp[i] - target) < abs(voutp[best_i] - target):
+            best_i, best_vlop = i, vlop[i]
+        elif abs(voutp[i] - target) == abs(voutp[best_i] - target):
+            if abs(voutp[i] - target) == (voutp[i] - target):
+                if abs(voutp[best_i] - target) != (voutp[best_i] - target) or vlop[i] > best_vlop:
+                    best_i, best_vlop = i, vlop[i]
+    return best_i
+
+
+def loop_trigger(vin_part, vout_part, threshold):
+    cross = np.where(np.diff(vout_part > threshold) > 0)[0]
+    if len(cross) == 0:
+        return None
+    i = cross[0]
+    v1, v2 = vout_part[i], vout_part[i + 1]
+    if v2 == v1:
+        return vin_part[i]
+    return vin_part[i] + (threshold - v1) / (v2 - v1) * (vin_part[i + 1] - vin_part[i])
+
+
+def loop_hysteresis(vin, vout, threshold):
+    rising, falling = np.where(np.diff(vin) > 0)[0], np.where(np.diff(vin) < 0)[0]
+    return (loop_trigger(vin[rising], vout[rising], threshold),
+            loop_trigger(vin[falling], vout[falling], threshold))
+
+
+def loop_crossing(frequencies, gain_db, level_db):
+    above = gain_db - level_db > 0
+    for i in range(len(frequencies) - 1):
+        if above[i] != above[i + 1]:
+            return i
+    return None
+
+
+def transient_time(seed=0, points=200000):
+    # transient-like time axis with uneven steps
+    rng = np.random.default_rng(seed)
+    return np.cumsum(rng.uniform(0.5e-6, 1.5e-6, points))
+
+
+def lowpass_response():
+    frequencies = np.logspace(0, 9, 451)
+    return frequencies, -10 * np.log10(1 + (frequencies / 1e4) ** 2)
+
+
+def schmitt_response():
+    # 100 Hz sine through an ideal Schmitt trigger with 2.1 / 2.9 V trip points
+    t = np.linspace(0, 50e-3, 5001)
+    vin = 2.5 + 0.8 * np.sin(2 * np.pi * 100 * t)
+    vout = np.empty_like(vin)
+    state = 0.0
+    for i, x in enumerate(vin):
+        state = 5.0 if x > 2.9 else 0.0 if x < 2.1 else state
+        vout[i] = state
+    return vin, vout
+
+
+def test_sine_measurements():
+    time = transient_time()
+    sine = 2.5 + np.sin(2 * np.pi * 1e3 * time)
+    rising, falling = edges(time, sine, 2.5)
+    assert np.allclose(np.diff(rising), 1e-3, rtol=1e-3) and np.allclose(np.diff(falling), 1e-3, rtol=1e-3)
+    assert abs(frequency(time, sine) - 1e3) < 1
+    assert abs(amplitude(sine) - 2) < 1e-6
+    assert abs(duty_cycle(time, sine, 2.5) - 0.5) < 0.01
+
+
+def test_thd():
+    time = transient_time()
+    distorted = 2.5 + np.sin(2 * np.pi * 1e3 * time) + 0.1 * np.sin(2 * np.pi * 3e3 * time) \
+        + 0.05 * np.sin(2 * np.pi * 5e3 * time)
+    assert abs(thd(time, distorted, 1e3) - np.hypot(0.1, 0.05)) < 1e-3
+
+
+def test_levels_match_loop():
+    time = transient_time()
+    rng = np.random.default_rng(1)
+    square = 2.5 + 0.6 * np.sign(np.sin(2 * np.pi * 10 * time)) + rng.normal(0, 0.01, len(time))
+    assert np.allclose(levels(square, 2.5), loop_levels(square, 2.5))
+
+
+def test_settling_time():
+    time = transient_time()
+    step = 1 - np.exp(-time / 10e-3)
+    assert abs(settling_time(time, step, 1.0) - 10e-3 * np.log(50)) < 1e-5
+    assert np.isnan(settling_time(time, step, 2.0))
+
+
+def test_corner_frequency_and_crossing():
+    frequencies, gain_db = lowpass_response()
+    assert abs(corner_frequency(frequencies, gain_db) / 1e4 - 1) < 0.01
+    assert crossing_index(gain_db, -3) == loop_crossing(frequencies, gain_db, -3)
+    assert crossing_index(gain_db, 1) is None
+
+
+def test_closest_index_matches_loop():
+    vlop = np.round(np.arange(0, 5, 0.1), 10)
+    for voutp in [5 - vlop, np.clip(vlop, 2.0, 3.0), np.round(np.abs(vlop - 2.5), 10) + 2.3,
+                  np.full(len(vlop), 2.5)]:
+        assert closest_index(voutp, 2.5, vlop) == loop_closest(voutp, vlop, 2.5), voutp
+
+
+def test_hysteresis():
+    vin, vout = schmitt_response()
+    assert hysteresis(vin, vout, 2.5) == loop_hysteresis(vin, vout, 2.5)
+    rising, falling = hysteresis(vin, vout, 2.5)
+    assert abs(rising - 2.9) < 0.01 and abs(falling - 2.1) < 0.01
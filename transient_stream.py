@@ -0,0 +1,115 @@
+import numpy as np
+
+import sim_result
+import waveform_store
+
+# Shorter transient analyses for the testbenches. streamed_transient() runs in
+# chunks for testbenches whose verdict can be settled before the end time:
+# ngspice stops at a `time > t` breakpoint after every chunk, the testbench's
+# check looks at what was simulated so far, and the run is resumed only while
+# the check is undecided. steady_state_transient() reaches periodic steady
+# state with coarse steps before the fine-step capture window.
+
+
+def streamed_transient(simulator, step_time, end_time, chunk_time, verdict):
+    # Returns the analysis up to the point where verdict(analysis) stopped
+    # being None (or up to end_time). Simulators without a shared ngspice
+    # session, or a PySpice without CircuitSimulator._run (which only adds the
+    # analysis to the deck), run the full transient.
+    from PySpice.Spice.Simulation import CircuitSimulator
+    start = sim_result.clock()
+    end = float(end_time)
+    ngspice = getattr(simulator, "ngspice", None)
+    if ngspice is None or not hasattr(CircuitSimulator, "_run"):
+        analysis = simulator.transient(step_time=step_time, end_time=end_time)
+        sim_result.stage("transient", start, simulated_time=end, end_time=end, chunks=1)
+        return analysis
+
+    try:
+        CircuitSimulator._run(simulator, "transient", step_time=step_time, end_time=end_time)
+        ngspice.destroy()
+        ngspice.load_circuit(str(simulator))
+        simulator.reset_analysis()
+
+        stop_time = min(float(chunk_time), end)
+        ngspice.stop(f"time > {stop_time:.9g}")
+        ngspice.run()
+        chunks = 1
+        while True:
+            plot_name = ngspice.last_plot
+            if plot_name == "const":
+                raise NameError("Simulation failed")
+            analysis = ngspice.plot(simulator, plot_name).to_analysis()
+            simulated = float(np.array(analysis.time)[-1])
+            result = verdict(analysis)
+            if result is not None or simulated >= end * (1 - 1e-9):
+                break
+            ngspice.exec_command("delete all")
+            stop_time = min(stop_time + float(chunk_time), end)
+            ngspice.stop(f"time > {stop_time:.9g}")
+            ngspice.resume(background=False)
+            chunks += 1
+    finally:
+        # the breakpoints stay set in the shared ngspice otherwise
+        ngspice.exec_command("delete all")
+    waveform_store.record(analysis)
+    sim_result.stage("transient", start, simulated_time=simulated, end_time=end, chunks=chunks, verdict=result,
+                     points=len(analysis.time))
+    if simulated < end:
+        print(f"Transient stopped at {simulated * 1e3:.3g} ms of {end * 1e3:.3g} ms ({result}).")
+    return analysis
+
+
+def oscillation_verdict(vout, time, min_peaks=4, amplitude_threshold=0.000005):
+    # Same criteria as the end of problem_check/Oscillator.py (peaks, amplitude
+    # and period spread in the latter half of the samples): "pass" once the
+    # oscillation is regular over enough periods with a steady amplitude.
+    # There is no early "fail": an output that sits on a rail while a timing
+    # node charges, or that starts late, may still oscillate by the end.
+    from scipy.signal import find_peaks
+    if len(time) < 20:
+        return None
+    start_idx = int(len(time) * 0.5)
+    last_vout, last_time = vout[start_idx:], time[start_idx:]
+    amplitude = np.max(last_vout) - np.min(last_vout)
+    half = len(last_vout) // 2
+    early_swing = np.max(last_vout[:half]) - np.min(last_vout[:half])
+    late_swing = np.max(last_vout[half:]) - np.min(last_vout[half:])
+
+    if amplitude <= amplitude_threshold:
+        return None
+
+    min_distance = max(5, len(last_vout) // 100)
+    peaks, _ = find_peaks(last_vout, height=np.mean(last_vout), distance=min_distance)
+    if len(peaks) < min_peaks:
+        return None
+    periods = np.diff(last_time[peaks])
+    if np.std(periods) / np.mean(periods) >= 0.05:
+        return None
+    if abs(late_swing - early_swing) > 0.05 * amplitude:
+        return None
+    return "pass"
+
+
+def steady_state_transient(circuit, step_time, end_time, start_time, coarse_step):
+    # Replaces transient(step_time, end_time, start_time): the start-up up to
+    # start_time runs with coarse_step as the largest timestep, and only the
+    # window [start_time, end_time] is simulated at step_time, starting from
+    # the node voltages the coarse run ended with. start_time must be a whole
+    # number of stimulus periods so the sources restart in the same phase.
+    # Returns the analysis and the offset to add to its time axis.
+    start = sim_result.clock()
+    try:
+        settle = circuit.simulator().transient(step_time=coarse_step, end_time=start_time, max_time=coarse_step)
+        initial = {str(name): float(np.array(settle[name])[-1]) for name in settle.nodes}
+        simulator = circuit.simulator()
+        simulator.initial_condition(**initial)
+        analysis = simulator.transient(step_time=step_time, end_time=float(end_time) - float(start_time),
+                                       use_initial_condition=True)
+    except Exception as e:
+        sim_result.stage("steady_state", start, error=e, fatal=False)
+        analysis = circuit.simulator().transient(step_time=step_time, end_time=end_time, start_time=start_time)
+        return analysis, 0.0
+    sim_result.stage("steady_state", start, coarse_points=len(settle.time), points=len(analysis.time),
+                     window=float(end_time) - float(start_time))
+    return analysis, float(start_time)
@@ -0,0 +1,100 @@
+import os
+import re
+
+import sim_result
+
+# Operating-point warm start across retries (run.py --warm_start). A revised
+# circuit usually keeps most node names of the previous attempt, whose solved
+# node voltages are in its p{id}_{it}_{k}_op.txt. apply() keeps the voltages
+# of the nodes that still exist on the circuit, and operating_point() hands
+# them to ngspice as `.nodeset` hints for the script's op point only. The
+# testbenches' simulators (DC sweeps, transients, AC) get no hints: a nodeset
+# can steer a bistable or oscillating circuit to another equilibrium. The
+# iteration count is recorded with and without hints, and a warm-started
+# solve that fails is repeated cold on a fresh simulator.
+
+_OP_PATTERN = re.compile(r"^(.*_)(\d+)_op\.txt$")
+
+
+def previous_op_path(op_path):
+    # op file of the latest earlier retry of the same iteration that has one
+    match = _OP_PATTERN.match(op_path)
+    if match is None:
+        return None
+    prefix, code_id = match.group(1), int(match.group(2))
+    for previous in range(code_id - 1, -1, -1):
+        path = f"{prefix}{previous}_op.txt"
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def load_operating_point(op_path):
+    # {node: voltage} from the "node<TAB>voltage" lines of an op file
+    voltages = {}
+    with open(op_path, "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) != 2:
+                continue
+            try:
+                voltages[parts[0].lower()] = float(parts[1])
+            except ValueError:
+                continue
+    return voltages
+
+
+def node_sets(circuit, voltages):
+    # the voltages of the circuit's nodes, under the circuit's node names
+    return {name: voltages[name.lower()] for name in map(str, circuit.node_names)
+            if name.lower() in voltages and name != "0" and name.lower() != "gnd"}
+
+
+def apply(namespace, op_path):
+    # Keep the previous retry's op point on the circuit in namespace; op_path
+    # is the current retry's op file.
+    circuit = namespace.get("circuit")
+    previous = previous_op_path(op_path)
+    if circuit is None or previous is None or getattr(circuit, "warm_start", None) is not None:
+        return
+    try:
+        nodes = node_sets(circuit, load_operating_point(previous))
+    except OSError:
+        return
+    sim_result.stage("warm_start", None, source=os.path.basename(previous), nodes=len(nodes),
+                     circuit_nodes=len(circuit.node_names))
+    circuit.warm_start = nodes
+
+
+def iterations(simulator):
+    # Newton iterations of the last analysis (ngspice `rusage totiter`; the
+    # counter restarts with every analysis PySpice runs, since it reloads the
+    # circuit); None if unavailable
+    ngspice = getattr(simulator, "ngspice", None)
+    if ngspice is None:
+        return None
+    try:
+        output = ngspice.exec_command("rusage totiter")
+    except Exception:
+        return None
+    match = re.search(r"(\d+)\s*$", str(output).strip())
+    return int(match.group(1)) if match else None
+
+
+def operating_point(simulator):
+    # simulator.operating_point(), seeded with the circuit's warm start
+    # hints, and the fields for its sim_result stage
+    circuit = simulator.circuit
+    hints = getattr(circuit, "warm_start", None) or {}
+    if hints:
+        simulator.node_set(**hints)
+    try:
+        analysis = simulator.operating_point()
+        return analysis, {"iterations": iterations(simulator), "warm_start": bool(hints)}
+    except Exception:
+        if not hints:
+            raise
+    # the hints led the solve astray: solve again without them
+    cold = circuit.simulator(temperature=simulator.temperature, nominal_temperature=simulator.nominal_temperature)
+    analysis = cold.operating_point()
+    return analysis, {"iterations": iterations(cold), "warm_start": False, "warm_start_failed": True}
@@ -0,0 +1,209 @@
+import argparse
+import contextlib
+import json
+import os
+import re
+import sys
+
+import numpy as np
+
+import sim_result
+
+# Node vectors of every analysis a generated script runs, kept on disk so they
+# can be re-analysed without ngspice. Each analysis is one .npy file holding a
+# (vectors, points) array, the abscissa (time / frequency / sweep) first, and
+# one line in <waveform_dir>/index.jsonl names its vectors and the task,
+# iteration and retry it belongs to. Loading maps the file (np.load with
+# mmap_mode="r"), so a vector is a view into the page cache, not a copy:
+#
+#   for waveform in waveform_store.waveforms("waveforms", task_id=12, kind="transient"):
+#       print(waveform.entry["code_id"], np.max(waveform["vout"]))
+#
+#   python waveform_store.py waveforms     # entries and size per task
+
+# Set by run.py (--waveform_dir); scripts run outside of it store nothing.
+WAVEFORM_DIR_ENV = "SIM_WAVEFORM_DIR"
+
+INDEX_NAME = "index.jsonl"
+
+# p{task_id}_{it}_{code_id}[_{script}].py as written by run.py
+_SCRIPT_PATTERN = re.compile(r"p(\d+)_(\d+)_(\d+)(?:_(\w+))?\.py$")
+
+_ABSCISSA = {"TransientAnalysis": ("transient", "time"), "AcAnalysis": ("ac", "frequency"),
+             "DcAnalysis": ("dc", "sweep"), "OperatingPoint": ("op", None)}
+
+_capture = None
+_installed = False
+
+
+def get_waveform_dir():
+    return os.environ.get(WAVEFORM_DIR_ENV) or None
+
+
+def script_key(script_path):
+    name = os.path.basename(script_path)
+    match = _SCRIPT_PATTERN.search(name)
+    if match is None:
+        return {"task_id": None, "it": None, "code_id": None, "script": name.rsplit(".", 1)[0]}
+    task_id, it, code_id, script = match.groups()
+    return {"task_id": int(task_id), "it": int(it), "code_id": int(code_id), "script": script or "main"}
+
+
+def _vectors(analysis):
+    kind, abscissa = _ABSCISSA.get(type(analysis).__name__, (type(analysis).__name__, None))
+    names, vectors = [], []
+    if abscissa is not None:
+        names.append(abscissa)
+        vectors.append(np.asarray(getattr(analysis, abscissa)).view(np.ndarray))
+    for group in [analysis.nodes, analysis.branches, getattr(analysis, "internal_parameters", {})]:
+        for name, waveform in group.items():
+            names.append(str(name))
+            vectors.append(np.asarray(waveform).view(np.ndarray))
+    length = len(vectors[0]) if vectors else 0
+    kept = [(name, vector) for name, vector in zip(names, vectors) if vector.ndim == 1 and len(vector) == length]
+    return kind, abscissa, [name for name, _ in kept], [vector for _, vector in kept]
+
+
+def record(analysis):
+    # Store one analysis of the running script; a no-op outside capture().
+    if _capture is None:
+        return
+    kind, abscissa, names, vectors = _vectors(analysis)
+    if not vectors:
+        return
+    dtype = np.result_type(*vectors)
+    if dtype.kind not in "fc":
+        dtype = np.dtype(float)
+    directory, stem = _capture["directory"], _capture["stem"]
+    entries = sim_result.current().setdefault("waveforms", [])
+    file = os.path.join(directory, f"{stem}_{len(entries):03d}_{kind}.npy")
+    os.makedirs(os.path.join(_capture["root"], directory), exist_ok=True)
+    np.save(os.path.join(_capture["root"], file), np.stack(vectors).astype(dtype, copy=False))
+    entries.append({"file": file, "kind": kind, "abscissa": abscissa, "names": names,
+                    "shape": [len(vectors), len(vectors[0])], "dtype": dtype.name})
+
+
+def install():
+    # Route every analysis PySpice returns through record(). Done once per
+    # process; the wrappers do nothing while no capture() is active.
+    global _installed
+    if _installed:
+        return
+    from PySpice.Spice.Simulation import CircuitSimulator
+    from spice_session import SpiceSession
+
+    def recorded(method):
+        def run(self, *args, **kwargs):
+            analysis = method(self, *args, **kwargs)
+            record(analysis)
+            return analysis
+        return run
+
+    for name in ["operating_point", "dc", "ac", "transient"]:
+        setattr(CircuitSimulator, name, recorded(getattr(CircuitSimulator, name)))
+    SpiceSession._analysis = recorded(SpiceSession._analysis)
+    _installed = True
+
+
+@contextlib.contextmanager
+def capture(script_path):
+    # Around the execution of one generated script: stores its analyses and,
+    # when it ends, indexes them (including those a simulation cache hit
+    # replayed into its sim_result record) under the script's task, iteration
+    # and retry.
+    global _capture
+    root = get_waveform_dir()
+    if root is None:
+        yield
+        return
+    try:
+        install()
+    except ImportError:
+        yield
+        return
+    key = script_key(script_path)
+    directory = f"p{key['task_id']}" if key["task_id"] is not None else "other"
+    stem = os.path.basename(script_path).rsplit(".", 1)[0]
+    _capture = {"root": root, "directory": directory, "stem": stem}
+    try:
+        yield
+    finally:
+        _capture = None
+        entries = sim_result.current().get("waveforms", [])
+        lines = []
+        for i, entry in enumerate(entries):
+            if os.path.exists(os.path.join(root, entry["file"])):
+                lines.append(json.dumps(dict(key, analysis=i, **entry)) + "\n")
+        if lines:
+            # one write, so lines of concurrent scripts do not interleave
+            with open(os.path.join(root, INDEX_NAME), "a") as f:
+                f.write("".join(lines))
+
+
+def load_index(waveform_dir, **filters):
+    # Index entries matching all filters (task_id=12, kind="ac", ...); a
+    # script that ran again replaces its earlier entries for the same file.
+    entries = {}
+    try:
+        with open(os.path.join(waveform_dir, INDEX_NAME), "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                entries[(entry["script"], entry["task_id"], entry["it"], entry["code_id"], entry["analysis"])] = entry
+    except FileNotFoundError:
+        return []
+    return [entry for entry in entries.values()
+            if all(entry.get(field) == value for field, value in filters.items())]
+
+
+class Waveform:
+    # One stored analysis; waveform["vout"] and waveform.x are read-only
+    # views into the mapped file.
+    def __init__(self, waveform_dir, entry):
+        self.entry = entry
+        self.kind = entry["kind"]
+        self.names = entry["names"]
+        self.array = np.load(os.path.join(waveform_dir, entry["file"]), mmap_mode="r")
+
+    @property
+    def x(self):
+        return self.array[0] if self.entry["abscissa"] is not None else None
+
+    def __contains__(self, name):
+        return name.lower() in [n.lower() for n in self.names]
+
+    def __getitem__(self, name):
+        # node names as PySpice reports them (lower case)
+        return self.array[[n.lower() for n in self.names].index(name.lower())]
+
+
+def waveforms(waveform_dir, **filters):
+    for entry in load_index(waveform_dir, **filters):
+        try:
+            yield Waveform(waveform_dir, entry)
+        except (FileNotFoundError, ValueError):
+            continue
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("waveform_dir", nargs="?", default="waveforms")
+    parser.add_argument("--task_id", type=int, default=None)
+    args = parser.parse_args()
+    filters = {} if args.task_id is None else {"task_id": args.task_id}
+    summary = {}
+    for entry in load_index(args.waveform_dir, **filters):
+        path = os.path.join(args.waveform_dir, entry["file"])
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        row = summary.setdefault((entry["task_id"], entry["kind"]), [0, 0, 0])
+        row[0] += 1
+        row[1] += entry["shape"][1]
+        row[2] += size
+    if not summary:
+        print(f"No waveforms indexed in {args.waveform_dir}")
+        sys.exit(0)
+    print(f"{'task':>6}{'kind':>11}{'analyses':>10}{'points':>11}{'MB':>9}")
+    for (task_id, kind), (count, points, size) in sorted(summary.items(), key=lambda item: (item[0][0] is None, item[0])):
+        print(f"{str(task_id):>6}{kind:>11}{count:>10}{points:>11}{size / 2 ** 20:>9.1f}")